@@ -0,0 +1,192 @@
+"""
+Reprocess the objects already in the image bucket with the same pipeline
+the Lambda runs for new uploads. The bucket listing is streamed page by
+page; images already completed for their current version are skipped and
+the rest are processed by a bounded thread pool. On a versioned bucket the
+current version IDs are listed, since the Lambda records those instead of
+the ETag. After every page the last key is written to a checkpoint file,
+so an interrupted backfill continues where it stopped, and the keys that
+failed are appended to a second file next to it.
+
+Database settings come from the same RDS_* environment variables as the
+Lambda.
+
+    python backfill.py --bucket my-image-bucket --prefix uploads/ --workers 8 --checkpoint backfill.json
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import lambda_function
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png')
+# Failed keys kept in the checkpoint as a sample; all of them go to the failed keys file
+FAILED_KEYS_SAMPLE = 100
+
+
+class Checkpoint:
+    """
+    Progress of one backfill, persisted as JSON after every page. Failed
+    keys are appended to <checkpoint>.failed, one per line, so the
+    checkpoint stays small however many images fail.
+    """
+
+    def __init__(self, path, bucket, prefix):
+        self.path = Path(path) if path else None
+        self.failed_keys_path = self.path.with_suffix(self.path.suffix + '.failed') if self.path else None
+        self.state = {
+            'bucket': bucket,
+            'prefix': prefix,
+            'last_key': None,
+            'listed': 0,
+            'processed': 0,
+            'succeeded': 0,
+            'skipped': 0,
+            'failed': 0,
+            'failed_keys': []
+        }
+        if self.path and self.path.exists():
+            saved = json.loads(self.path.read_text())
+            if (saved.get('bucket'), saved.get('prefix')) != (bucket, prefix):
+                raise ValueError(f"Checkpoint {self.path} belongs to s3://{saved.get('bucket')}/{saved.get('prefix')}")
+            self.state.update(saved)
+            del self.state['failed_keys'][FAILED_KEYS_SAMPLE:]
+
+    @property
+    def last_key(self):
+        return self.state['last_key']
+
+    def advance(self, last_key, listed, summary):
+        """Record a finished page and save it"""
+        self.state['last_key'] = last_key
+        self.state['listed'] += listed
+        for name in ('processed', 'succeeded', 'skipped', 'failed'):
+            self.state[name] += summary[name]
+        sample = self.state['failed_keys']
+        sample += summary['failed_keys'][:FAILED_KEYS_SAMPLE - len(sample)]
+        # Written before the checkpoint: a page redone after a crash can only repeat keys
+        if self.failed_keys_path and summary['failed_keys']:
+            with open(self.failed_keys_path, 'a') as f:
+                f.writelines(f"{key}\n" for key in summary['failed_keys'])
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        # Replace the file in one step so an interrupt never leaves half a checkpoint
+        temporary = self.path.with_suffix(self.path.suffix + '.tmp')
+        temporary.write_text(json.dumps(self.state, indent=2))
+        os.replace(temporary, self.path)
+
+
+def is_versioned(s3, bucket):
+    """Whether objects of the bucket have version IDs (versioning enabled now or before)"""
+    return s3.get_bucket_versioning(Bucket=bucket).get('Status') in ('Enabled', 'Suspended')
+
+
+def iter_pages(s3, bucket, prefix='', start_after=None, page_size=1000, versioned=False):
+    """
+    Yield the Contents of each list_objects_v2 page, starting after
+    start_after. With versioned the current versions are listed instead,
+    with their VersionId; deleted keys have none and are left out.
+    """
+    if not versioned:
+        params = {'Bucket': bucket, 'Prefix': prefix}
+        if start_after:
+            params['StartAfter'] = start_after
+        paginator = s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(PaginationConfig={'PageSize': page_size}, **params):
+            contents = page.get('Contents', [])
+            if contents:
+                yield contents
+        return
+    
+    params = {'Bucket': bucket, 'Prefix': prefix}
+    if start_after:
+        # The current version of a key is listed first, so the rest of its versions can be skipped
+        params['KeyMarker'] = start_after
+    paginator = s3.get_paginator('list_object_versions')
+    for page in paginator.paginate(PaginationConfig={'PageSize': page_size}, **params):
+        contents = [version for version in page.get('Versions', []) if version['IsLatest']]
+        if contents:
+            yield contents
+
+
+def page_to_images(bucket, contents, suffixes=IMAGE_SUFFIXES):
+    """Turn listed objects into the image dicts process_images expects"""
+    images = []
+    for obj in contents:
+        if not obj['Key'].lower().endswith(suffixes):
+            continue
+        images.append({
+            'bucket': bucket,
+            'key': obj['Key'],
+            'size': obj['Size'],
+            'etag': obj.get('ETag'),
+            # Objects written while versioning was off have the version 'null', like in S3 events without one
+            'version': obj.get('VersionId') if obj.get('VersionId') != 'null' else None,
+            'event_time': obj['LastModified'].strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        })
+    return images
+
+
+def configure_workers(workers):
+    """Size the Lambda module's connection pool and Rekognition helpers for the worker count"""
+    lambda_function.IMAGE_PROCESSING_CONCURRENCY = workers
+    lambda_function.db_manager = lambda_function.DatabaseConnectionManager(
+        max_idle=workers, max_connections=workers)
+    lambda_function.rekognition_executor = lambda_function.ThreadPoolExecutor(max_workers=workers)
+
+
+def run_backfill(bucket, prefix='', workers=4, checkpoint_path=None, page_size=1000,
+                 suffixes=IMAGE_SUFFIXES, progress=print):
+    """
+    Backfill every image under prefix and return the totals. Each page is
+    checked against the images table in one query and its results are
+    written with the Lambda's multi-row inserts.
+    """
+    checkpoint = Checkpoint(checkpoint_path, bucket, prefix)
+    if checkpoint.last_key:
+        progress(f"Resuming after {checkpoint.last_key}")
+    s3 = lambda_function.get_aws_client('s3')
+    versioned = is_versioned(s3, bucket)
+    started = time.perf_counter()
+
+    for contents in iter_pages(s3, bucket, prefix, checkpoint.last_key, page_size, versioned):
+        images = page_to_images(bucket, contents, suffixes)
+        summary = lambda_function.process_images(images, max_workers=workers)
+        checkpoint.advance(contents[-1]['Key'], len(contents), summary)
+
+        state = checkpoint.state
+        elapsed = time.perf_counter() - started
+        progress(f"{state['listed']} listed, {state['succeeded']} processed, {state['skipped']} skipped, "
+                 f"{state['failed']} failed ({elapsed:.0f}s, last key {state['last_key']})")
+
+    return checkpoint.state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bucket', default=os.environ.get('S3_BUCKET_NAME'),
+                        required='S3_BUCKET_NAME' not in os.environ)
+    parser.add_argument('--prefix', default='')
+    parser.add_argument('--workers', type=int, default=8, help='images processed in parallel')
+    parser.add_argument('--page-size', type=int, default=1000, help='keys per list_objects_v2 page')
+    parser.add_argument('--checkpoint', help='JSON file to resume from and save progress to')
+    parser.add_argument('--suffixes', default=','.join(IMAGE_SUFFIXES),
+                        help='comma separated file suffixes to process')
+    args = parser.parse_args()
+
+    configure_workers(args.workers)
+    state = run_backfill(args.bucket, args.prefix, args.workers, args.checkpoint, args.page_size,
+                         tuple(s.strip().lower() for s in args.suffixes.split(',') if s.strip()))
+    print(json.dumps({k: v for k, v in state.items() if k != 'failed_keys'}, indent=2))
+    if state['failed']:
+        where = f", all in {args.checkpoint}.failed" if args.checkpoint else ''
+        print(f"{state['failed']} images failed, first: {state['failed_keys'][:10]}{where}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Measures the cold-start cost of lambda_function in fresh interpreters.
+boto3 clients are real but stubbed with botocore's Stubber, so nothing
+leaves the machine; the database is the SQLite-backed pymysql stand-in.
+
+    python benchmarks/bench_cold_start.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+CHILD = r'''
+import json, sys, time
+sys.path[:0] = [{module_dir!r}, {tests_dir!r}]
+started = time.perf_counter()
+import lambda_function
+timings = {{'import_lambda_function': (time.perf_counter() - started) * 1000}}
+from fakes import make_face, make_labels, make_sns_event
+
+started = time.perf_counter()
+lambda_function.lambda_handler(make_sns_event([]), None)
+timings['filtered_invocation'] = (time.perf_counter() - started) * 1000
+
+if {full!r}:
+    # Import cost is measured here because the stubs need both modules loaded
+    started = time.perf_counter()
+    import boto3
+    timings['import_boto3'] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    import pymysql
+    timings['import_pymysql'] = (time.perf_counter() - started) * 1000
+    from botocore.stub import Stubber
+    from fakes import FakeDatabase
+
+    responses = {{
+        's3': [('head_object', {{'ContentLength': 1024, 'ETag': '"abc"', 'Metadata': {{}}}})],
+        'rekognition': [('detect_labels', {{'Labels': make_labels()}}),
+                        ('detect_faces', {{'FaceDetails': [make_face()]}})],
+    }}
+    real_client = boto3.client
+    stubbers = []
+
+    def stubbed_client(service_name, *args, **kwargs):
+        client = real_client(service_name, *args, **kwargs)
+        stubber = Stubber(client)
+        for method, response in responses[service_name]:
+            stubber.add_response(method, response)
+        stubber.activate()
+        stubbers.append(stubber)
+        return client
+
+    boto3.client = stubbed_client
+    database = FakeDatabase(connect_latency={connect_ms} / 1000)
+    pymysql.connect = database.connect
+    lambda_function.PARALLEL_REKOGNITION = False
+
+    started = time.perf_counter()
+    lambda_function.lambda_handler(make_sns_event(['a.jpg']), None)
+    timings['first_image_invocation'] = (time.perf_counter() - started) * 1000
+    timings.update({{f'phase:{{k}}': v for k, v in lambda_function.cold_start_phases.items()}})
+
+print(json.dumps(timings))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--connect-ms', type=float, default=30,
+                        help='simulated TCP+TLS+auth handshake of the first DB connect')
+    parser.add_argument('--filtered-only', action='store_true',
+                        help='skip the invocation that processes an image')
+    args = parser.parse_args()
+
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-west-2'),
+               AWS_ACCESS_KEY_ID='testing', AWS_SECRET_ACCESS_KEY='testing')
+    code = CHILD.format(module_dir=str(HERE.parent), tests_dir=str(HERE.parent / 'tests'),
+                        full=not args.filtered_only, connect_ms=args.connect_ms)
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+
+    print(f"{'phase':<32} {'median ms':>10} {'max ms':>8}")
+    for name in runs[0]:
+        values = [run[name] for run in runs if name in run]
+        print(f"{name:<32} {statistics.median(values):>10.1f} {max(values):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
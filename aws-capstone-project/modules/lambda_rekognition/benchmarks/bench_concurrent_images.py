@@ -0,0 +1,64 @@
+"""
+Replays one SNS event with many ObjectCreated records through
+lambda_handler at different concurrency limits, using fake Rekognition,
+S3 and database backends with injected latency.
+
+    python benchmarks/bench_concurrent_images.py --images 32 --workers 1 4 8 16
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path[:0] = [str(HERE.parent), str(HERE.parent / 'tests')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import lambda_function  # noqa: E402
+import pymysql  # noqa: E402
+from fakes import FakeDatabase, FakeRekognition, FakeS3, make_sns_event  # noqa: E402
+
+
+def run(images, workers, args):
+    database = FakeDatabase(connect_latency=args.connect_ms / 1000, query_latency=args.query_ms / 1000)
+    pymysql.connect = database.connect
+    lambda_function.metrics.enabled = False
+    lambda_function.db_manager = lambda_function.DatabaseConnectionManager(max_idle=workers, max_connections=workers)
+    lambda_function.result_cache = lambda_function.build_result_cache()
+    lambda_function.aws_clients = {
+        'rekognition': FakeRekognition(latency=args.rekognition_ms / 1000),
+        's3': FakeS3(latency=args.s3_ms / 1000),
+    }
+    lambda_function.IMAGE_PROCESSING_CONCURRENCY = workers
+    lambda_function.PARALLEL_REKOGNITION = not args.sequential_rekognition
+
+    event = make_sns_event([f'bench/{i}.jpg' for i in range(images)])
+    start = time.perf_counter()
+    lambda_function.lambda_handler(event, None)
+    return time.perf_counter() - start, database.connects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--images', type=int, default=32)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--rekognition-ms', type=float, default=150)
+    parser.add_argument('--s3-ms', type=float, default=20)
+    parser.add_argument('--connect-ms', type=float, default=30)
+    parser.add_argument('--query-ms', type=float, default=1)
+    parser.add_argument('--sequential-rekognition', action='store_true',
+                        help='call detect_labels and detect_faces one after the other')
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>8} {'images/s':>9} {'speedup':>8} {'connects':>9}")
+    for workers in args.workers:
+        elapsed, connects = run(args.images, workers, args)
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>8.2f} {args.images / elapsed:>9.1f} "
+              f"{baseline / elapsed:>7.1f}x {connects:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Counts database round trips and wall time for storing one image's
+Rekognition results, using the SQLite-backed pymysql stand-in from
+tests/fakes.py with a configurable per-query latency.
+
+    python benchmarks/bench_db_round_trips.py --faces 5 --emotions 8 --latency-ms 1
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path[:0] = [str(HERE.parent), str(HERE.parent / 'tests')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import lambda_function  # noqa: E402
+import pymysql  # noqa: E402
+from fakes import FakeDatabase, make_face, make_labels  # noqa: E402
+
+EMOTIONS = ('HAPPY', 'CALM', 'SAD', 'ANGRY', 'FEAR', 'DISGUSTED', 'SURPRISED', 'CONFUSED')
+
+
+def build_results(labels, people, faces, emotions):
+    label_list = make_labels(count=labels, people=people)
+    return {
+        'labels': label_list,
+        'faces': [make_face(EMOTIONS[:emotions]) for _ in range(faces)],
+        'person_detections': [
+            {'confidence': i['Confidence'], 'boundingBox': i['BoundingBox']}
+            for i in label_list[0]['Instances']
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--labels', type=int, default=20)
+    parser.add_argument('--people', type=int, default=5)
+    parser.add_argument('--faces', type=int, default=5)
+    parser.add_argument('--emotions', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=1.0,
+                        help='simulated network round trip per query')
+    args = parser.parse_args()
+
+    database = FakeDatabase(query_latency=args.latency_ms / 1000)
+    pymysql.connect = database.connect
+    lambda_function.metrics.enabled = False
+    lambda_function.db_manager = lambda_function.DatabaseConnectionManager()
+    results = build_results(args.labels, args.people, args.faces, args.emotions)
+
+    with database.write_lock:
+        for i in range(args.images):
+            database.sqlite.execute("INSERT INTO images (s3_key, original_name) VALUES (?, ?)",
+                                    (f'bench/{i}.jpg', f'{i}.jpg'))
+    database.reset_stats()
+
+    start = time.perf_counter()
+    for image_id in range(1, args.images + 1):
+        lambda_function.save_rekognition_results(image_id, results)
+    elapsed = time.perf_counter() - start
+
+    rows = (len(results['labels']) + len(results['person_detections'])
+            + args.faces * (1 + args.emotions))
+    print(f"rows per image:            {rows}")
+    # one INSERT per row plus the connection ping and the commit
+    print(f"round trips per image:     {database.round_trips / args.images:.1f} "
+          f"(one INSERT per row would be {rows + 2})")
+    print(f"commits per image:         {database.commits / args.images:.1f}")
+    print(f"save time per image:       {elapsed / args.images * 1000:.2f} ms "
+          f"at {args.latency_ms} ms per round trip")
+
+
+if __name__ == '__main__':
+    main()
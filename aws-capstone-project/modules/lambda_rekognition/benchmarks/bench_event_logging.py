@@ -0,0 +1,66 @@
+"""
+Measures what logging the incoming event costs per invocation in each
+EVENT_LOG_MODE: serialisation time and bytes written to the log, for SNS
+events of different sizes.
+
+    python benchmarks/bench_event_logging.py --records 1 10 100 --repeat 2000
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path[:0] = [str(HERE.parent), str(HERE.parent / 'tests')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import lambda_function  # noqa: E402
+from fakes import make_sns_event  # noqa: E402
+
+
+def log_event(event, mode):
+    """The logging the handler does for a successful invocation"""
+    lambda_function.EVENT_LOG_MODE = mode
+    if mode == 'full':
+        lambda_function.logger.info(f"Lambda triggered with event: {lambda_function.json.dumps(event)}")
+    images = lambda_function.extract_images_from_event(event)
+    if mode == 'summary':
+        lambda_function.log_event_summary(images)
+
+
+def measure(event, mode, repeat):
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    lambda_function.logger.handlers = [handler]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        log_event(event, mode)
+    elapsed = time.perf_counter() - start
+    return elapsed / repeat * 1e6, len(stream.getvalue().encode()) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--modes', nargs='+', default=['full', 'summary', 'off'])
+    args = parser.parse_args()
+
+    print(f"{'records':>8} {'mode':>8} {'us/call':>9} {'log bytes':>10} {'bytes saved':>12}")
+    for records in args.records:
+        # One S3 record per SNS message, as S3 publishes them
+        event = make_sns_event([f'uploads/2025/07/18/image-{i:05d}.jpg' for i in range(records)],
+                               records_per_message=1)
+        baseline = None
+        for mode in args.modes:
+            micros, size = measure(event, mode, args.repeat)
+            baseline = size if baseline is None else baseline
+            saved = f"{1 - size / baseline:.0%}" if baseline else '-'
+            print(f"{records:>8} {mode:>8} {micros:>9.1f} {size:>10.0f} {saved:>12}")
+
+
+if __name__ == '__main__':
+    main()
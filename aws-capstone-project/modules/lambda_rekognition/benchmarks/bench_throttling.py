@@ -0,0 +1,76 @@
+"""
+Pushes a burst of images through process_images against a fake
+Rekognition that throttles above a TPS quota and a fake database that
+refuses connections above max_connections, with and without the
+client-side rate limiter.
+
+    python benchmarks/bench_throttling.py --images 40 --workers 16 --quota-tps 10 --limits 0 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path[:0] = [str(HERE.parent), str(HERE.parent / 'tests')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import lambda_function  # noqa: E402
+import pymysql  # noqa: E402
+from fakes import FakeDatabase, FakeRekognition, FakeS3  # noqa: E402
+
+
+def run(limit, args):
+    database = FakeDatabase(connect_latency=args.connect_ms / 1000, query_latency=args.query_ms / 1000,
+                            max_connections=args.db_max_connections)
+    pymysql.connect = database.connect
+    rekognition = FakeRekognition(latency=args.rekognition_ms / 1000, tps=args.quota_tps)
+    lambda_function.metrics = lambda_function.PhaseMetrics(enabled=True, sink=lambda line: None)
+    lambda_function.aws_clients = {'rekognition': rekognition, 's3': FakeS3()}
+    lambda_function.db_manager = lambda_function.DatabaseConnectionManager(
+        max_idle=args.db_max_connections, max_connections=args.db_max_connections)
+    lambda_function.result_cache = lambda_function.build_result_cache()
+    lambda_function.rekognition_executor = ThreadPoolExecutor(max_workers=args.workers)
+    lambda_function.rekognition_limiters = {
+        name: lambda_function.TokenBucket(limit, burst=args.burst) for name in ('detect_labels', 'detect_faces')
+    }
+    lambda_function.RETRY_MAX_ATTEMPTS = args.max_attempts
+
+    images = [{'bucket': 'bucket', 'key': f'bench/{i}.jpg', 'size': 1024, 'etag': f'etag-{i}'}
+              for i in range(args.images)]
+    start = time.perf_counter()
+    summary = lambda_function.process_images(images, max_workers=args.workers)
+    elapsed = time.perf_counter() - start
+    record = json.loads(lambda_function.metrics.flush() or '{}')
+    return elapsed, summary, rekognition, database, record.get('retry_wait_count', 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--images', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--quota-tps', type=int, default=10, help='Rekognition calls per second per API')
+    parser.add_argument('--limits', type=float, nargs='+', default=[0, 10],
+                        help='client-side TPS limits to compare, 0 disables the limiter')
+    parser.add_argument('--burst', type=int, default=1)
+    parser.add_argument('--db-max-connections', type=int, default=4)
+    parser.add_argument('--max-attempts', type=int, default=8)
+    parser.add_argument('--rekognition-ms', type=float, default=100)
+    parser.add_argument('--connect-ms', type=float, default=30)
+    parser.add_argument('--query-ms', type=float, default=1)
+    args = parser.parse_args()
+
+    print(f"{'limit':>6} {'seconds':>8} {'ok':>4} {'failed':>6} {'calls':>6} {'throttled':>9} "
+          f"{'refused':>7} {'retries':>7} {'peak conns':>10}")
+    for limit in args.limits:
+        elapsed, summary, rekognition, database, retries = run(limit, args)
+        print(f"{limit or 'off':>6} {elapsed:>8.2f} {summary['succeeded']:>4} {summary['failed']:>6} "
+              f"{sum(rekognition.calls.values()):>6} {sum(rekognition.throttled.values()):>9} "
+              f"{database.refused:>7} {retries:>7} {database.peak_connections:>10}")
+
+
+if __name__ == '__main__':
+    main()
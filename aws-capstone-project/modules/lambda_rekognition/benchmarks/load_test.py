@@ -0,0 +1,154 @@
+"""
+Local end-to-end load test for lambda_handler. Replays synthetic
+SNS-wrapped S3 ObjectCreated events at a configurable rate against fake
+Rekognition and S3 backends and the SQLite stand-in for the schema in
+scripts/bastion_setup.sh. Needs no AWS access.
+
+Latencies are in milliseconds: 120, uniform:80:160, exp:100 or
+lognormal:120:0.4 (median, sigma).
+
+    python benchmarks/load_test.py --events 50 --batch-size 10 --rate 5 \\
+        --invocations 4 --rekognition-latency lognormal:120:0.4
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path[:0] = [str(HERE.parent), str(HERE.parent / 'tests')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import lambda_function  # noqa: E402
+import pymysql  # noqa: E402
+from fakes import FakeDatabase, FakeRekognition, FakeS3, make_sns_event, parse_latency  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class PhaseRecorder:
+    """Keeps every phase duration; the EMF lines themselves are discarded"""
+
+    def __init__(self, metrics):
+        self.samples = {}
+        self._lock = threading.Lock()
+        self._record = metrics.record
+        metrics.record = self.record
+        metrics.sink = lambda line: None
+        metrics.enabled = True
+
+    def record(self, name, duration_ms, failed=False):
+        with self._lock:
+            self.samples.setdefault(name, []).append(duration_ms)
+        self._record(name, duration_ms, failed)
+
+
+def configure(args):
+    database = FakeDatabase(connect_latency=parse_latency(args.db_connect_latency),
+                            query_latency=parse_latency(args.db_query_latency))
+    pymysql.connect = database.connect
+    lambda_function.aws_clients = {
+        'rekognition': FakeRekognition(latency=parse_latency(args.rekognition_latency)),
+        's3': FakeS3(latency=parse_latency(args.s3_latency)),
+    }
+    lambda_function.IMAGE_PROCESSING_CONCURRENCY = args.workers
+    # Invocations share one process here, unlike separate Lambda containers
+    lambda_function.rekognition_executor = ThreadPoolExecutor(max_workers=args.workers * args.invocations)
+    lambda_function.db_manager = lambda_function.DatabaseConnectionManager(
+        max_idle=args.workers * args.invocations, max_connections=args.workers * args.invocations)
+    lambda_function.result_cache = lambda_function.build_result_cache(args.cache)
+    return database
+
+
+def build_events(args):
+    events = []
+    for e in range(args.events):
+        keys = []
+        for i in range(args.batch_size):
+            keys.append(f'load/{e * args.batch_size + i}.jpg')
+        event = make_sns_event(keys)
+        if args.duplicate_every:
+            # Every duplicate_every-th upload repeats the content of the first one
+            message = event['Records'][0]['Sns']['Message']
+            for n in range(e * args.batch_size, (e + 1) * args.batch_size):
+                if n and n % args.duplicate_every == 0:
+                    message = message.replace(f'"etag-load/{n}.jpg"', '"etag-load/0.jpg"')
+            event['Records'][0]['Sns']['Message'] = message
+        events.append(event)
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=10, help='S3 records per SNS event')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='events per second, 0 sends them as fast as possible')
+    parser.add_argument('--invocations', type=int, default=4, help='concurrent Lambda invocations')
+    parser.add_argument('--workers', type=int, default=4, help='IMAGE_PROCESSING_CONCURRENCY')
+    parser.add_argument('--rekognition-latency', default='lognormal:120:0.4')
+    parser.add_argument('--s3-latency', default='20')
+    parser.add_argument('--db-connect-latency', default='30')
+    parser.add_argument('--db-query-latency', default='uniform:0.5:2')
+    parser.add_argument('--cache', default='memory,database', help='RESULT_CACHE_STORES')
+    parser.add_argument('--duplicate-every', type=int, default=0,
+                        help='make every n-th upload a re-upload of the first image')
+    args = parser.parse_args()
+
+    database = configure(args)
+    recorder = PhaseRecorder(lambda_function.metrics)
+    events = build_events(args)
+    rekognition = lambda_function.aws_clients['rekognition']
+    invocation_ms = []
+    failed = 0
+    lock = threading.Lock()
+
+    def invoke(event, scheduled):
+        nonlocal failed
+        try:
+            lambda_function.lambda_handler(event, None)
+            event_failed = 0
+        except lambda_function.BatchProcessingError as e:
+            event_failed = e.summary['failed']
+        except Exception:
+            event_failed = args.batch_size
+        with lock:
+            invocation_ms.append((time.perf_counter() - scheduled) * 1000)
+            failed += event_failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.invocations) as executor:
+        for index, event in enumerate(events):
+            scheduled = started + (index / args.rate if args.rate else 0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(invoke, event, max(scheduled, started))
+    elapsed = time.perf_counter() - started
+
+    images = args.events * args.batch_size
+    print(f"images:                 {images} in {args.events} events, {failed} failed")
+    print(f"throughput:             {images / elapsed:.1f} images/s over {elapsed:.2f} s")
+    print(f"rekognition calls:      {sum(rekognition.calls.values())}")
+    print(f"db round trips/image:   {database.round_trips / images:.1f}")
+    print(f"db commits/image:       {database.commits / images:.2f}")
+    print(f"db connects:            {database.connects}")
+    print()
+    print(f"{'phase':<20} {'count':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    phases = dict(recorder.samples, invocation=invocation_ms)
+    for name, values in phases.items():
+        print(f"{name:<20} {len(values):>6} {percentile(values, 50):>8.1f} {percentile(values, 90):>8.1f} "
+              f"{percentile(values, 99):>8.1f} {max(values):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
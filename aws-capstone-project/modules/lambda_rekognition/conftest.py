@@ -0,0 +1,4 @@
+import os
+
+# boto3 clients need a region even when their calls are faked
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
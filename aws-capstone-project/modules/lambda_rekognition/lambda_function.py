@@ -1,18 +1,79 @@
+import time
+
+# Start of the cold-start clock, taken before anything else is imported
+_module_load_started = time.perf_counter()
+
+import functools
 import json
-import boto3
-import pymysql
 import os
 import logging
-from datetime import datetime
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from urllib.parse import unquote_plus
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-rekognition = boto3.client('rekognition')
-s3 = boto3.client('s3')
+# AWS clients are created on first use and cached for warm invocations;
+# boto3 and pymysql are only imported when they are needed
+aws_clients = {}
+_aws_clients_lock = threading.Lock()
+
+# Durations (ms) of the one-off phases of a cold start, in the order they ran
+cold_start_phases = OrderedDict()
+# Phases already logged; a phase first run by a later invocation is logged then
+_cold_start_logged_phases = set()
+
+
+@contextmanager
+def cold_start_phase(name):
+    """Time a one-off initialisation step; only its first run is recorded"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if name not in cold_start_phases:
+            cold_start_phases[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def log_cold_start_phases():
+    """Log the timings of the cold-start phases recorded since the last call"""
+    new_phases = OrderedDict((name, duration) for name, duration in cold_start_phases.items()
+                             if name not in _cold_start_logged_phases)
+    if not new_phases:
+        return
+    _cold_start_logged_phases.update(new_phases)
+    logger.info(json.dumps({'cold_start_phases_ms': new_phases}))
+
+
+def aws_client_options(service_name):
+    """Extra boto3.client arguments for a service"""
+    if service_name == 'rekognition':
+        # Throttling, connection errors and read timeouts are retried by
+        # retry_call, so botocore must not retry as well
+        from botocore.config import Config
+        return {'config': Config(retries={'mode': 'standard', 'max_attempts': 1})}
+    return {}
+
+
+def get_aws_client(service_name):
+    """Return the cached boto3 client for a service, creating it on first use"""
+    client = aws_clients.get(service_name)
+    if client is None:
+        with _aws_clients_lock:
+            client = aws_clients.get(service_name)
+            if client is None:
+                with cold_start_phase('import_boto3'):
+                    import boto3
+                with cold_start_phase(f'client_{service_name}'):
+                    client = boto3.client(service_name, **aws_client_options(service_name))
+                aws_clients[service_name] = client
+    return client
 
 # Database configuration from environment variables
 DB_CONFIG = {
@@ -24,16 +85,614 @@ DB_CONFIG = {
     'charset': 'utf8mb4'
 }
 
+# Number of images from one event that are processed in parallel
+IMAGE_PROCESSING_CONCURRENCY = int(os.environ.get('IMAGE_PROCESSING_CONCURRENCY', 4))
+
+# Run detect_labels and detect_faces concurrently for each image
+PARALLEL_REKOGNITION = os.environ.get('PARALLEL_REKOGNITION', 'true').lower() == 'true'
+
+# Maximum number of idle connections kept open between invocations
+DB_MAX_IDLE_CONNECTIONS = int(os.environ.get('DB_MAX_IDLE_CONNECTIONS', IMAGE_PROCESSING_CONCURRENCY))
+
+# Read original-name/upload-time user metadata with head_object instead of
+# building the image record from the S3 event alone
+READ_S3_METADATA = os.environ.get('READ_S3_METADATA', 'false').lower() == 'true'
+
+# Client-side Rekognition rate limit per API in calls/second (0 disables it).
+# The rate backs off when Rekognition throttles and recovers on success.
+REKOGNITION_TPS = float(os.environ.get('REKOGNITION_TPS', 0))
+REKOGNITION_BURST = int(os.environ.get('REKOGNITION_BURST', 1))
+
+# Jittered exponential backoff for throttled Rekognition calls and refused DB connects
+RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', 5))
+RETRY_BASE_DELAY_SECONDS = float(os.environ.get('RETRY_BASE_DELAY_SECONDS', 0.2))
+RETRY_MAX_DELAY_SECONDS = float(os.environ.get('RETRY_MAX_DELAY_SECONDS', 5))
+
+# Upper bound on database connections open at once in this container
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', IMAGE_PROCESSING_CONCURRENCY))
+DB_ACQUIRE_TIMEOUT_SECONDS = float(os.environ.get('DB_ACQUIRE_TIMEOUT_SECONDS', 30))
+
+# Error codes worth retrying after a pause
+RETRYABLE_AWS_ERRORS = {
+    'ThrottlingException',
+    'ProvisionedThroughputExceededException',
+    'LimitExceededException',
+    'ServiceUnavailableException',
+    'InternalServerError'
+}
+# Too many connections, user connection limit, server gone away during connect
+RETRYABLE_DB_ERRORS = {1040, 1203, 2003, 2013}
+
+# How the incoming event is logged: 'summary' logs key, size and eTag of up
+# to EVENT_LOG_SAMPLE_RECORDS images, 'full' the whole event, 'off' nothing.
+# The full event is always logged when a record fails.
+EVENT_LOG_MODE = os.environ.get('EVENT_LOG_MODE', 'summary').lower()
+EVENT_LOG_SAMPLE_RECORDS = int(os.environ.get('EVENT_LOG_SAMPLE_RECORDS', 5))
+
+# Skip images whose current S3 version was already processed, so that
+# redelivered SNS messages do not repeat the Rekognition analysis
+SKIP_COMPLETED_IMAGES = os.environ.get('SKIP_COMPLETED_IMAGES', 'true').lower() == 'true'
+
+# Commit an intermediate 'processing' status before calling Rekognition
+MARK_PROCESSING_STATUS = os.environ.get('MARK_PROCESSING_STATUS', 'true').lower() == 'true'
+
+# processing_logs.status only knows started/completed/failed
+PROCESSING_LOG_STATUS = {'processing': 'started'}
+
+# Rekognition result cache: comma separated stores ('memory', 'database'), empty disables it
+RESULT_CACHE_STORES = os.environ.get('RESULT_CACHE_STORES', 'memory,database')
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get('RESULT_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 256))
+# Expired rows of rekognition_result_cache are deleted by a put at most this
+# often per container, at most RESULT_CACHE_EVICT_BATCH rows at a time
+RESULT_CACHE_EVICT_INTERVAL_SECONDS = int(os.environ.get('RESULT_CACHE_EVICT_INTERVAL_SECONDS', 300))
+RESULT_CACHE_EVICT_BATCH = int(os.environ.get('RESULT_CACHE_EVICT_BATCH', 1000))
+
+# Per-phase latency metrics, emitted once per invocation in CloudWatch EMF
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'RekognitionImageProcessor')
+
+# CloudWatch accepts at most 100 values per metric in one EMF record
+EMF_MAX_VALUES = 100
+
+
+class PhaseMetrics:
+    """
+    Collects the duration of each instrumented phase during an invocation
+    and prints them as one CloudWatch Embedded Metric Format line. When
+    disabled, timed functions are called directly and nothing is printed.
+    """
+
+    def __init__(self, namespace=METRICS_NAMESPACE, enabled=METRICS_ENABLED, sink=None):
+        self.namespace = namespace
+        self.enabled = enabled
+        # EMF records must be the whole log line, so bypass the logger format
+        self.sink = sink or (lambda line: print(line, flush=True))
+        self._durations = {}
+        self._counts = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Time the block as one occurrence of a phase"""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000, failed)
+
+    def timed(self, name, failed_result=None):
+        """
+        Decorator timing every call of a function as a phase. Besides
+        raising, a call fails when failed_result(return value) is true.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                started = time.perf_counter()
+                failed = True
+                try:
+                    result = func(*args, **kwargs)
+                    failed = failed_result is not None and bool(failed_result(result))
+                    return result
+                finally:
+                    self.record(name, (time.perf_counter() - started) * 1000, failed)
+            return wrapper
+        return decorator
+
+    def record(self, name, duration_ms, failed=False):
+        with self._lock:
+            durations = self._durations.setdefault(name, [])
+            if len(durations) < EMF_MAX_VALUES:
+                durations.append(round(duration_ms, 2))
+            self._counts[name] = self._counts.get(name, 0) + 1
+            if failed:
+                self._errors[name] = self._errors.get(name, 0) + 1
+
+    def flush(self, function_name=None):
+        """Print the collected metrics as one EMF line and start over"""
+        with self._lock:
+            durations, self._durations = self._durations, {}
+            counts, self._counts = self._counts, {}
+            errors, self._errors = self._errors, {}
+        if not self.enabled or not counts:
+            return None
+        
+        record = {'FunctionName': function_name or 'local'}
+        definitions = []
+        for name in counts:
+            record[f'{name}_ms'] = durations[name]
+            record[f'{name}_count'] = counts[name]
+            record[f'{name}_errors'] = errors.get(name, 0)
+            definitions += [
+                {'Name': f'{name}_ms', 'Unit': 'Milliseconds'},
+                {'Name': f'{name}_count', 'Unit': 'Count'},
+                {'Name': f'{name}_errors', 'Unit': 'Count'}
+            ]
+        record['_aws'] = {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': self.namespace,
+                'Dimensions': [['FunctionName']],
+                'Metrics': definitions
+            }]
+        }
+        line = json.dumps(record, default=str)
+        self.sink(line)
+        return line
+
+
+metrics = PhaseMetrics()
+
+
+class TokenBucket:
+    """
+    Blocking token bucket shared by all threads of the container. The
+    rate is cut on throttling and grows back towards the configured
+    maximum with every successful call.
+    """
+
+    def __init__(self, rate, burst=REKOGNITION_BURST, min_rate=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 10
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait for a token and return the time spent waiting"""
+        if self.max_rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def aws_error_code(error):
+    """Return the error code of a botocore ClientError, or None"""
+    response = getattr(error, 'response', None)
+    # Timeouts inherit a response attribute from requests that is None
+    if not isinstance(response, dict):
+        return None
+    return response.get('Error', {}).get('Code')
+
+
+def is_retryable_aws_error(error):
+    # botocore is imported here so the module loads before boto3 is needed
+    from botocore.exceptions import ConnectionError, ReadTimeoutError
+    # ConnectionError covers EndpointConnectionError and ConnectTimeoutError
+    if isinstance(error, (ConnectionError, ReadTimeoutError)):
+        return True
+    return aws_error_code(error) in RETRYABLE_AWS_ERRORS
+
+
+def is_retryable_db_error(error):
+    return bool(error.args) and error.args[0] in RETRYABLE_DB_ERRORS
+
+
+def retry_call(func, is_retryable, description, on_retry=None):
+    """
+    Call func, retrying retryable errors with full-jitter exponential
+    backoff up to RETRY_MAX_ATTEMPTS attempts in total
+    """
+    attempt = 1
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= RETRY_MAX_ATTEMPTS or not is_retryable(e):
+                raise
+            if on_retry:
+                on_retry(e)
+            delay = random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1)))
+            logger.warning(f"{description} failed with {str(e)}, retry {attempt} in {delay:.2f}s")
+            metrics.record('retry_wait', delay * 1000)
+            time.sleep(delay)
+            attempt += 1
+
+
+class DatabaseConnectionManager:
+    """
+    Keeps database connections alive across warm Lambda invocations.
+    Idle connections are checked with ping() before they are handed out
+    and are dropped whenever a rollback could not leave them clean.
+    """
+
+    def __init__(self, max_idle=DB_MAX_IDLE_CONNECTIONS, max_connections=DB_MAX_CONNECTIONS,
+                 acquire_timeout=DB_ACQUIRE_TIMEOUT_SECONDS):
+        self.max_idle = max_idle
+        self.acquire_timeout = acquire_timeout
+        self._idle = []
+        self._depth = {}
+        self._lock = threading.Lock()
+        # New connections are only opened when none is idle, so capping the
+        # connections in use also caps the connections open
+        self._in_use = threading.BoundedSemaphore(max(max_connections, 1))
+
+    def acquire(self):
+        """Return a live connection, reusing an idle one when possible"""
+        if not self._in_use.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f"No database connection free after {self.acquire_timeout}s")
+        try:
+            return self._live_connection()
+        except Exception:
+            self._in_use.release()
+            raise
+
+    def _live_connection(self):
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                return retry_call(get_database_connection, is_retryable_db_error, 'Database connect')
+            try:
+                connection.ping(reconnect=True)
+                return connection
+            except Exception as e:
+                logger.warning(f"Discarding stale database connection: {str(e)}")
+                self._close(connection)
+
+    def release(self, connection, discard=False):
+        """Hand a connection back to the idle list or close it"""
+        try:
+            if not discard:
+                with self._lock:
+                    if len(self._idle) < self.max_idle:
+                        self._idle.append(connection)
+                        return
+            self._close(connection)
+        finally:
+            self._in_use.release()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._close(connection)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow one connection for the duration of the block. It is rolled
+        back before it goes back to the idle list: with autocommit off even
+        a plain SELECT opens a transaction, whose snapshot would otherwise
+        be read by the next invocation and whose metadata locks block DDL.
+        """
+        connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except Exception:
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+            raise
+        else:
+            try:
+                connection.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding database connection that failed to roll back: {str(e)}")
+                discard = True
+        finally:
+            self.release(connection, discard=discard)
+
+    @contextmanager
+    def transaction(self, connection=None):
+        """
+        Run the block in one transaction, committing on success.
+        Nested blocks on the same connection join the outer transaction.
+        """
+        if connection is None:
+            with self.connection() as connection:
+                with self.transaction(connection):
+                    yield connection
+            return
+        key = id(connection)
+        with self._lock:
+            depth = self._depth.get(key, 0)
+            self._depth[key] = depth + 1
+        try:
+            yield connection
+            if depth == 0:
+                connection.commit()
+        except Exception:
+            if depth == 0:
+                connection.rollback()
+            raise
+        finally:
+            with self._lock:
+                if depth == 0:
+                    del self._depth[key]
+                else:
+                    self._depth[key] = depth
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+# Module-level manager so connections survive between warm invocations
+db_manager = DatabaseConnectionManager()
+
+class MemoryResultStore:
+    """In-process LRU of Rekognition results, kept while the container stays warm"""
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, connection=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, results = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return results
+
+    def put(self, key, image_id, results, connection=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class DatabaseResultStore:
+    """
+    Maps content keys to an already processed image in the
+    rekognition_result_cache table and rebuilds that image's results
+    from the detection tables. Expired rows are deleted in bounded
+    batches by a put every evict_interval seconds.
+    """
+
+    def __init__(self, ttl=RESULT_CACHE_TTL_SECONDS, evict_interval=RESULT_CACHE_EVICT_INTERVAL_SECONDS,
+                 evict_batch=RESULT_CACHE_EVICT_BATCH):
+        self.ttl = ttl
+        self.evict_interval = evict_interval
+        self.evict_batch = evict_batch
+        self._next_eviction = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, key, connection=None):
+        if connection is None:
+            with db_manager.connection() as connection:
+                return self.get(key, connection)
+        with connection.cursor() as cursor:
+            # Expired rows are ignored here until they are overwritten or evicted
+            cursor.execute("""
+                SELECT c.image_id FROM rekognition_result_cache c
+                JOIN images i ON i.id = c.image_id
+                WHERE c.content_key = %s AND c.created_at >= %s
+                  AND i.processing_status = 'completed'
+            """, (key, datetime.utcnow() - timedelta(seconds=self.ttl)))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            return load_rekognition_results(cursor, row[0])
+
+    def put(self, key, image_id, results, connection=None):
+        with db_manager.transaction(connection) as connection, connection.cursor() as cursor:
+            cursor.execute("""
+                REPLACE INTO rekognition_result_cache (content_key, image_id, created_at)
+                VALUES (%s, %s, %s)
+            """, (key, image_id, datetime.utcnow()))
+            if self._eviction_due():
+                # idx_created_at keeps this to the expired rows; LIMIT bounds the locks taken
+                cursor.execute("""
+                    DELETE FROM rekognition_result_cache WHERE created_at < %s LIMIT %s
+                """, (datetime.utcnow() - timedelta(seconds=self.ttl), self.evict_batch))
+                if cursor.rowcount:
+                    logger.info(f"Evicted {cursor.rowcount} expired result cache rows")
+    
+    def _eviction_due(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_eviction:
+                return False
+            self._next_eviction = now + self.evict_interval
+            return True
+
+
+class ResultCache:
+    """
+    Content-addressed cache of Rekognition results. Stores are tried in
+    order and a hit in a slower store fills the faster ones. Cache errors
+    are logged and treated as misses so they never fail an image.
+    """
+
+    def __init__(self, stores):
+        self.stores = stores
+
+    def get(self, key, connection=None):
+        for index, store in enumerate(self.stores):
+            try:
+                results = store.get(key, connection=connection)
+            except Exception as e:
+                logger.warning(f"Result cache lookup failed in {type(store).__name__}: {str(e)}")
+                continue
+            if results is not None:
+                for faster_store in self.stores[:index]:
+                    faster_store.put(key, None, results, connection=connection)
+                return results
+        return None
+
+    def put(self, key, image_id, results, connection=None):
+        for store in self.stores:
+            try:
+                store.put(key, image_id, results, connection=connection)
+            except Exception as e:
+                logger.warning(f"Result cache update failed in {type(store).__name__}: {str(e)}")
+
+
+def build_result_cache(store_names=RESULT_CACHE_STORES):
+    """Create the result cache from a comma separated list of store names"""
+    store_types = {'memory': MemoryResultStore, 'database': DatabaseResultStore}
+    names = [name.strip() for name in store_names.split(',') if name.strip()]
+    return ResultCache([store_types[name]() for name in names])
+
+
+def get_result_cache_key(etag, file_size):
+    """Key identical uploads by their S3 ETag and size"""
+    if not etag:
+        return None
+    etag = etag.strip('"')
+    return f"{etag}:{file_size}"
+
+
+result_cache = build_result_cache()
+
+# One limiter per Rekognition API, since AWS sets TPS quotas per API
+rekognition_limiters = {
+    'detect_labels': TokenBucket(REKOGNITION_TPS),
+    'detect_faces': TokenBucket(REKOGNITION_TPS)
+}
+
+# Helper threads for the second Rekognition call of each image in flight
+rekognition_executor = ThreadPoolExecutor(max_workers=max(IMAGE_PROCESSING_CONCURRENCY, 1))
+
+class BatchProcessingError(Exception):
+    """Raised after a batch in which some records failed; carries the batch summary"""
+
+    def __init__(self, summary):
+        super().__init__(f"{len(summary['failed_records'])} record(s) failed: "
+                         f"{json.dumps(summary['failed_records'], separators=(',', ':'))}")
+        self.summary = summary
+
 def lambda_handler(event, context):
     """
     Lambda function triggered by SNS when images are uploaded to S3
-    Processes images with Rekognition and stores results in RDS
+    Processes images with Rekognition and stores results in RDS. SNS
+    invokes it asynchronously and ignores the return value, so a batch
+    with failed records raises to have Lambda retry the event; images
+    completed by this attempt are then skipped.
     """
-    logger.info(f"Lambda triggered with event: {json.dumps(event)}")
+    if EVENT_LOG_MODE == 'full':
+        logger.info(f"Lambda triggered with event: {json.dumps(event)}")
     
     try:
-        # Parse SNS message
-        for record in event['Records']:
+        # A malformed message fails on its own instead of failing the batch
+        failed_records = []
+        images = extract_images_from_event(event, failed_records)
+        if EVENT_LOG_MODE == 'summary':
+            log_event_summary(images)
+        summary = process_images(images)
+        summary['failed_records'] = failed_records + [
+            {'key': key, 'reason': 'processing failed'} for key in summary['failed_keys']
+        ]
+        if summary['failed_records']:
+            log_failed_event(event)
+            raise BatchProcessingError(summary)
+        
+        return {
+            'statusCode': 200,
+            'body': json.dumps(summary, separators=(',', ':'))
+        }
+        
+    except BatchProcessingError:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing Lambda event: {str(e)}")
+        log_failed_event(event)
+        raise
+    finally:
+        log_cold_start_phases()
+        metrics.flush(getattr(context, 'function_name', None))
+
+def log_event_summary(images):
+    """Log the image count and key, size and eTag of the first few images"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    sample = [[image['key'], image['size'], image['etag']] for image in images[:EVENT_LOG_SAMPLE_RECORDS]]
+    logger.info(json.dumps({'images': len(images), 'sample': sample}, separators=(',', ':')))
+
+def log_failed_event(event):
+    """Log the whole event of a failed invocation for debugging"""
+    if EVENT_LOG_MODE in ('full', 'off'):
+        # Already logged on entry, or logging is switched off
+        return
+    logger.error(f"Failed event: {json.dumps(event, separators=(',', ':'), default=str)}")
+
+def sequencer_order(sequencer, width):
+    """
+    Make S3 event sequencers comparable: the later event of a key has the
+    greater value once the shorter one is right-padded with zeros
+    """
+    return (sequencer or '').upper().ljust(width, '0')
+
+def extract_images_from_event(event, failed_records=None):
+    """
+    Return the newly created objects in an SNS event as dicts with bucket,
+    key and whatever size, eTag, version and event time the S3 record
+    carries. When a key appears more than once, the record with the
+    greatest sequencer (the latest write) is kept. When a failed_records
+    list is given, SNS records that cannot be parsed are appended to it
+    instead of raising.
+    """
+    images = []
+    # (bucket, key) -> (index in images, sequencer of that record)
+    seen = {}
+    for record in event['Records']:
+        try:
             if record['EventSource'] == 'aws:sns':
                 # Parse S3 event from SNS message
                 sns_message = json.loads(record['Sns']['Message'])
@@ -42,83 +701,306 @@ def lambda_handler(event, context):
                     if s3_record['eventName'].startswith('ObjectCreated'):
                         # Extract S3 details
                         bucket_name = s3_record['s3']['bucket']['name']
-                        s3_key = unquote_plus(s3_record['s3']['object']['key'])
+                        s3_object = s3_record['s3']['object']
+                        s3_key = unquote_plus(s3_object['key'])
                         
-                        logger.info(f"Processing image: {s3_key} from bucket: {bucket_name}")
+                        image = {
+                            'bucket': bucket_name,
+                            'key': s3_key,
+                            'size': s3_object.get('size'),
+                            'etag': s3_object.get('eTag'),
+                            'version': s3_object.get('versionId'),
+                            'event_time': s3_record.get('eventTime')
+                        }
+                        sequencer = s3_object.get('sequencer')
                         
-                        # Process the image
-                        process_image(bucket_name, s3_key)
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps('Successfully processed images')
-        }
-        
-    except Exception as e:
-        logger.error(f"Error processing Lambda event: {str(e)}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps(f'Error: {str(e)}')
-        }
+                        # The same key can appear twice in one batch; keep its latest write
+                        if (bucket_name, s3_key) in seen:
+                            index, seen_sequencer = seen[(bucket_name, s3_key)]
+                            width = max(len(sequencer or ''), len(seen_sequencer or ''))
+                            if sequencer_order(sequencer, width) > sequencer_order(seen_sequencer, width):
+                                images[index] = image
+                                seen[(bucket_name, s3_key)] = (index, sequencer)
+                            continue
+                        seen[(bucket_name, s3_key)] = (len(images), sequencer)
+                        images.append(image)
+        except Exception as e:
+            if failed_records is None:
+                raise
+            message_id = record.get('Sns', {}).get('MessageId') if isinstance(record, dict) else None
+            logger.error(f"Skipping malformed record {message_id}: {str(e)}")
+            failed_records.append({'message_id': message_id, 'reason': f'malformed record: {str(e)}'})
+    return images
+
+def get_source_version(version, etag):
+    """
+    Identify the S3 object version an image record was processed from:
+    the version ID on versioned buckets, otherwise the ETag
+    """
+    if version:
+        return version
+    return etag.strip('"') if etag else None
+
+def find_completed_images(images):
+    """
+    Return the images whose key and version already have a completed
+    record, using one query for the whole batch
+    """
+    versions = {image['key']: get_source_version(image.get('version'), image.get('etag')) for image in images}
+    keys = [key for key, version in versions.items() if version]
+    if not keys:
+        return []
+    with db_manager.connection() as connection, connection.cursor() as cursor:
+        placeholders = ', '.join(['%s'] * len(keys))
+        cursor.execute(f"""
+            SELECT s3_key, source_version FROM images
+            WHERE s3_key IN ({placeholders}) AND processing_status = 'completed'
+        """, keys)
+        completed = set(cursor.fetchall())
+    return [image for image in images if (image['key'], versions[image['key']]) in completed]
+
+def process_images(images, max_workers=None):
+    """
+    Process images with a bounded thread pool. A failing image does not
+    affect the others; the outcome of the whole batch is summarised.
+    Images already completed for the same S3 version are skipped.
+    """
+    max_workers = max_workers or IMAGE_PROCESSING_CONCURRENCY
+    
+    skipped = []
+    if SKIP_COMPLETED_IMAGES and images:
+        try:
+            skipped = find_completed_images(images)
+        except Exception as e:
+            # Without the check every image is processed, as before
+            logger.warning(f"Could not check for completed images: {str(e)}")
+        if skipped:
+            logger.info(f"Skipping {len(skipped)} already processed images")
+            skipped_ids = {id(image) for image in skipped}
+            images = [image for image in images if id(image) not in skipped_ids]
+    
+    def process_one(image):
+        bucket_name, s3_key = image['bucket'], image['key']
+        logger.info(f"Processing image: {s3_key} from bucket: {bucket_name}")
+        try:
+            return process_image(bucket_name, s3_key, image)
+        except Exception as e:
+            logger.error(f"Unexpected error processing {s3_key}: {str(e)}")
+            return False
+    
+    if max_workers <= 1 or len(images) <= 1:
+        outcomes = [process_one(image) for image in images]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(images))) as executor:
+            outcomes = list(executor.map(process_one, images))
+    
+    failed = [image['key'] for image, ok in zip(images, outcomes) if not ok]
+    return {
+        'processed': len(images),
+        'succeeded': len(images) - len(failed),
+        'skipped': len(skipped),
+        'failed': len(failed),
+        'failed_keys': failed
+    }
 
-def process_image(bucket_name, s3_key):
-    """Process a single image with Rekognition and store results"""
+# process_image reports failures by returning False instead of raising
+@metrics.timed('process_image', failed_result=lambda succeeded: not succeeded)
+def process_image(bucket_name, s3_key, event_object=None):
+    """
+    Process a single image with Rekognition and store results, returning
+    True on success. The image record, results, final status and log rows
+    are written in one transaction; the optional 'processing' marker adds
+    a second, earlier commit. event_object is the entry from
+    extract_images_from_event and saves the head_object call.
+    """
+    image_id = None
+    record = None
+    # Whether the image record existed before, possibly with results of an older version
+    existed = False
     try:
         logger.info(f"Starting Rekognition processing for {s3_key}")
         
-        # Get image metadata from S3
-        s3_response = s3.head_object(Bucket=bucket_name, Key=s3_key)
-        file_size = s3_response['ContentLength']
-        original_name = s3_response.get('Metadata', {}).get('original-name', s3_key.split('/')[-1])
-        upload_time = s3_response.get('Metadata', {}).get('upload-time')
+        # Get image metadata from the event or S3
+        metadata = get_image_metadata(bucket_name, s3_key, event_object)
+        cache_key = get_result_cache_key(metadata['etag'], metadata['file_size'])
+        record = (s3_key, metadata['original_name'], metadata['file_size'], metadata['upload_time'])
         
-        # Find or create image record in database
-        image_id = get_or_create_image_record(s3_key, original_name, file_size, upload_time)
-        
-        if not image_id:
-            logger.error(f"Failed to get/create image record for {s3_key}")
-            return
-        
-        # Update processing status
-        update_processing_status(image_id, 'processing', 'Lambda processing started')
-        
-        # Process with Rekognition
-        rekognition_results = perform_rekognition_analysis(bucket_name, s3_key)
-        
-        # Save results to database
-        save_rekognition_results(image_id, rekognition_results)
+        # Borrow a connection for the reads before Rekognition only. Giving it
+        # back rolls it back, so the write transaction below neither reads a
+        # snapshot older than the Rekognition call nor holds a pool slot during it.
+        rekognition_results = None
+        with db_manager.connection() as connection:
+            if MARK_PROCESSING_STATUS:
+                # Let readers see that work has started
+                with db_manager.transaction(connection):
+                    image_id, created = get_or_create_image_record(*record, connection=connection,
+                                                                   return_created=True)
+                    existed = not created
+                    if image_id:
+                        update_processing_status(image_id, 'processing', 'Lambda processing started',
+                                                 connection=connection)
+                if not image_id:
+                    logger.error(f"Failed to get/create image record for {s3_key}")
+                    return False
+            
+            # Reuse results of identical content, otherwise process with Rekognition
+            if cache_key:
+                rekognition_results = result_cache.get(cache_key, connection=connection)
+        cached = rekognition_results is not None
+        if cached:
+            logger.info(f"Reusing cached Rekognition results for {s3_key}")
+        else:
+            rekognition_results = perform_rekognition_analysis(bucket_name, s3_key,
+                                                               version=metadata['version'])
         
-        # Update final status
-        update_processing_status(image_id, 'completed', 'Processing completed successfully', datetime.utcnow())
+        # Save record, results, final status and log rows in one transaction.
+        # A record created here only exists once the transaction commits.
+        with db_manager.connection() as connection, db_manager.transaction(connection):
+            final_image_id = image_id
+            if final_image_id is None:
+                final_image_id, created = get_or_create_image_record(*record, connection=connection,
+                                                                     return_created=True)
+                if not final_image_id:
+                    logger.error(f"Failed to get/create image record for {s3_key}")
+                    return False
+                existed = not created
+            if existed:
+                # A new version of the key replaces the results of the old one
+                delete_rekognition_results(final_image_id, connection=connection)
+            save_rekognition_results(final_image_id, rekognition_results, connection=connection)
+            update_processing_status(final_image_id, 'completed',
+                                     'Processing completed successfully' + (' (cached results)' if cached else ''),
+                                     datetime.utcnow(), connection=connection,
+                                     source_version=get_source_version(metadata['version'], metadata['etag']))
+            # Deleting the old results also dropped the cache entries pointing at them
+            if cache_key and (existed or not cached):
+                result_cache.put(cache_key, final_image_id, rekognition_results, connection=connection)
         
         logger.info(f"Successfully processed {s3_key}")
+        return True
         
     except Exception as e:
         logger.error(f"Error processing image {s3_key}: {str(e)}")
-        if 'image_id' in locals():
-            update_processing_status(image_id, 'failed', f'Processing failed: {str(e)}')
+        mark_image_failed(image_id, record, f'Processing failed: {str(e)}')
+        return False
+
+def get_image_metadata(bucket_name, s3_key, event_object=None):
+    """
+    Return file size, original name, upload time and ETag of an image.
+    The S3 event already carries size and ETag, so head_object is only
+    called when READ_S3_METADATA asks for the custom metadata or the
+    event lacks the size.
+    """
+    event_object = event_object or {}
+    if not READ_S3_METADATA and event_object.get('size') is not None:
+        return {
+            'file_size': event_object['size'],
+            'original_name': s3_key.split('/')[-1],
+            'upload_time': parse_event_time(event_object.get('event_time')),
+            'etag': event_object.get('etag'),
+            'version': event_object.get('version')
+        }
+    
+    s3_response = get_aws_client('s3').head_object(Bucket=bucket_name, Key=s3_key)
+    return {
+        'file_size': s3_response['ContentLength'],
+        'original_name': s3_response.get('Metadata', {}).get('original-name', s3_key.split('/')[-1]),
+        'upload_time': s3_response.get('Metadata', {}).get('upload-time'),
+        'etag': s3_response.get('ETag'),
+        'version': s3_response.get('VersionId')
+    }
+
+def parse_event_time(event_time):
+    """Convert an S3 eventTime such as 2025-07-18T14:52:21.123Z to a datetime"""
+    if not event_time:
+        return None
+    try:
+        return datetime.strptime(event_time, '%Y-%m-%dT%H:%M:%S.%fZ')
+    except ValueError:
+        return None
+
+def mark_image_failed(image_id, record, message):
+    """Record a failed image, creating its row first if it was deferred"""
+    if image_id is None and record is None:
+        return
+    try:
+        with db_manager.transaction() as connection:
+            if image_id is None:
+                image_id = get_or_create_image_record(*record, connection=connection)
+            update_processing_status(image_id, 'failed', message, connection=connection)
+    except Exception as e:
+        logger.error(f"Error marking image as failed: {str(e)}")
+
+def call_rekognition(operation, **kwargs):
+    """
+    Call a Rekognition API through its rate limiter, retrying throttled
+    calls, connection errors and read timeouts
+    """
+    limiter = rekognition_limiters[operation]
+    client = get_aws_client('rekognition')
+    
+    def call():
+        waited = limiter.acquire()
+        if waited:
+            metrics.record('rate_limit_wait', waited * 1000)
+        response = getattr(client, operation)(**kwargs)
+        limiter.on_success()
+        return response
+    
+    def on_retry(error):
+        # Connection errors and timeouts carry no error code and say nothing about the quota
+        if aws_error_code(error) not in (None, 'ServiceUnavailableException'):
+            limiter.on_throttle()
+    
+    return retry_call(call, is_retryable_aws_error, f"Rekognition {operation}", on_retry)
+
+def rekognition_image(bucket_name, s3_key, version=None):
+    """Image argument of a Rekognition call, pinned to an object version when known"""
+    s3_object = {'Bucket': bucket_name, 'Name': s3_key}
+    if version:
+        s3_object['Version'] = version
+    return {'S3Object': s3_object}
+
+def detect_labels(bucket_name, s3_key, version=None):
+    """Detect object labels in an S3 image"""
+    logger.info("Detecting labels...")
+    labels_response = call_rekognition(
+        'detect_labels',
+        Image=rekognition_image(bucket_name, s3_key, version),
+        MaxLabels=20,
+        MinConfidence=70
+    )
+    return labels_response.get('Labels', [])
 
-def perform_rekognition_analysis(bucket_name, s3_key):
-    """Perform comprehensive Rekognition analysis"""
+def detect_faces(bucket_name, s3_key, version=None):
+    """Detect faces with all attributes in an S3 image"""
+    logger.info("Detecting faces...")
+    faces_response = call_rekognition(
+        'detect_faces',
+        Image=rekognition_image(bucket_name, s3_key, version),
+        Attributes=['ALL']
+    )
+    return faces_response.get('FaceDetails', [])
+
+@metrics.timed('rekognition')
+def perform_rekognition_analysis(bucket_name, s3_key, parallel=None, version=None):
+    """
+    Perform comprehensive Rekognition analysis of the given object version,
+    or the current one. In parallel mode detect_faces runs on a helper
+    thread while detect_labels runs here.
+    """
     results = {}
+    if parallel is None:
+        parallel = PARALLEL_REKOGNITION
     
     try:
-        # Detect labels
-        logger.info("Detecting labels...")
-        labels_response = rekognition.detect_labels(
-            Image={'S3Object': {'Bucket': bucket_name, 'Name': s3_key}},
-            MaxLabels=20,
-            MinConfidence=70
-        )
-        results['labels'] = labels_response.get('Labels', [])
-        
-        # Detect faces
-        logger.info("Detecting faces...")
-        faces_response = rekognition.detect_faces(
-            Image={'S3Object': {'Bucket': bucket_name, 'Name': s3_key}},
-            Attributes=['ALL']
-        )
-        results['faces'] = faces_response.get('FaceDetails', [])
+        if parallel:
+            faces_future = rekognition_executor.submit(detect_faces, bucket_name, s3_key, version)
+            results['labels'] = detect_labels(bucket_name, s3_key, version)
+            results['faces'] = faces_future.result()
+        else:
+            results['labels'] = detect_labels(bucket_name, s3_key, version)
+            results['faces'] = detect_faces(bucket_name, s3_key, version)
         
         # Extract person bounding boxes from labels
         person_boxes = []
@@ -140,22 +1022,27 @@ def perform_rekognition_analysis(bucket_name, s3_key):
         logger.error(f"Rekognition analysis failed: {str(e)}")
         raise
 
+@metrics.timed('db_connect')
 def get_database_connection():
-    """Create database connection"""
+    """Create a new database connection (use db_manager to reuse one)"""
     try:
-        connection = pymysql.connect(**DB_CONFIG)
+        with cold_start_phase('import_pymysql'):
+            import pymysql
+        with cold_start_phase('first_db_connect'):
+            connection = pymysql.connect(**DB_CONFIG)
         return connection
     except Exception as e:
         logger.error(f"Database connection failed: {str(e)}")
         raise
 
-def get_or_create_image_record(s3_key, original_name, file_size, upload_time):
-    """Get existing image record or create new one"""
-    connection = None
+def get_or_create_image_record(s3_key, original_name, file_size, upload_time, connection=None,
+                               return_created=False):
+    """
+    Get existing image record or create new one. With return_created the
+    result is (image_id, whether the record was created by this call).
+    """
     try:
-        connection = get_database_connection()
-        
-        with connection.cursor() as cursor:
+        with db_manager.transaction(connection) as connection, connection.cursor() as cursor:
             # Check if image already exists
             cursor.execute(
                 "SELECT id FROM images WHERE s3_key = %s",
@@ -165,7 +1052,7 @@ def get_or_create_image_record(s3_key, original_name, file_size, upload_time):
             
             if result:
                 logger.info(f"Found existing image record: {result[0]}")
-                return result[0]
+                return (result[0], False) if return_created else result[0]
             
             # Create new image record
             cursor.execute("""
@@ -180,33 +1067,30 @@ def get_or_create_image_record(s3_key, original_name, file_size, upload_time):
             ))
             
             image_id = cursor.lastrowid
-            connection.commit()
             
             logger.info(f"Created new image record: {image_id}")
-            return image_id
+            return (image_id, True) if return_created else image_id
             
     except Exception as e:
         logger.error(f"Database error in get_or_create_image_record: {str(e)}")
-        if connection:
-            connection.rollback()
         raise
-    finally:
-        if connection:
-            connection.close()
 
-def update_processing_status(image_id, status, message, processed_at=None):
-    """Update image processing status"""
-    connection = None
+def update_processing_status(image_id, status, message, processed_at=None, connection=None,
+                             source_version=None):
+    """
+    Update image processing status. Errors are only logged when the update
+    runs on its own, but raised when it is part of the caller's transaction.
+    source_version records which S3 object version a completed status is for.
+    """
+    standalone = connection is None
     try:
-        connection = get_database_connection()
-        
-        with connection.cursor() as cursor:
+        with db_manager.transaction(connection) as connection, connection.cursor() as cursor:
             if processed_at:
                 cursor.execute("""
                     UPDATE images 
-                    SET processing_status = %s, processed_at = %s
+                    SET processing_status = %s, processed_at = %s, source_version = %s
                     WHERE id = %s
-                """, (status, processed_at, image_id))
+                """, (status, processed_at, source_version, image_id))
             else:
                 cursor.execute("""
                     UPDATE images 
@@ -218,40 +1102,43 @@ def update_processing_status(image_id, status, message, processed_at=None):
             cursor.execute("""
                 INSERT INTO processing_logs (image_id, process_type, status, message, created_at)
                 VALUES (%s, %s, %s, %s, %s)
-            """, (image_id, 'rekognition', status, message, datetime.utcnow()))
-            
-            connection.commit()
+            """, (image_id, 'rekognition', PROCESSING_LOG_STATUS.get(status, status), message, datetime.utcnow()))
             
     except Exception as e:
         logger.error(f"Error updating processing status: {str(e)}")
-        if connection:
-            connection.rollback()
-    finally:
-        if connection:
-            connection.close()
+        if not standalone:
+            raise
+
+def delete_rekognition_results(image_id, connection=None):
+    """
+    Delete the stored results of an image and the result cache entries
+    pointing at them; face emotions go with their faces by cascade
+    """
+    with db_manager.transaction(connection) as connection, connection.cursor() as cursor:
+        for table in ('detection_labels', 'person_detections', 'face_detections', 'rekognition_result_cache'):
+            cursor.execute(f"DELETE FROM {table} WHERE image_id = %s", (image_id,))
 
-def save_rekognition_results(image_id, results):
-    """Save Rekognition results to database"""
-    connection = None
+@metrics.timed('save_results')
+def save_rekognition_results(image_id, results, connection=None):
+    """Save Rekognition results to database using one multi-row INSERT per table"""
     try:
-        connection = get_database_connection()
-        
-        with connection.cursor() as cursor:
+        with db_manager.transaction(connection) as connection, connection.cursor() as cursor:
             # Save labels
-            for label in results.get('labels', []):
-                cursor.execute("""
+            label_rows = [
+                (image_id, label['Name'], label['Confidence'])
+                for label in results.get('labels', [])
+            ]
+            if label_rows:
+                cursor.executemany("""
                     INSERT INTO detection_labels (image_id, label_name, confidence)
                     VALUES (%s, %s, %s)
-                """, (image_id, label['Name'], label['Confidence']))
+                """, label_rows)
             
             # Save person detections
+            person_rows = []
             for person in results.get('person_detections', []):
                 bbox = person['boundingBox']
-                cursor.execute("""
-                    INSERT INTO person_detections 
-                    (image_id, confidence, bbox_left, bbox_top, bbox_width, bbox_height)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (
+                person_rows.append((
                     image_id,
                     person['confidence'],
                     bbox['Left'],
@@ -259,21 +1146,22 @@ def save_rekognition_results(image_id, results):
                     bbox['Width'],
                     bbox['Height']
                 ))
+            if person_rows:
+                cursor.executemany("""
+                    INSERT INTO person_detections 
+                    (image_id, confidence, bbox_left, bbox_top, bbox_width, bbox_height)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, person_rows)
             
             # Save face detections
-            for face in results.get('faces', []):
+            faces = results.get('faces', [])
+            face_rows = []
+            for face in faces:
                 bbox = face['BoundingBox']
                 age_range = face.get('AgeRange', {})
                 gender = face.get('Gender', {})
                 emotions = face.get('Emotions', [])
-                
-                # Insert face detection
-                cursor.execute("""
-                    INSERT INTO face_detections 
-                    (image_id, confidence, bbox_left, bbox_top, bbox_width, bbox_height,
-                     age_low, age_high, gender, gender_confidence, primary_emotion, emotion_confidence)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
+                face_rows.append((
                     image_id,
                     face.get('Confidence', 0),
                     bbox['Left'],
@@ -287,24 +1175,101 @@ def save_rekognition_results(image_id, results):
                     emotions[0]['Type'] if emotions else None,
                     emotions[0]['Confidence'] if emotions else None
                 ))
-                
-                face_id = cursor.lastrowid
+            
+            if face_rows:
+                cursor.executemany("""
+                    INSERT INTO face_detections 
+                    (image_id, confidence, bbox_left, bbox_top, bbox_width, bbox_height,
+                     age_low, age_high, gender, gender_confidence, primary_emotion, emotion_confidence)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, face_rows)
                 
                 # Save all emotions
-                for emotion in emotions:
-                    cursor.execute("""
+                emotion_rows = []
+                face_ids = get_inserted_face_ids(cursor, image_id, cursor.lastrowid, len(face_rows))
+                for face_id, face in zip(face_ids, faces):
+                    for emotion in face.get('Emotions', []):
+                        emotion_rows.append((face_id, emotion['Type'], emotion['Confidence']))
+                if emotion_rows:
+                    cursor.executemany("""
                         INSERT INTO face_emotions (face_detection_id, emotion_type, confidence)
                         VALUES (%s, %s, %s)
-                    """, (face_id, emotion['Type'], emotion['Confidence']))
+                    """, emotion_rows)
             
-            connection.commit()
-            logger.info(f"Saved Rekognition results for image {image_id}")
+        logger.info(f"Saved Rekognition results for image {image_id}")
             
     except Exception as e:
         logger.error(f"Error saving Rekognition results: {str(e)}")
-        if connection:
-            connection.rollback()
         raise
-    finally:
-        if connection:
-            connection.close()
+
+def get_inserted_face_ids(cursor, image_id, first_id, count):
+    """
+    Return the ids of the face rows written by the last multi-row INSERT.
+    MySQL reports the id of the first row and hands out increasing ids
+    within one statement, so the rows at or after it map to the faces in
+    insert order.
+    """
+    cursor.execute("""
+        SELECT id FROM face_detections
+        WHERE image_id = %s AND id >= %s
+        ORDER BY id
+        LIMIT %s
+    """, (image_id, first_id, count))
+    face_ids = [row[0] for row in cursor.fetchall()]
+    if len(face_ids) != count:
+        raise RuntimeError(f"Expected {count} face rows for image {image_id}, found {len(face_ids)}")
+    return face_ids
+
+def load_rekognition_results(cursor, image_id):
+    """Rebuild the perform_rekognition_analysis result dict from stored rows"""
+    cursor.execute(
+        "SELECT label_name, confidence FROM detection_labels WHERE image_id = %s ORDER BY id",
+        (image_id,)
+    )
+    labels = [{'Name': name, 'Confidence': confidence} for name, confidence in cursor.fetchall()]
+    
+    cursor.execute("""
+        SELECT confidence, bbox_left, bbox_top, bbox_width, bbox_height
+        FROM person_detections WHERE image_id = %s ORDER BY id
+    """, (image_id,))
+    person_boxes = [{
+        'confidence': row[0],
+        'boundingBox': {'Left': row[1], 'Top': row[2], 'Width': row[3], 'Height': row[4]}
+    } for row in cursor.fetchall()]
+    
+    cursor.execute("""
+        SELECT id, confidence, bbox_left, bbox_top, bbox_width, bbox_height,
+               age_low, age_high, gender, gender_confidence
+        FROM face_detections WHERE image_id = %s ORDER BY id
+    """, (image_id,))
+    faces = OrderedDict()
+    for row in cursor.fetchall():
+        face = {
+            'Confidence': row[1],
+            'BoundingBox': {'Left': row[2], 'Top': row[3], 'Width': row[4], 'Height': row[5]},
+            'Emotions': []
+        }
+        if row[6] is not None or row[7] is not None:
+            face['AgeRange'] = {'Low': row[6], 'High': row[7]}
+        if row[8] is not None:
+            face['Gender'] = {'Value': row[8], 'Confidence': row[9]}
+        faces[row[0]] = face
+    
+    if faces:
+        cursor.execute("""
+            SELECT e.face_detection_id, e.emotion_type, e.confidence
+            FROM face_emotions e JOIN face_detections f ON f.id = e.face_detection_id
+            WHERE f.image_id = %s ORDER BY e.id
+        """, (image_id,))
+        for face_id, emotion_type, confidence in cursor.fetchall():
+            faces[face_id]['Emotions'].append({'Type': emotion_type, 'Confidence': confidence})
+    
+    return {
+        'labels': labels,
+        'faces': list(faces.values()),
+        'person_detections': person_boxes
+    }
+
+# Everything above ran as part of the module import
+cold_start_phases['module_init'] = round((time.perf_counter() - _module_load_started) * 1000, 2)
+cold_start_phases.move_to_end('module_init', last=False)
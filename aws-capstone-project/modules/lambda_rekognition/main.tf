@@ -26,6 +26,9 @@ resource "aws_lambda_function" "rekognition_function" {
       RDS_USERNAME   = var.db_username
       RDS_PASSWORD   = var.db_password
       S3_BUCKET_NAME = var.bucket_name
+
+      IMAGE_PROCESSING_CONCURRENCY = tostring(var.image_processing_concurrency)
+      REKOGNITION_TPS              = tostring(var.rekognition_tps)
     }
   }
 
@@ -0,0 +1,22 @@
+import pymysql
+import pytest
+
+import lambda_function
+from fakes import FakeDatabase, FakeRekognition, FakeS3
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(pymysql, 'connect', database.connect)
+    monkeypatch.setattr(lambda_function, 'db_manager', lambda_function.DatabaseConnectionManager())
+    monkeypatch.setattr(lambda_function, 'result_cache', lambda_function.build_result_cache())
+    return database
+
+
+@pytest.fixture
+def fake_aws(monkeypatch):
+    rekognition = FakeRekognition()
+    s3 = FakeS3()
+    monkeypatch.setattr(lambda_function, 'aws_clients', {'rekognition': rekognition, 's3': s3})
+    return rekognition, s3
@@ -0,0 +1,406 @@
+"""
+In-memory stand-ins for the services used by lambda_function.py.
+
+FakeDatabase mimics the parts of the pymysql API the Lambda uses on top of
+SQLite, using the schema from scripts/bastion_setup.sh, and counts every
+client/server round trip. FakeS3 and FakeRekognition return canned
+responses. Every fake accepts a latency in seconds or a distribution
+from parse_latency.
+"""
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+BASTION_SETUP = Path(__file__).resolve().parents[3] / 'scripts' / 'bastion_setup.sh'
+
+
+def load_schema(path=BASTION_SETUP):
+    """
+    Translate the MySQL schema embedded in bastion_setup.sh to SQLite, so
+    the stand-in always has the same tables and columns as RDS.
+    """
+    script = path.read_text()
+    sql = script.split('image_recognition_setup.sql << EOF', 1)[1].split('\nEOF', 1)[0]
+    tables = re.findall(r'CREATE TABLE IF NOT EXISTS .*?\n\);', sql, flags=re.S)
+    statements = []
+    for table in tables:
+        lines = []
+        for line in table.splitlines():
+            stripped = line.strip()
+            if stripped.startswith('INDEX ') or not stripped:
+                continue
+            line = line.replace('INT AUTO_INCREMENT PRIMARY KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT')
+            # Keep the ENUM value sets as CHECK constraints
+            line = re.sub(r'(\w+) ENUM\(([^)]*)\)', r'\1 TEXT CHECK (\1 IN (\2))', line)
+            line = line.replace(' ON UPDATE CURRENT_TIMESTAMP', '')
+            lines.append(line)
+        # Dropping the INDEX lines can leave a trailing comma before ");"
+        lines[-2] = lines[-2].rstrip().rstrip(',')
+        statements.append('\n'.join(lines))
+    return '\n'.join(statements)
+
+
+SCHEMA = load_schema()
+
+
+def parse_latency(spec):
+    """
+    Turn a latency spec in milliseconds into a callable returning seconds:
+    '100' or 'fixed:100', 'uniform:50:150', 'exp:100' (mean) or
+    'lognormal:100:0.5' (median and sigma).
+    """
+    kind, _, rest = str(spec).partition(':')
+    if not rest:
+        kind, rest = 'fixed', kind
+    values = [float(v) / 1000 for v in rest.split(':')]
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'exp':
+        return lambda: random.expovariate(1 / values[0]) if values[0] else 0.0
+    if kind == 'lognormal':
+        median, sigma = values[0], values[1] * 1000
+        return lambda: random.lognormvariate(0, sigma) * median
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def pause(latency):
+    """Sleep for a fixed latency in seconds or one drawn from parse_latency"""
+    seconds = latency() if callable(latency) else latency
+    if seconds:
+        time.sleep(seconds)
+
+
+class FakeOperationalError(Exception):
+    """Raised by the fake database to simulate a server-side failure"""
+
+
+class FakeClientError(Exception):
+    """Shaped like botocore.exceptions.ClientError"""
+
+    def __init__(self, code, operation):
+        super().__init__(f"An error occurred ({code}) when calling the {operation} operation")
+        self.response = {'Error': {'Code': code, 'Message': str(self)}}
+
+
+class FakeDatabase:
+    """SQLite-backed database shared by every FakeConnection it hands out"""
+
+    def __init__(self, connect_latency=0.0, query_latency=0.0, max_connections=None):
+        self.connect_latency = connect_latency
+        self.query_latency = query_latency
+        # Like max_connections on the server: further connects fail with 1040
+        self.max_connections = max_connections
+        self.open_connections = 0
+        self.peak_connections = 0
+        self.refused = 0
+        self.sqlite = sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None)
+        self.sqlite.executescript(SCHEMA)
+        # InnoDB enforces the foreign keys and their ON DELETE CASCADE
+        self.sqlite.execute("PRAGMA foreign_keys = ON")
+        # One writer at a time, like row locks on the tables we touch
+        self.write_lock = threading.RLock()
+        self.stats_lock = threading.Lock()
+        self.fail_next = None
+        self.connects = 0
+        self.round_trips = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self.statements = []
+
+    def connect(self, **kwargs):
+        """Drop-in replacement for pymysql.connect"""
+        self._count('connects')
+        pause(self.connect_latency)
+        self._opened()
+        return FakeConnection(self)
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.connects = self.round_trips = self.commits = self.rollbacks = 0
+            self.statements = []
+
+    def rows(self, sql, params=()):
+        """Read rows directly, bypassing the round-trip counters"""
+        with self.write_lock:
+            return self.sqlite.execute(sql, params).fetchall()
+
+    def _opened(self):
+        with self.stats_lock:
+            if self.max_connections is not None and self.open_connections >= self.max_connections:
+                self.refused += 1
+                raise FakeOperationalError(1040, 'Too many connections')
+            self.open_connections += 1
+            self.peak_connections = max(self.peak_connections, self.open_connections)
+
+    def _closed(self):
+        with self.stats_lock:
+            self.open_connections -= 1
+
+    def _count(self, attr, statement=None):
+        with self.stats_lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+            if attr not in ('connects', 'round_trips'):
+                self.round_trips += 1
+            if statement is not None:
+                self.statements.append(statement)
+
+
+class FakeConnection:
+    """Subset of pymysql.connections.Connection"""
+
+    def __init__(self, database):
+        self.database = database
+        self.open = True
+        # Like MySQL with autocommit off, any statement opens a transaction;
+        # only writes take the write lock
+        self.in_transaction = False
+        self._writing = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def ping(self, reconnect=True):
+        self.database._count('round_trips')
+        if not self.open:
+            if not reconnect:
+                raise FakeOperationalError('connection closed')
+            self.database._count('connects')
+            self.database._opened()
+            self.open = True
+
+    def commit(self):
+        self.database._count('commits')
+        self._end('COMMIT')
+
+    def rollback(self):
+        self.database._count('rollbacks')
+        self._end('ROLLBACK')
+
+    def close(self):
+        if self.in_transaction:
+            self._end('ROLLBACK')
+        if self.open:
+            self.database._closed()
+        self.open = False
+
+    def _begin(self, write=True):
+        if not self.open:
+            raise FakeOperationalError('connection closed')
+        self.in_transaction = True
+        if write and not self._writing:
+            self.database.write_lock.acquire()
+            self.database.sqlite.execute('BEGIN')
+            self._writing = True
+
+    def _end(self, statement):
+        if self._writing:
+            self.database.sqlite.execute(statement)
+            self._writing = False
+            self.database.write_lock.release()
+        self.in_transaction = False
+
+
+class FakeCursor:
+    """Subset of pymysql.cursors.Cursor"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.lastrowid = None
+        self.rowcount = -1
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args=()):
+        self._round_trip(query)
+        cursor = self._run(query, args)
+        self._rows = cursor.fetchall()
+        self.lastrowid = cursor.lastrowid
+        self.rowcount = cursor.rowcount
+        return self.rowcount
+
+    def executemany(self, query, args):
+        """One round trip for the whole batch, like pymysql's multi-row INSERT"""
+        args = list(args)
+        if not args:
+            return 0
+        self._round_trip(query)
+        first_id = None
+        for row in args:
+            cursor = self._run(query, row)
+            if first_id is None:
+                first_id = cursor.lastrowid
+        # MySQL reports the id of the first row of a multi-row INSERT
+        self.lastrowid = first_id
+        self.rowcount = len(args)
+        self._rows = []
+        return self.rowcount
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return tuple(rows)
+
+    def _round_trip(self, query):
+        database = self.connection.database
+        database._count('round_trips', ' '.join(query.split()))
+        pause(database.query_latency)
+        if database.fail_next and database.fail_next in query:
+            database.fail_next = None
+            raise FakeOperationalError(f'simulated failure for: {query.strip()[:40]}')
+
+    def _run(self, query, args):
+        database = self.connection.database
+        params = tuple(a.isoformat(' ') if isinstance(a, datetime) else a for a in (args or ()))
+        query = query.replace('%s', '?')
+        if query.lstrip().upper().startswith('SELECT') and not self.connection._writing:
+            # Reads open a transaction but take no locks beyond the statement itself
+            self.connection._begin(write=False)
+            with database.write_lock:
+                cursor = database.sqlite.execute(query, params)
+                return _Result(cursor.fetchall(), cursor.lastrowid, cursor.rowcount)
+        self.connection._begin()
+        return database.sqlite.execute(query, params)
+
+
+class _Result:
+    """Already fetched rows of a statement run outside a transaction"""
+
+    def __init__(self, rows, lastrowid, rowcount):
+        self._rows = rows
+        self.lastrowid = lastrowid
+        self.rowcount = rowcount
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeS3:
+    """Canned head_object responses with a per-call counter"""
+
+    def __init__(self, latency=0.0, size=1024, metadata=None):
+        self.latency = latency
+        self.size = size
+        self.metadata = metadata or {}
+        self.etags = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _record(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        pause(self.latency)
+
+    def head_object(self, Bucket, Key):
+        self._record('head_object')
+        return {'ContentLength': self.size, 'ETag': f'"{self.etags.get(Key, "etag-" + Key)}"',
+                'Metadata': dict(self.metadata)}
+
+
+def make_face(emotions=('HAPPY', 'CALM'), confidence=99.0):
+    return {
+        'Confidence': confidence,
+        'BoundingBox': {'Left': 0.1, 'Top': 0.2, 'Width': 0.3, 'Height': 0.4},
+        'AgeRange': {'Low': 20, 'High': 30},
+        'Gender': {'Value': 'Female', 'Confidence': 98.0},
+        'Emotions': [{'Type': e, 'Confidence': 90.0 - i} for i, e in enumerate(emotions)],
+    }
+
+
+def make_labels(count=5, people=2):
+    labels = [{
+        'Name': 'Person',
+        'Confidence': 99.0,
+        'Instances': [{
+            'Confidence': 95.0,
+            'BoundingBox': {'Left': 0.1 * i, 'Top': 0.1, 'Width': 0.2, 'Height': 0.5},
+        } for i in range(people)],
+    }]
+    labels += [{'Name': f'Label{i}', 'Confidence': 80.0, 'Instances': []} for i in range(count - 1)]
+    return labels
+
+
+class FakeRekognition:
+    """
+    detect_labels/detect_faces with injected latency and call counters.
+    With tps set, each API accepts that many calls per rolling second and
+    throttles the rest with ThrottlingException, like the account quota.
+    throttle_first throttles that many calls of each API unconditionally.
+    """
+
+    def __init__(self, labels=None, faces=None, latency=0.0, fail_keys=(), tps=None, throttle_first=0):
+        self.labels = make_labels() if labels is None else labels
+        self.faces = [make_face(), make_face(('SAD',))] if faces is None else faces
+        self.latency = latency
+        self.fail_keys = set(fail_keys)
+        self.tps = tps
+        self.throttle_first = throttle_first
+        self.calls = {}
+        self.images = []
+        self.throttled = {}
+        self._accepted = {}
+        self._lock = threading.Lock()
+
+    def _record(self, name, image):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.images.append(image)
+            if self.calls[name] <= self.throttle_first:
+                self.throttled[name] = self.throttled.get(name, 0) + 1
+                raise FakeClientError('ThrottlingException', name)
+            if self.tps is not None:
+                now = time.monotonic()
+                window = [t for t in self._accepted.get(name, []) if now - t < 1.0]
+                if len(window) >= self.tps:
+                    self.throttled[name] = self.throttled.get(name, 0) + 1
+                    raise FakeClientError('ThrottlingException', name)
+                self._accepted[name] = window + [now]
+        pause(self.latency)
+        if image['S3Object']['Name'] in self.fail_keys:
+            raise RuntimeError(f"InvalidImageFormatException: {image['S3Object']['Name']}")
+
+    def detect_labels(self, Image, MaxLabels=None, MinConfidence=None):
+        self._record('detect_labels', Image)
+        return {'Labels': self.labels}
+
+    def detect_faces(self, Image, Attributes=None):
+        self._record('detect_faces', Image)
+        return {'FaceDetails': self.faces}
+
+
+def make_s3_record(key, bucket='bucket', size=1024, event_name='ObjectCreated:Put', **object_fields):
+    return {
+        'eventName': event_name,
+        'eventTime': '2025-07-18T14:52:21.123Z',
+        's3': {
+            'bucket': {'name': bucket},
+            'object': {'key': key, 'size': size, 'eTag': f'etag-{key}', **object_fields},
+        },
+    }
+
+
+def make_sns_event(keys, bucket='bucket', records_per_message=None):
+    """SNS event wrapping S3 ObjectCreated notifications for the given keys"""
+    keys = list(keys)
+    per_message = records_per_message or max(len(keys), 1)
+    messages = [keys[i:i + per_message] for i in range(0, len(keys), per_message)] or [[]]
+    return {'Records': [{
+        'EventSource': 'aws:sns',
+        'Sns': {
+            'MessageId': f'message-{n}',
+            'Message': json.dumps({'Records': [make_s3_record(k, bucket) for k in chunk]}),
+        },
+    } for n, chunk in enumerate(messages)]}
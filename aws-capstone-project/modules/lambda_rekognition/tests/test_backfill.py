@@ -0,0 +1,100 @@
+import json
+
+import boto3
+import pytest
+from moto import mock_aws
+
+import backfill
+import lambda_function
+
+
+@pytest.fixture
+def bucket(fake_db, fake_aws, monkeypatch):
+    with mock_aws():
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket='images')
+        for i in range(7):
+            s3.put_object(Bucket='images', Key=f'uploads/{i}.jpg', Body=f'image {i}'.encode())
+        s3.put_object(Bucket='images', Key='uploads/notes.txt', Body=b'not an image')
+        monkeypatch.setitem(lambda_function.aws_clients, 's3', s3)
+        yield s3
+
+
+def run(tmp_path, **kwargs):
+    return backfill.run_backfill('images', 'uploads/', workers=2, checkpoint_path=tmp_path / 'cp.json',
+                                 page_size=3, progress=lambda message: None, **kwargs)
+
+
+def test_backfill_processes_every_image(bucket, fake_db, fake_aws, tmp_path):
+    state = run(tmp_path)
+
+    assert (state['listed'], state['succeeded'], state['failed']) == (8, 7, 0)
+    assert fake_db.rows("SELECT COUNT(*) FROM images WHERE processing_status = 'completed'") == [(7,)]
+    assert json.loads((tmp_path / 'cp.json').read_text())['last_key'] == 'uploads/notes.txt'
+
+
+def test_backfill_resumes_from_checkpoint(bucket, fake_db, fake_aws, tmp_path):
+    rekognition, _ = fake_aws
+    pages = []
+
+    def stop_after_first_page(message):
+        pages.append(message)
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        backfill.run_backfill('images', 'uploads/', workers=2, checkpoint_path=tmp_path / 'cp.json',
+                              page_size=3, progress=stop_after_first_page)
+    assert rekognition.calls['detect_labels'] == 3
+
+    state = run(tmp_path)
+
+    assert state['succeeded'] == 7
+    assert rekognition.calls['detect_labels'] == 7
+
+
+def test_backfill_skips_completed_images(bucket, fake_db, fake_aws, tmp_path):
+    rekognition, _ = fake_aws
+    run(tmp_path)
+    (tmp_path / 'cp.json').unlink()
+    bucket.put_object(Bucket='images', Key='uploads/2.jpg', Body=b'changed')
+
+    state = run(tmp_path)
+
+    assert (state['succeeded'], state['skipped']) == (1, 6)
+    assert rekognition.calls['detect_labels'] == 8
+
+
+def test_versioned_bucket_skips_images_the_lambda_completed(bucket, fake_db, fake_aws, tmp_path):
+    rekognition, _ = fake_aws
+    bucket.put_bucket_versioning(Bucket='images', VersioningConfiguration={'Status': 'Enabled'})
+    images = []
+    for i in range(7):
+        response = bucket.put_object(Bucket='images', Key=f'uploads/{i}.jpg', Body=f'image {i}'.encode())
+        # S3 events of a versioned bucket carry the version ID
+        images.append({'bucket': 'images', 'key': f'uploads/{i}.jpg', 'size': 7, 'etag': response['ETag'],
+                       'version': response['VersionId']})
+    lambda_function.process_images(images)
+    bucket.delete_object(Bucket='images', Key='uploads/3.jpg')
+
+    state = run(tmp_path)
+
+    assert (state['succeeded'], state['skipped']) == (0, 6)
+    assert rekognition.calls['detect_labels'] == 7
+
+
+def test_failed_keys_go_to_their_own_file(bucket, fake_db, fake_aws, tmp_path, monkeypatch):
+    rekognition, _ = fake_aws
+    rekognition.fail_keys = {f'uploads/{i}.jpg' for i in range(5)}
+    monkeypatch.setattr(backfill, 'FAILED_KEYS_SAMPLE', 2)
+
+    state = run(tmp_path)
+
+    assert state['failed'] == 5
+    assert json.loads((tmp_path / 'cp.json').read_text())['failed_keys'] == ['uploads/0.jpg', 'uploads/1.jpg']
+    assert (tmp_path / 'cp.json.failed').read_text().split() == [f'uploads/{i}.jpg' for i in range(5)]
+
+
+def test_checkpoint_of_another_bucket_is_rejected(tmp_path):
+    backfill.Checkpoint(tmp_path / 'cp.json', 'images', 'uploads/').save()
+
+    with pytest.raises(ValueError):
+        backfill.Checkpoint(tmp_path / 'cp.json', 'other', 'uploads/')
@@ -0,0 +1,42 @@
+import lambda_function
+from fakes import make_face, make_labels
+
+
+def make_results(faces):
+    labels = make_labels(count=20, people=3)
+    return {
+        'labels': labels,
+        'faces': faces,
+        'person_detections': [
+            {'confidence': i['Confidence'], 'boundingBox': i['BoundingBox']}
+            for i in labels[0]['Instances']
+        ],
+    }
+
+
+def test_emotions_map_to_their_faces(fake_db):
+    faces = [make_face(('HAPPY', 'CALM')), make_face(('SAD',)), make_face(('ANGRY', 'FEAR', 'CALM'))]
+    with fake_db.sqlite:
+        fake_db.sqlite.execute("INSERT INTO images (s3_key, original_name) VALUES ('a', 'a')")
+
+    lambda_function.save_rekognition_results(1, make_results(faces))
+
+    rows = fake_db.rows("""
+        SELECT f.primary_emotion, e.emotion_type FROM face_emotions e
+        JOIN face_detections f ON f.id = e.face_detection_id ORDER BY e.id
+    """)
+    assert rows == [('HAPPY', 'HAPPY'), ('HAPPY', 'CALM'), ('SAD', 'SAD'),
+                    ('ANGRY', 'ANGRY'), ('ANGRY', 'FEAR'), ('ANGRY', 'CALM')]
+
+
+def test_round_trips_do_not_grow_with_detections(fake_db):
+    faces = [make_face(('HAPPY', 'CALM', 'SAD', 'ANGRY', 'FEAR', 'DISGUSTED', 'SURPRISED', 'CONFUSED'))] * 5
+    with fake_db.sqlite:
+        fake_db.sqlite.execute("INSERT INTO images (s3_key, original_name) VALUES ('a', 'a')")
+    fake_db.reset_stats()
+
+    lambda_function.save_rekognition_results(1, make_results(faces))
+
+    # labels, people, faces, face id lookup, emotions + commit, rollback before reuse
+    assert fake_db.round_trips == 7
+    assert fake_db.rows("SELECT COUNT(*) FROM face_emotions") == [(40,)]
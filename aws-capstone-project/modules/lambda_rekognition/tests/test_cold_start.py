@@ -0,0 +1,43 @@
+import json
+import subprocess
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+import lambda_function
+from fakes import make_sns_event
+
+MODULE_DIR = Path(lambda_function.__file__).resolve().parent
+
+
+def test_filtered_event_does_not_load_clients():
+    event = make_sns_event([])
+    script = (
+        "import sys, lambda_function\n"
+        f"lambda_function.lambda_handler({event!r}, None)\n"
+        "print(sorted(m for m in ('boto3', 'pymysql') if m in sys.modules))\n"
+        "print(list(lambda_function.cold_start_phases))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', script], cwd=MODULE_DIR, check=True,
+                            capture_output=True, text=True).stdout.splitlines()
+
+    assert output == ['[]', "['module_init']"]
+
+
+def test_cold_start_phases_logged_once(fake_db, fake_aws, monkeypatch, caplog):
+    monkeypatch.setattr(lambda_function, '_cold_start_logged_phases', set())
+    monkeypatch.setattr(lambda_function, 'cold_start_phases', OrderedDict(lambda_function.cold_start_phases))
+    event = make_sns_event(['a.jpg'])
+
+    with caplog.at_level('INFO'):
+        lambda_function.lambda_handler(event, None)
+        lambda_function.lambda_handler(event, None)
+        # e.g. a client first needed by a later invocation
+        with lambda_function.cold_start_phase('client_sns'):
+            pass
+        lambda_function.lambda_handler(event, None)
+
+    logged = [json.loads(r.message) for r in caplog.records if 'cold_start_phases_ms' in r.message]
+    assert len(logged) == 2
+    assert 'module_init' in logged[0]['cold_start_phases_ms']
+    assert list(logged[1]['cold_start_phases_ms']) == ['client_sns']
@@ -0,0 +1,67 @@
+import json
+import time
+
+import pytest
+
+import lambda_function
+from fakes import make_s3_record, make_sns_event
+
+
+def test_failed_image_is_isolated_and_reported(fake_db, fake_aws, monkeypatch):
+    rekognition, _ = fake_aws
+    rekognition.fail_keys = {'uploads/3.jpg'}
+    monkeypatch.setattr(lambda_function, 'IMAGE_PROCESSING_CONCURRENCY', 4)
+    event = make_sns_event([f'uploads/{i}.jpg' for i in range(6)], records_per_message=2)
+
+    with pytest.raises(lambda_function.BatchProcessingError) as error:
+        lambda_function.lambda_handler(event, None)
+
+    # the whole batch is processed before the invocation fails
+    assert error.value.summary == {
+        'processed': 6, 'succeeded': 5, 'skipped': 0, 'failed': 1, 'failed_keys': ['uploads/3.jpg'],
+        'failed_records': [{'key': 'uploads/3.jpg', 'reason': 'processing failed'}]
+    }
+    statuses = dict(fake_db.rows("SELECT s3_key, processing_status FROM images"))
+    assert statuses['uploads/3.jpg'] == 'failed'
+    assert list(statuses.values()).count('completed') == 5
+
+
+def test_duplicate_records_processed_once():
+    event = make_sns_event(['a.jpg', 'b.jpg', 'a.jpg'], records_per_message=1)
+    images = lambda_function.extract_images_from_event(event)
+    assert [(i['bucket'], i['key']) for i in images] == [('bucket', 'a.jpg'), ('bucket', 'b.jpg')]
+
+
+def test_duplicate_key_keeps_latest_write():
+    records = [make_s3_record('a.jpg', versionId='v2', sequencer='0055AED6DCD90281E6'),
+               make_s3_record('b.jpg'),
+               # an older write delivered later; a shorter sequencer is padded on the right
+               make_s3_record('a.jpg', versionId='v1', sequencer='0055AED6DCD902'),
+               make_s3_record('b.jpg', versionId='v3', sequencer='0055AED6DCD90281E7')]
+    event = {'Records': [{'EventSource': 'aws:sns', 'Sns': {'Message': json.dumps({'Records': records})}}]}
+
+    images = lambda_function.extract_images_from_event(event)
+    assert [(i['key'], i['version']) for i in images] == [('a.jpg', 'v2'), ('b.jpg', 'v3')]
+
+
+def test_known_version_is_analysed(fake_db, fake_aws):
+    rekognition, _ = fake_aws
+    lambda_function.process_images([{'bucket': 'bucket', 'key': 'a.jpg', 'size': 10, 'etag': 'a', 'version': 'v2'},
+                                    {'bucket': 'bucket', 'key': 'b.jpg', 'size': 10, 'etag': 'b'}])
+
+    versions = {(image['S3Object']['Name'], image['S3Object'].get('Version')) for image in rekognition.images}
+    assert versions == {('a.jpg', 'v2'), ('b.jpg', None)}
+
+
+def test_worker_pool_overlaps_rekognition_latency(fake_db, fake_aws):
+    rekognition, _ = fake_aws
+    rekognition.latency = 0.05
+    images = [{'bucket': 'bucket', 'key': f'uploads/{i}.jpg'} for i in range(8)]
+
+    start = time.perf_counter()
+    summary = lambda_function.process_images(images, max_workers=8)
+    elapsed = time.perf_counter() - start
+
+    assert summary['succeeded'] == 8
+    # sequentially this takes 8 images * 2 calls * 50 ms = 800 ms
+    assert elapsed < 0.4
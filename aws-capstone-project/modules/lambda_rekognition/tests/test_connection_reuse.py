@@ -0,0 +1,92 @@
+import pytest
+
+import lambda_function
+
+
+def test_one_connection_for_many_images(fake_db, fake_aws):
+    for i in range(5):
+        lambda_function.process_image('bucket', f'uploads/{i}.jpg')
+
+    assert fake_db.connects == 1
+    statuses = fake_db.rows("SELECT processing_status FROM images")
+    assert statuses == [('completed',)] * 5
+
+
+def test_results_and_final_status_share_a_transaction(fake_db, fake_aws):
+    lambda_function.process_image('bucket', 'uploads/a.jpg')
+
+    # record with 'processing' marker, then results + 'completed' together
+    assert fake_db.commits == 2
+    labels = fake_db.rows("SELECT COUNT(*) FROM detection_labels")
+    assert labels == [(5,)]
+
+
+def test_connection_reused_after_failed_image(fake_db, fake_aws):
+    fake_db.fail_next = 'INSERT INTO face_detections'
+    lambda_function.process_image('bucket', 'uploads/bad.jpg')
+    lambda_function.process_image('bucket', 'uploads/good.jpg')
+
+    rows = dict(fake_db.rows("SELECT s3_key, processing_status FROM images"))
+    assert rows == {'uploads/bad.jpg': 'failed', 'uploads/good.jpg': 'completed'}
+    # the failed transaction left no partial results behind
+    bad_labels = fake_db.rows(
+        "SELECT COUNT(*) FROM detection_labels d JOIN images i ON i.id = d.image_id "
+        "WHERE i.s3_key = 'uploads/bad.jpg'")
+    assert bad_labels == [(0,)]
+    assert fake_db.connects == 1
+
+
+def test_stale_connection_is_replaced(fake_db, fake_aws):
+    manager = lambda_function.db_manager
+    connection = manager.acquire()
+    manager.release(connection)
+    connection.ping = lambda reconnect=True: (_ for _ in ()).throw(OSError('gone'))
+
+    assert manager.acquire() is not connection
+    assert fake_db.connects == 2
+
+
+def test_nested_transaction_commits_once(fake_db):
+    manager = lambda_function.db_manager
+    with manager.transaction() as connection:
+        with manager.transaction(connection):
+            pass
+    assert fake_db.commits == 1
+
+
+def test_reads_leave_no_transaction_on_idle_connections(fake_db, fake_aws):
+    image = {'bucket': 'bucket', 'key': 'a.jpg', 'size': 10, 'etag': 'e1'}
+    lambda_function.process_images([image])
+    # a redelivery where every image is skipped only reads
+    assert lambda_function.process_images([image])['skipped'] == 1
+    lambda_function.DatabaseResultStore().get('e1:10')
+
+    idle = lambda_function.db_manager._idle
+    assert idle and not any(connection.in_transaction for connection in idle)
+
+
+def test_select_outside_a_transaction_opens_one(fake_db):
+    connection = fake_db.connect()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM images")
+    assert connection.in_transaction
+    connection.rollback()
+    assert not connection.in_transaction
+
+
+@pytest.mark.parametrize('mark_processing', [True, False])
+def test_no_connection_is_held_during_rekognition(fake_db, fake_aws, monkeypatch, mark_processing):
+    manager = lambda_function.DatabaseConnectionManager(max_connections=1, acquire_timeout=0.1)
+    monkeypatch.setattr(lambda_function, 'db_manager', manager)
+    monkeypatch.setattr(lambda_function, 'MARK_PROCESSING_STATUS', mark_processing)
+    analyse = lambda_function.perform_rekognition_analysis
+
+    def analyse_with_free_slot(*args, **kwargs):
+        # times out if process_image still holds the only connection
+        with manager.connection():
+            pass
+        return analyse(*args, **kwargs)
+    monkeypatch.setattr(lambda_function, 'perform_rekognition_analysis', analyse_with_free_slot)
+
+    assert lambda_function.process_image('bucket', 'a.jpg', {'size': 10, 'etag': 'a'})
+    assert fake_db.rows("SELECT processing_status FROM images") == [('completed',)]
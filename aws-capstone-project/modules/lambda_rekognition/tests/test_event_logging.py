@@ -0,0 +1,58 @@
+import json
+import logging
+
+import pytest
+
+import lambda_function
+from fakes import make_sns_event
+
+
+def event_logs(caplog):
+    return [r.getMessage() for r in caplog.records if 'etag-' in r.getMessage()]
+
+
+def test_summary_mode_logs_a_sample(fake_db, fake_aws, caplog, monkeypatch):
+    monkeypatch.setattr(lambda_function, 'EVENT_LOG_SAMPLE_RECORDS', 2)
+    caplog.set_level(logging.INFO)
+
+    lambda_function.lambda_handler(make_sns_event([f'{i}.jpg' for i in range(10)]), None)
+
+    assert event_logs(caplog) == ['{"images":10,"sample":[["0.jpg",1024,"etag-0.jpg"],["1.jpg",1024,"etag-1.jpg"]]}']
+
+
+def test_full_event_logged_on_failure(fake_db, fake_aws, caplog):
+    rekognition, _ = fake_aws
+    rekognition.fail_keys = {'1.jpg'}
+    caplog.set_level(logging.INFO)
+    event = make_sns_event(['0.jpg', '1.jpg'])
+
+    with pytest.raises(lambda_function.BatchProcessingError):
+        lambda_function.lambda_handler(event, None)
+
+    failed = [r.getMessage() for r in caplog.records if r.getMessage().startswith('Failed event: ')]
+    assert len(failed) == 1
+    assert json.loads(failed[0][len('Failed event: '):]) == event
+
+
+def test_full_mode_logs_event_once(fake_db, fake_aws, caplog, monkeypatch):
+    rekognition, _ = fake_aws
+    rekognition.fail_keys = {'0.jpg'}
+    monkeypatch.setattr(lambda_function, 'EVENT_LOG_MODE', 'full')
+    caplog.set_level(logging.INFO)
+
+    with pytest.raises(lambda_function.BatchProcessingError):
+        lambda_function.lambda_handler(make_sns_event(['0.jpg']), None)
+
+    assert len(event_logs(caplog)) == 1
+    assert event_logs(caplog)[0].startswith('Lambda triggered with event: ')
+
+
+def test_off_mode_logs_no_event(fake_db, fake_aws, caplog, monkeypatch):
+    monkeypatch.setattr(lambda_function, 'EVENT_LOG_MODE', 'off')
+    caplog.set_level(logging.INFO)
+
+    with pytest.raises(TypeError):
+        lambda_function.lambda_handler({'Records': None}, None)
+
+    assert event_logs(caplog) == []
+    assert not any(r.getMessage().startswith('Failed event') for r in caplog.records)
@@ -0,0 +1,38 @@
+import lambda_function
+from fakes import make_sns_event
+
+
+def test_event_payload_replaces_head_object(fake_db, fake_aws):
+    _, s3 = fake_aws
+    event = make_sns_event([f'uploads/{i}.jpg' for i in range(3)])
+
+    lambda_function.lambda_handler(event, None)
+
+    assert s3.calls.get('head_object', 0) == 0
+    rows = fake_db.rows("SELECT original_name, file_size, upload_time FROM images ORDER BY original_name")
+    assert rows[0] == ('0.jpg', 1024, '2025-07-18 14:52:21.123000')
+
+
+def test_head_object_used_when_metadata_configured(fake_db, fake_aws, monkeypatch):
+    _, s3 = fake_aws
+    s3.metadata = {'original-name': 'holiday.jpg'}
+    monkeypatch.setattr(lambda_function, 'READ_S3_METADATA', True)
+
+    lambda_function.lambda_handler(make_sns_event(['uploads/x.jpg']), None)
+
+    assert s3.calls['head_object'] == 1
+    assert fake_db.rows("SELECT original_name FROM images") == [('holiday.jpg',)]
+
+
+def test_event_etag_keys_the_result_cache(fake_db, fake_aws):
+    rekognition, _ = fake_aws
+    first = make_sns_event(['a.jpg'])
+    second = make_sns_event(['b.jpg'])
+    # same bytes uploaded under a new key
+    second_message = second['Records'][0]['Sns']['Message'].replace('etag-b.jpg', 'etag-a.jpg')
+    second['Records'][0]['Sns']['Message'] = second_message
+
+    lambda_function.lambda_handler(first, None)
+    lambda_function.lambda_handler(second, None)
+
+    assert rekognition.calls['detect_labels'] == 1
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import lambda_function
+from fakes import make_sns_event
+
+
+def test_redelivered_event_skips_completed_images(fake_db, fake_aws):
+    rekognition, _ = fake_aws
+    event = make_sns_event([f'uploads/{i}.jpg' for i in range(3)])
+
+    lambda_function.lambda_handler(event, None)
+    response = lambda_function.lambda_handler(event, None)
+
+    body = json.loads(response['body'])
+    assert body['processed'] == 0
+    assert body['skipped'] == 3
+    assert rekognition.calls == {'detect_labels': 3, 'detect_faces': 3}
+    assert fake_db.rows("SELECT COUNT(*) FROM detection_labels") == [(15,)]
+
+
+def test_failed_images_are_retried_on_redelivery(fake_db, fake_aws):
+    rekognition, _ = fake_aws
+    rekognition.fail_keys = {'uploads/1.jpg'}
+    event = make_sns_event([f'uploads/{i}.jpg' for i in range(3)])
+    with pytest.raises(lambda_function.BatchProcessingError):
+        lambda_function.lambda_handler(event, None)
+
+    rekognition.fail_keys = set()
+    body = json.loads(lambda_function.lambda_handler(event, None)['body'])
+
+    assert (body['processed'], body['succeeded'], body['skipped']) == (1, 1, 2)
+    assert fake_db.rows("SELECT processing_status FROM images WHERE s3_key = 'uploads/1.jpg'") == [('completed',)]
+
+
+def test_new_version_of_a_key_is_processed(fake_db, fake_aws):
+    image = {'bucket': 'bucket', 'key': 'a.jpg', 'size': 10, 'etag': '"v1"'}
+    lambda_function.process_images([image])
+
+    assert lambda_function.process_images([image])['skipped'] == 1
+    assert lambda_function.process_images([dict(image, etag='"v2"')])['succeeded'] == 1
+    assert fake_db.rows("SELECT source_version FROM images") == [('v2',)]
+    # The results of v2 replace those of v1 instead of being added to them
+    for table, count in (('detection_labels', 5), ('person_detections', 2),
+                         ('face_detections', 2), ('face_emotions', 3)):
+        assert fake_db.rows(f"SELECT COUNT(*) FROM {table}") == [(count,)], table
+    assert fake_db.rows("SELECT content_key FROM rekognition_result_cache") == [('v2:10',)]
+
+
+def test_version_id_takes_precedence_over_etag(fake_db, fake_aws):
+    image = {'bucket': 'bucket', 'key': 'a.jpg', 'size': 10, 'etag': 'same', 'version': 'v1'}
+    lambda_function.process_images([image])
+
+    assert lambda_function.process_images([dict(image, version='v2')])['succeeded'] == 1
+    assert fake_db.rows("SELECT source_version FROM images") == [('v2',)]
+
+
+def test_completed_check_is_one_query(fake_db, fake_aws):
+    images = [{'bucket': 'bucket', 'key': f'{i}.jpg', 'size': 10, 'etag': f'e{i}'} for i in range(5)]
+    lambda_function.process_images(images)
+    fake_db.reset_stats()
+
+    lambda_function.process_images(images)
+
+    # liveness ping of the reused connection, one SELECT and the rollback ending its read
+    assert fake_db.round_trips == 3
+    assert [s.split()[0] for s in fake_db.statements] == ['SELECT']
+
+
+def test_malformed_record_fails_alone(fake_db, fake_aws):
+    event = make_sns_event(['good.jpg', 'other.jpg'], records_per_message=1)
+    event['Records'][0]['Sns']['Message'] = 'not json'
+
+    with pytest.raises(lambda_function.BatchProcessingError) as error:
+        lambda_function.lambda_handler(event, None)
+
+    body = error.value.summary
+    assert body['succeeded'] == 1
+    assert body['failed_records'][0]['message_id'] == 'message-0'
+    assert fake_db.rows("SELECT s3_key FROM images") == [('other.jpg',)]
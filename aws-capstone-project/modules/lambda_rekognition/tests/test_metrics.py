@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import lambda_function
+from fakes import make_sns_event
+
+
+class Context:
+    function_name = 'rekognition-image-processor'
+
+
+def emf_lines(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"FunctionName"')]
+
+
+def test_one_emf_line_per_invocation(fake_db, fake_aws, capsys):
+    lambda_function.metrics.flush()
+    lambda_function.lambda_handler(make_sns_event(['a.jpg', 'b.jpg']), Context())
+
+    lines = emf_lines(capsys.readouterr().out)
+    assert len(lines) == 1
+    record = lines[0]
+    assert record['FunctionName'] == 'rekognition-image-processor'
+    assert record['process_image_count'] == 2
+    assert record['rekognition_count'] == 2
+    assert record['save_results_count'] == 2
+    assert len(record['process_image_ms']) == 2
+    names = {m['Name'] for m in record['_aws']['CloudWatchMetrics'][0]['Metrics']}
+    assert {'process_image_ms', 'db_connect_ms', 'save_results_errors'} <= names
+
+
+def test_phase_errors_are_counted():
+    metrics = lambda_function.PhaseMetrics(enabled=True)
+
+    @metrics.timed('flaky')
+    def flaky():
+        raise ValueError('boom')
+
+    try:
+        flaky()
+    except ValueError:
+        pass
+    record = json.loads(metrics.flush())
+    assert record['flaky_count'] == 1
+    assert record['flaky_errors'] == 1
+
+
+def test_failed_images_are_counted(fake_db, fake_aws, capsys):
+    rekognition, _ = fake_aws
+    rekognition.fail_keys = {'bad.jpg'}
+    lambda_function.metrics.flush()
+
+    with pytest.raises(lambda_function.BatchProcessingError):
+        lambda_function.lambda_handler(make_sns_event(['a.jpg', 'bad.jpg']), Context())
+
+    [record] = emf_lines(capsys.readouterr().out)
+    assert record['process_image_count'] == 2
+    assert record['process_image_errors'] == 1
+
+
+def test_disabled_metrics_emit_nothing(fake_db, fake_aws, capsys, monkeypatch):
+    monkeypatch.setattr(lambda_function.metrics, 'enabled', False)
+
+    lambda_function.lambda_handler(make_sns_event(['a.jpg']), Context())
+
+    assert emf_lines(capsys.readouterr().out) == []
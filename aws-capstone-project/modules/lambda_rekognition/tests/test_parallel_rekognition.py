@@ -0,0 +1,23 @@
+import time
+
+import lambda_function
+
+
+def test_parallel_analysis_matches_sequential(fake_aws):
+    sequential = lambda_function.perform_rekognition_analysis('bucket', 'a.jpg', parallel=False)
+    parallel = lambda_function.perform_rekognition_analysis('bucket', 'a.jpg', parallel=True)
+
+    assert parallel == sequential
+    assert len(parallel['person_detections']) == 2
+
+
+def test_parallel_wall_time_is_max_of_calls(fake_aws):
+    rekognition, _ = fake_aws
+    rekognition.latency = 0.1
+
+    start = time.perf_counter()
+    lambda_function.perform_rekognition_analysis('bucket', 'a.jpg', parallel=True)
+    elapsed = time.perf_counter() - start
+
+    assert rekognition.calls == {'detect_labels': 1, 'detect_faces': 1}
+    assert elapsed < 0.15
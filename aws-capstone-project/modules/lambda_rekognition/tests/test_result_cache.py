@@ -0,0 +1,98 @@
+import lambda_function
+from fakes import make_face
+
+
+def stored_results(fake_db, s3_key):
+    return fake_db.rows("""
+        SELECT f.gender, e.emotion_type FROM face_emotions e
+        JOIN face_detections f ON f.id = e.face_detection_id
+        JOIN images i ON i.id = f.image_id WHERE i.s3_key = ? ORDER BY e.id
+    """, (s3_key,))
+
+
+def test_reupload_reuses_results_without_rekognition(fake_db, fake_aws):
+    rekognition, s3 = fake_aws
+    s3.etags = {'a.jpg': 'same', 'copy-of-a.jpg': 'same'}
+
+    assert lambda_function.process_image('bucket', 'a.jpg')
+    assert lambda_function.process_image('bucket', 'copy-of-a.jpg')
+
+    assert rekognition.calls == {'detect_labels': 1, 'detect_faces': 1}
+    assert stored_results(fake_db, 'copy-of-a.jpg') == stored_results(fake_db, 'a.jpg')
+    copies = fake_db.rows("""
+        SELECT COUNT(*) FROM person_detections p JOIN images i ON i.id = p.image_id
+        WHERE i.s3_key = 'copy-of-a.jpg'
+    """)
+    assert copies == [(2,)]
+
+
+def test_database_store_survives_cold_start(fake_db, fake_aws, monkeypatch):
+    rekognition, s3 = fake_aws
+    s3.etags = {'a.jpg': 'same', 'b.jpg': 'same'}
+    lambda_function.process_image('bucket', 'a.jpg')
+
+    # a new container starts with an empty in-process LRU
+    monkeypatch.setattr(lambda_function, 'result_cache', lambda_function.build_result_cache())
+    lambda_function.process_image('bucket', 'b.jpg')
+
+    assert rekognition.calls['detect_labels'] == 1
+    assert stored_results(fake_db, 'b.jpg') == stored_results(fake_db, 'a.jpg')
+
+
+def test_expired_database_entry_is_ignored(fake_db, fake_aws, monkeypatch):
+    rekognition, s3 = fake_aws
+    s3.etags = {'a.jpg': 'same', 'b.jpg': 'same'}
+    monkeypatch.setattr(lambda_function, 'result_cache',
+                        lambda_function.ResultCache([lambda_function.DatabaseResultStore(ttl=-1)]))
+
+    lambda_function.process_image('bucket', 'a.jpg')
+    lambda_function.process_image('bucket', 'b.jpg')
+
+    assert rekognition.calls['detect_labels'] == 2
+
+
+def test_expired_database_rows_are_evicted(fake_db, fake_aws):
+    store = lambda_function.DatabaseResultStore(ttl=60, evict_interval=3600, evict_batch=2)
+    with fake_db.sqlite:
+        fake_db.sqlite.execute("INSERT INTO images (s3_key, original_name) VALUES ('a', 'a')")
+        fake_db.sqlite.executemany(
+            "INSERT INTO rekognition_result_cache (content_key, image_id, created_at) VALUES (?, 1, ?)",
+            [(f'old-{i}', '2020-01-01 00:00:00') for i in range(3)])
+
+    store.put('new-1', 1, {})
+    store.put('new-2', 1, {})
+
+    # one batch per interval, and fresh rows stay
+    keys = [key for key, in fake_db.rows("SELECT content_key FROM rekognition_result_cache")]
+    assert sorted(key for key in keys if key.startswith('new')) == ['new-1', 'new-2']
+    assert len(keys) == 3
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = lambda_function.MemoryResultStore(max_entries=2, ttl=60)
+    store.put('a', 1, {'labels': []})
+    store.put('b', 2, {'labels': []})
+    store.get('a')
+    store.put('c', 3, {'labels': []})
+
+    assert store.get('b') is None
+    assert store.get('a') is not None
+
+
+def test_cache_errors_fall_back_to_rekognition(fake_db, fake_aws):
+    rekognition, s3 = fake_aws
+    fake_db.sqlite.execute("DROP TABLE rekognition_result_cache")
+
+    assert lambda_function.process_image('bucket', 'a.jpg')
+    assert rekognition.calls['detect_labels'] == 1
+
+
+def test_loaded_results_keep_face_attributes(fake_db):
+    fake_db.sqlite.execute("INSERT INTO images (s3_key, original_name) VALUES ('a', 'a')")
+    results = {'labels': [], 'person_detections': [], 'faces': [make_face(('HAPPY', 'SAD'))]}
+    lambda_function.save_rekognition_results(1, results)
+
+    with lambda_function.db_manager.transaction() as connection, connection.cursor() as cursor:
+        loaded = lambda_function.load_rekognition_results(cursor, 1)
+
+    assert loaded['faces'] == results['faces']
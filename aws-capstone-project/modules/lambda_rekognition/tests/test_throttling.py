@@ -0,0 +1,151 @@
+import threading
+import time
+
+import pytest
+
+import lambda_function
+from fakes import FakeDatabase, FakeOperationalError
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(lambda_function, 'RETRY_BASE_DELAY_SECONDS', 0.01)
+    monkeypatch.setattr(lambda_function, 'RETRY_MAX_DELAY_SECONDS', 0.05)
+
+
+def use_limiters(monkeypatch, tps):
+    limiters = {name: lambda_function.TokenBucket(tps) for name in ('detect_labels', 'detect_faces')}
+    monkeypatch.setattr(lambda_function, 'rekognition_limiters', limiters)
+    return limiters
+
+
+def test_throttled_calls_are_retried(fast_retries, fake_aws):
+    rekognition, _ = fake_aws
+    rekognition.throttle_first = 2
+
+    assert lambda_function.detect_labels('bucket', 'a.jpg')
+    assert rekognition.calls['detect_labels'] == 3
+    assert rekognition.throttled['detect_labels'] == 2
+
+
+def test_retries_give_up_after_max_attempts(fast_retries, fake_aws, monkeypatch):
+    rekognition, _ = fake_aws
+    rekognition.throttle_first = 10
+    monkeypatch.setattr(lambda_function, 'RETRY_MAX_ATTEMPTS', 3)
+
+    with pytest.raises(Exception, match='ThrottlingException'):
+        lambda_function.detect_faces('bucket', 'a.jpg')
+    assert rekognition.calls['detect_faces'] == 3
+
+
+def test_connection_errors_and_timeouts_are_retried(fast_retries, fake_aws, monkeypatch):
+    from botocore.exceptions import EndpointConnectionError, ReadTimeoutError
+    rekognition, _ = fake_aws
+    limiters = use_limiters(monkeypatch, 20)
+    errors = [EndpointConnectionError(endpoint_url='https://rekognition'),
+              ReadTimeoutError(endpoint_url='https://rekognition')]
+    detect_labels = rekognition.detect_labels
+
+    def flaky(**kwargs):
+        if errors:
+            raise errors.pop(0)
+        return detect_labels(**kwargs)
+    monkeypatch.setattr(rekognition, 'detect_labels', flaky)
+
+    assert lambda_function.detect_labels('bucket', 'a.jpg')
+    assert rekognition.calls['detect_labels'] == 1
+    # Network errors are not a sign of exceeding the quota
+    assert limiters['detect_labels'].rate == 20
+
+
+def test_other_errors_are_not_retried(fast_retries, fake_aws):
+    rekognition, _ = fake_aws
+    rekognition.fail_keys = {'bad.jpg'}
+
+    with pytest.raises(RuntimeError):
+        lambda_function.detect_labels('bucket', 'bad.jpg')
+    assert rekognition.calls['detect_labels'] == 1
+
+
+def test_limiter_keeps_calls_under_quota(fast_retries, fake_aws, monkeypatch):
+    rekognition, _ = fake_aws
+    rekognition.tps = 10
+    use_limiters(monkeypatch, 10)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=lambda_function.detect_labels, args=('bucket', f'{i}.jpg'))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert rekognition.calls['detect_labels'] == 8
+    assert rekognition.throttled == {}
+    assert time.perf_counter() - start >= 0.6
+
+
+def test_limiter_backs_off_and_recovers():
+    bucket = lambda_function.TokenBucket(20)
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.rate == 5
+
+    for _ in range(100):
+        bucket.on_success()
+    assert bucket.rate == 20
+
+
+def test_disabled_limiter_never_waits():
+    bucket = lambda_function.TokenBucket(0)
+    assert [bucket.acquire() for _ in range(100)] == [0.0] * 100
+
+
+def test_connections_are_capped(fake_db, fake_aws):
+    manager = lambda_function.DatabaseConnectionManager(max_idle=2, max_connections=2, acquire_timeout=0.1)
+    first, second = manager.acquire(), manager.acquire()
+
+    with pytest.raises(TimeoutError):
+        manager.acquire()
+    manager.release(first)
+    assert manager.acquire() is first
+    assert fake_db.connects == 2
+
+
+def test_refused_connect_is_retried(fast_retries, monkeypatch):
+    database = FakeDatabase(max_connections=1)
+    monkeypatch.setattr('pymysql.connect', database.connect)
+    blocker = database.connect()
+    threading.Timer(0.02, blocker.close).start()
+
+    manager = lambda_function.DatabaseConnectionManager()
+    manager.acquire()
+    assert database.refused >= 1
+    assert database.open_connections == 1
+
+
+def test_failed_connect_frees_its_slot(monkeypatch):
+    def refuse(**kwargs):
+        raise FakeOperationalError(1045, 'Access denied')
+    monkeypatch.setattr('pymysql.connect', refuse)
+    manager = lambda_function.DatabaseConnectionManager(max_connections=1, acquire_timeout=0.1)
+
+    for _ in range(2):
+        with pytest.raises(FakeOperationalError):
+            manager.acquire()
+
+
+def test_images_complete_under_tight_quotas(fast_retries, fake_db, fake_aws, monkeypatch):
+    rekognition, _ = fake_aws
+    rekognition.tps = 5
+    fake_db.max_connections = 2
+    use_limiters(monkeypatch, 5)
+    monkeypatch.setattr(lambda_function, 'db_manager',
+                        lambda_function.DatabaseConnectionManager(max_idle=2, max_connections=2))
+
+    summary = lambda_function.process_images(
+        [{'bucket': 'bucket', 'key': f'{i}.jpg', 'size': 10, 'etag': f'etag-{i}'} for i in range(8)],
+        max_workers=4)
+
+    assert summary['succeeded'] == 8
+    assert fake_db.peak_connections <= 2
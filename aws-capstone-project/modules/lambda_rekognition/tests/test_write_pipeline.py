@@ -0,0 +1,37 @@
+import lambda_function
+
+
+def test_single_commit_without_processing_marker(fake_db, fake_aws, monkeypatch):
+    monkeypatch.setattr(lambda_function, 'MARK_PROCESSING_STATUS', False)
+
+    assert lambda_function.process_image('bucket', 'a.jpg')
+
+    assert fake_db.commits == 1
+    assert fake_db.rows("SELECT processing_status FROM images") == [('completed',)]
+    assert fake_db.rows("SELECT status FROM processing_logs") == [('completed',)]
+
+
+def test_processing_marker_is_logged_as_started(fake_db, fake_aws):
+    lambda_function.process_image('bucket', 'a.jpg')
+
+    assert fake_db.rows("SELECT status FROM processing_logs ORDER BY id") == [('started',), ('completed',)]
+
+
+def test_readers_never_see_completed_without_results(fake_db, fake_aws, monkeypatch):
+    monkeypatch.setattr(lambda_function, 'MARK_PROCESSING_STATUS', False)
+    fake_db.fail_next = 'INSERT INTO processing_logs'
+
+    assert not lambda_function.process_image('bucket', 'a.jpg')
+
+    assert fake_db.rows("SELECT processing_status FROM images") == [('failed',)]
+    assert fake_db.rows("SELECT COUNT(*) FROM detection_labels") == [(0,)]
+
+
+def test_deferred_record_is_created_when_rekognition_fails(fake_db, fake_aws, monkeypatch):
+    rekognition, _ = fake_aws
+    rekognition.fail_keys = {'a.jpg'}
+    monkeypatch.setattr(lambda_function, 'MARK_PROCESSING_STATUS', False)
+
+    assert not lambda_function.process_image('bucket', 'a.jpg')
+
+    assert fake_db.rows("SELECT s3_key, processing_status FROM images") == [('a.jpg', 'failed')]
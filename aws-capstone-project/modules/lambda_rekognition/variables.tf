@@ -53,3 +53,16 @@ variable "vpc_cidr" {
   type        = string
 }
 
+
+# Lambda processing settings
+variable "image_processing_concurrency" {
+  description = "Number of images from one SNS event processed in parallel by the Lambda"
+  type        = number
+  default     = 4
+}
+
+variable "rekognition_tps" {
+  description = "Client-side limit on Rekognition calls per second per API for each Lambda container (0 disables it)"
+  type        = number
+  default     = 0
+}
@@ -84,6 +84,7 @@ CREATE TABLE IF NOT EXISTS images (
     upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     processing_status ENUM('pending', 'processing', 'completed', 'failed') DEFAULT 'pending',
     processed_at TIMESTAMP NULL,
+    source_version VARCHAR(100) NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     
@@ -176,6 +177,32 @@ CREATE TABLE IF NOT EXISTS processing_logs (
     INDEX idx_created_at (created_at)
 );
 
+-- Content-addressed cache of Rekognition results, keyed on S3 ETag and size
+CREATE TABLE IF NOT EXISTS rekognition_result_cache (
+    content_key VARCHAR(100) PRIMARY KEY,
+    image_id INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    FOREIGN KEY (image_id) REFERENCES images(id) ON DELETE CASCADE,
+    INDEX idx_created_at (created_at)
+);
+
+-- Migrations for databases created by an earlier version of this script.
+-- CREATE TABLE IF NOT EXISTS leaves existing tables alone, so columns added
+-- later are added here, guarded so that running them again is a no-op.
+-- The same statements are in scripts/upgrade_image_recognition_schema.sql
+-- for databases whose bastion host has already run.
+
+-- images.source_version: S3 version/ETag a completed image was processed from
+SET @has_column = (SELECT COUNT(*) FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'images' AND COLUMN_NAME = 'source_version');
+SET @migration = IF(@has_column = 0,
+    'ALTER TABLE images ADD COLUMN source_version VARCHAR(100) NULL AFTER processed_at',
+    'SELECT 1');
+PREPARE migration FROM @migration;
+EXECUTE migration;
+DEALLOCATE PREPARE migration;
+
 -- Create a view for easy querying of complete image data
 CREATE OR REPLACE VIEW image_summary AS
 SELECT 
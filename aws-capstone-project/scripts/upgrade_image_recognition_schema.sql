@@ -0,0 +1,27 @@
+-- Upgrade an Image Recognition database created by an earlier
+-- bastion_setup.sh. Every statement is idempotent, so this file can be run
+-- any number of times:
+--
+--   mysql -h <rds-endpoint> -u <user> -p <db-name> < upgrade_image_recognition_schema.sql
+--
+-- Run it before deploying a Lambda version that writes the new columns.
+
+-- Content-addressed cache of Rekognition results, keyed on S3 ETag and size
+CREATE TABLE IF NOT EXISTS rekognition_result_cache (
+    content_key VARCHAR(100) PRIMARY KEY,
+    image_id INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    FOREIGN KEY (image_id) REFERENCES images(id) ON DELETE CASCADE,
+    INDEX idx_created_at (created_at)
+);
+
+-- images.source_version: S3 version/ETag a completed image was processed from
+SET @has_column = (SELECT COUNT(*) FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'images' AND COLUMN_NAME = 'source_version');
+SET @migration = IF(@has_column = 0,
+    'ALTER TABLE images ADD COLUMN source_version VARCHAR(100) NULL AFTER processed_at',
+    'SELECT 1');
+PREPARE migration FROM @migration;
+EXECUTE migration;
+DEALLOCATE PREPARE migration;
@@ -0,0 +1,61 @@
+"""
+Times a full streaming merge against the incremental merge: the first run,
+a re-run with nothing changed and a re-run after one slide deck changed.
+
+    python benchmarks/bench_incremental.py --decks 600 --pages 10
+"""
+import argparse
+import importlib.util
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "tests"))
+
+from synthetic_pdfs import make_chapters, make_deck  # noqa: E402
+
+spec = importlib.util.spec_from_file_location("concat_pdf", HERE.parent / "main.py")
+concat_pdf = importlib.util.module_from_spec(spec)
+sys.modules["concat_pdf"] = concat_pdf
+spec.loader.exec_module(concat_pdf)
+
+CHAPTERS = ["CloudFoundations", "Linux", "Networking", "Security", "Databases", "PythonProgramming"]
+
+
+def timed(merge, folders, output):
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        assert merge(folders, str(output), workers=1)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--decks", type=int, default=600)
+    parser.add_argument("--pages", type=int, default=10, help="pages per deck")
+    parser.add_argument("--padding", type=int, default=10000, help="bytes of text per page")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        folders = make_chapters(root / "slides", CHAPTERS, max(1, args.decks // len(CHAPTERS)), args.pages, args.padding)
+        full = timed(concat_pdf.merge_pdfs_streaming, folders, root / "full.pdf")
+        runs = [("full streaming merge", full)]
+        output = root / "merged.pdf"
+        runs.append(("incremental, first run", timed(concat_pdf.merge_pdfs_incremental, folders, output)))
+        runs.append(("incremental, nothing changed", timed(concat_pdf.merge_pdfs_incremental, folders, output)))
+        changed = sorted(Path(folders[2]).glob("*.pdf"))[0]
+        make_deck(str(changed), args.pages, "changed", args.padding)
+        runs.append(("incremental, one deck changed", timed(concat_pdf.merge_pdfs_incremental, folders, output)))
+
+    print(f"{'run':<30} {'time s':>8} {'of full':>8}")
+    for name, elapsed in runs:
+        print(f"{name:<30} {elapsed:>8.2f} {elapsed / full:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Merges 10/100/1000 synthetic slide decks with merge_pdfs_with_writer and
+merge_pdfs_streaming, each run in a fresh process, and reports wall time,
+peak RSS and output size.
+
+    python benchmarks/bench_merge.py --decks 10 100 1000 --pages 10
+"""
+import argparse
+import importlib.util
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "tests"))
+
+from synthetic_pdfs import make_chapters  # noqa: E402
+
+CHAPTERS = ["CloudFoundations", "Linux", "Networking", "Security", "Databases"]
+
+
+def merge(mode, folders, output):
+    """Run one merge in this process and print its measurements as JSON."""
+    spec = importlib.util.spec_from_file_location("concat_pdf", HERE.parent / "main.py")
+    concat_pdf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(concat_pdf)
+    merge_pdfs = concat_pdf.merge_pdfs_streaming if mode == "streaming" else concat_pdf.merge_pdfs_with_writer
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        merge_pdfs(folders, output)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps({"elapsed": elapsed, "peak_rss": peak_rss, "size": Path(output).stat().st_size}))
+
+
+def measure(mode, folders, output):
+    child = subprocess.run(
+        [sys.executable, __file__, "--child", mode, output, *folders],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(child.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--decks", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--pages", type=int, default=10, help="pages per deck")
+    parser.add_argument("--padding", type=int, default=10000, help="bytes of text per page")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        mode, output, *folders = args.child
+        merge(mode, folders, output)
+        return
+
+    print(f"{'decks':>6} {'pages':>6} {'input MB':>9} {'mode':>10} {'time s':>8} {'peak RSS MB':>12} {'output MB':>10}")
+    for decks in args.decks:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            per_chapter = max(1, decks // len(CHAPTERS))
+            folders = make_chapters(root / "slides", CHAPTERS, per_chapter, args.pages, args.padding)
+            input_size = sum(path.stat().st_size for path in (root / "slides").rglob("*.pdf"))
+            for mode in ("writer", "streaming"):
+                result = measure(mode, folders, str(root / f"{mode}.pdf"))
+                print(
+                    f"{per_chapter * len(CHAPTERS):>6} {per_chapter * len(CHAPTERS) * args.pages:>6} "
+                    f"{input_size / 1e6:>9.1f} {mode:>10} {result['elapsed']:>8.2f} "
+                    f"{result['peak_rss'] / 1e6:>12.1f} {result['size'] / 1e6:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
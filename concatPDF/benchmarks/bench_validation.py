@@ -0,0 +1,50 @@
+"""
+Times the validation pre-pass over synthetic slide decks with a growing
+number of worker processes.
+
+    python benchmarks/bench_validation.py --decks 500 --workers 1 2 4 8
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "tests"))
+
+from synthetic_pdfs import make_chapters  # noqa: E402
+
+spec = importlib.util.spec_from_file_location("concat_pdf", HERE.parent / "main.py")
+concat_pdf = importlib.util.module_from_spec(spec)
+sys.modules["concat_pdf"] = concat_pdf
+spec.loader.exec_module(concat_pdf)
+
+CHAPTERS = ["CloudFoundations", "Linux", "Networking", "Security", "Databases"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--decks", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=20, help="pages per deck")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folders = make_chapters(Path(tmp), CHAPTERS, max(1, args.decks // len(CHAPTERS)), args.pages)
+        print(f"{os.cpu_count()} core(s)")
+        print(f"{'workers':>8} {'time s':>8} {'speedup':>8}")
+        baseline = None
+        for workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            validated, errors = concat_pdf.validate_pdfs(folders, workers)
+            elapsed = time.perf_counter() - start
+            assert not errors
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>8.2f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
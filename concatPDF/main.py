@@ -10,10 +10,33 @@
 #   Description :
 #
 # ================================================================
+import argparse
+import hashlib
+import io
+import json
 import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    StreamObject,
+)
 from pathlib import Path
 
+# Object numbers of the document catalog and page tree root in streamed output
+CATALOG_OBJECT = 1
+PAGES_OBJECT = 2
+# Object numbers of a cached chapter segment are reserved in blocks of this size
+SEGMENT_NUMBER_BLOCK = 1000
+MANIFEST_VERSION = 1
+
 
 def find_pdfs_in_folder(folder_path):
     pdf_files = []
@@ -24,20 +47,88 @@ def find_pdfs_in_folder(folder_path):
     return pdf_files
 
 
-def merge_pdfs_with_writer(folders, output_file):
+class EncryptedPdfError(Exception):
+    """A PDF that needs a password to be opened."""
+
+
+def open_pdf(pdf_path):
+    """Open a PDF; files protected only by an owner password open with the empty user password."""
+    reader = PdfReader(pdf_path)
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise EncryptedPdfError("encrypted")
+    return reader
+
+
+def validate_pdf(pdf_path):
+    """Parse a PDF and all its pages; returns (page count, None) or (None, error)."""
+    try:
+        reader = open_pdf(pdf_path)
+        for page in reader.pages:
+            contents = page.get("/Contents")
+            if contents is not None:
+                contents.get_object()
+        return len(reader.pages), None
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
+
+def validate_pdfs(folders, workers=None):
+    """Find and validate the PDFs of all folders, parsing them in a process pool.
+
+    Returns a list of (folder, [(pdf_path, page_count), ...]) in merge order
+    and a list of (pdf_path, error) for the files that cannot be merged.
+    workers=1 parses the files one by one in this process.
+    """
+    pdfs_by_folder = [(folder, find_pdfs_in_folder(folder)) for folder in folders]
+    pdfs = [pdf_path for _, folder_pdfs in pdfs_by_folder for pdf_path in folder_pdfs]
+    page_counts = dict(zip(pdfs, validate_files(pdfs, workers)))
+    validated = [
+        (folder, [(pdf_path, page_counts[pdf_path][0]) for pdf_path in folder_pdfs])
+        for folder, folder_pdfs in pdfs_by_folder
+    ]
+    errors = [(pdf_path, error) for pdf_path, (_, error) in page_counts.items() if error]
+    return validated, errors
+
+
+def validate_files(pdfs, workers=None):
+    """Run validate_pdf on every path, in a process pool unless workers=1."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pdfs) < 2:
+        return [validate_pdf(pdf_path) for pdf_path in pdfs]
+    with ProcessPoolExecutor(workers) as pool:
+        # map keeps the order of pdfs, whichever process finishes first
+        return list(pool.map(validate_pdf, pdfs, chunksize=max(1, len(pdfs) // (workers * 4))))
+
+
+def find_valid_pdfs(folders, workers=None):
+    """Validate all PDFs before merging; returns None if any of them is broken."""
+    validated, errors = validate_pdfs(folders, workers)
+    for pdf_path, error in errors:
+        print(f"❌ Cannot merge {pdf_path}: {error}")
+    if errors:
+        print(f"❌ {len(errors)} broken PDF(s), nothing was merged.")
+        return None
+    total_pages = sum(pages for _, pdfs in validated for _, pages in pdfs)
+    print(f"🔎 Validated {sum(len(pdfs) for _, pdfs in validated)} PDF(s) with {total_pages} page(s)")
+    return validated
+
+
+def merge_pdfs_with_writer(folders, output_file, workers=None):
+    validated = find_valid_pdfs(folders, workers)
+    if validated is None:
+        return 0
     writer = PdfWriter()
     total_files = 0
 
-    for folder in folders:
-        pdfs = find_pdfs_in_folder(folder)
+    for folder, pdfs in validated:
         if not pdfs:
             print(f"⚠️ No PDFs found in: {folder}")
             continue
 
         print(f"🔍 Found {len(pdfs)} PDF(s) in {folder}")
-        for pdf_path in pdfs:
+        for pdf_path, _ in pdfs:
             try:
-                reader = PdfReader(pdf_path)
+                reader = open_pdf(pdf_path)
                 for page in reader.pages:
                     writer.add_page(page)
                 print(f"✅ Added: {pdf_path}")
@@ -51,9 +142,390 @@ def merge_pdfs_with_writer(folders, output_file):
         print(f"\n🎉 Successfully merged {total_files} PDF(s) into: {output_file}")
     else:
         print("❌ No PDFs were merged.")
+    return total_files
+
+
+class StreamingPdfWriter:
+    """Write pages to a PDF file as soon as they are appended.
+
+    Every object of an appended reader is written out right away, so only
+    the reader currently being copied is kept in memory. Objects with the
+    same content (fonts, logos, backgrounds shared by several slide decks)
+    are written only once and referenced from every page using them.
+
+    With header=False only the objects are written, numbered from
+    first_number; such a segment is added to a PDF with append_segment.
+    """
+
+    def __init__(self, stream, first_number=PAGES_OBJECT + 1, header=True):
+        self.stream = stream
+        self.offsets = {}  # object number -> byte offset in the output
+        self.page_numbers = []
+        self.digests = {}  # content hash -> object number
+        self.next_number = first_number
+        self.deduplicated = 0
+        if header:
+            self.stream.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def _allocate(self):
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def _write_object(self, number, data):
+        self.offsets[number] = self.stream.tell()
+        self.stream.write(f"{number} 0 obj\n".encode())
+        self.stream.write(data)
+        self.stream.write(b"\nendobj\n")
+
+    def append(self, reader):
+        """Copy all pages of reader into the output; returns the number of pages."""
+        # Pages get their numbers first, so links between pages point to the copies
+        pages = {}
+        for page in reader.pages:
+            ref = page.indirect_reference
+            pages[(ref.idnum, ref.generation)] = self._allocate()
+        copier = _ObjectCopier(self, pages)
+        for page in reader.pages:
+            ref = page.indirect_reference
+            copy = copier.copy_value(page, page=True)
+            copy[NameObject("/Parent")] = IndirectObject(PAGES_OBJECT, 0, None)
+            self._write_object(pages[(ref.idnum, ref.generation)], _serialize(copy))
+        self.page_numbers += pages.values()
+        return len(pages)
+
+    def append_segment(self, segment_file, offsets, page_numbers):
+        """Copy a segment written with header=False byte for byte into the output.
+
+        offsets maps the object numbers of the segment to their offsets in
+        segment_file; the numbers must not be used by any other segment.
+        """
+        shift = self.stream.tell()
+        with open(segment_file, "rb") as segment:
+            shutil.copyfileobj(segment, self.stream, 1024 * 1024)
+        for number, offset in offsets.items():
+            self.offsets[number] = shift + offset
+        self.page_numbers += page_numbers
+
+    def close(self):
+        """Write the page tree, catalog, cross-reference table and trailer."""
+        kids = ArrayObject(IndirectObject(number, 0, None) for number in self.page_numbers)
+        pages = DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): kids,
+            NameObject("/Count"): NumberObject(len(kids)),
+        })
+        self._write_object(PAGES_OBJECT, _serialize(pages))
+        catalog = DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): IndirectObject(PAGES_OBJECT, 0, None),
+        })
+        self._write_object(CATALOG_OBJECT, _serialize(catalog))
+
+        xref_offset = self.stream.tell()
+        numbers = sorted(self.offsets)
+        size = numbers[-1] + 1
+        self.stream.write(b"xref\n0 1\n0000000000 65535 f \n")
+        # one subsection per run of consecutive numbers, unused numbers are left out
+        start = 0
+        for end in range(1, len(numbers) + 1):
+            if end == len(numbers) or numbers[end] != numbers[end - 1] + 1:
+                self.stream.write(f"{numbers[start]} {end - start}\n".encode())
+                for number in numbers[start:end]:
+                    self.stream.write(f"{self.offsets[number]:010d} 00000 n \n".encode())
+                start = end
+        self.stream.write(
+            f"trailer\n<< /Size {size} /Root {CATALOG_OBJECT} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode()
+        )
+
+
+class _ObjectCopier:
+    """Copy the objects reachable from the pages of one reader."""
+
+    def __init__(self, writer, pages):
+        self.writer = writer
+        self.pages = pages
+        self.copied = {}  # (idnum, generation) in the reader -> object number
+        # objects being copied -> object number, set once something refers back to them
+        self.visiting = {}
+
+    def copy_value(self, value, page=False):
+        if isinstance(value, IndirectObject):
+            return self.copy_reference(value)
+        if isinstance(value, StreamObject):
+            copy = StreamObject()
+            copy._data = value._data
+            skip = {"/Length"}
+        elif isinstance(value, DictionaryObject):
+            copy = DictionaryObject()
+            # the page tree of the reader is replaced by the one of the output
+            skip = {"/Parent"} if page else set()
+        elif isinstance(value, ArrayObject):
+            return ArrayObject(self.copy_value(item) for item in value)
+        else:
+            return value
+        for key, item in value.items():
+            if key not in skip:
+                copy[key] = self.copy_value(item)
+        return copy
+
+    def copy_reference(self, ref):
+        key = (ref.idnum, ref.generation)
+        if key in self.pages:
+            return IndirectObject(self.pages[key], 0, None)
+        if key in self.copied:
+            return IndirectObject(self.copied[key], 0, None)
+        if key in self.visiting:
+            # reference cycle: the object needs its number before it is written
+            if self.visiting[key] is None:
+                self.visiting[key] = self.writer._allocate()
+            return IndirectObject(self.visiting[key], 0, None)
+        obj = ref.get_object()
+        if isinstance(obj, DictionaryObject) and obj.get("/Type") in ("/Pages", "/Catalog"):
+            # only reachable from pages through back references, e.g. /Parent of a page not copied
+            return NullObject()
+
+        self.visiting[key] = None
+        copy = self.copy_value(obj)
+        number = self.visiting.pop(key)
+        data = _serialize(copy)
+        if number is None:
+            digest = hashlib.sha256(data).digest()
+            if digest in self.writer.digests:
+                self.writer.deduplicated += 1
+                self.copied[key] = self.writer.digests[digest]
+                return IndirectObject(self.copied[key], 0, None)
+            number = self.writer._allocate()
+            self.writer.digests[digest] = number
+        self.writer._write_object(number, data)
+        self.copied[key] = number
+        return IndirectObject(number, 0, None)
+
+
+def _serialize(obj):
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer)
+    return buffer.getvalue()
+
+
+def merge_pdfs_streaming(folders, output_file, workers=None):
+    """Merge like merge_pdfs_with_writer, writing each PDF out as soon as it is read."""
+    validated = find_valid_pdfs(folders, workers)
+    if validated is None:
+        return 0
+    total_files = 0
+
+    with open(output_file, "wb") as f_out:
+        writer = StreamingPdfWriter(f_out)
+        for folder, pdfs in validated:
+            if not pdfs:
+                print(f"⚠️ No PDFs found in: {folder}")
+                continue
+
+            print(f"🔍 Found {len(pdfs)} PDF(s) in {folder}")
+            for pdf_path, _ in pdfs:
+                try:
+                    writer.append(open_pdf(pdf_path))
+                    print(f"✅ Added: {pdf_path}")
+                    total_files += 1
+                except Exception as e:
+                    print(f"❌ Failed to add {pdf_path}: {e}")
+        writer.close()
+
+    if total_files > 0:
+        print(f"\n🎉 Successfully merged {total_files} PDF(s) into: {output_file}")
+        print(f"♻️ Shared {writer.deduplicated} duplicate object(s) between the PDFs")
+    else:
+        os.remove(output_file)
+        print("❌ No PDFs were merged.")
+    return total_files
+
+
+def file_fingerprint(pdf_path, previous=None):
+    """Return the manifest entry of pdf_path, reusing previous if the file is unchanged.
+
+    The file is only hashed when its mtime or size differ from previous;
+    "pages" is None for a new or changed file, which still needs validating.
+    """
+    stat = os.stat(pdf_path)
+    if previous and previous["mtime_ns"] == stat.st_mtime_ns and previous["size"] == stat.st_size:
+        return previous
+    sha256 = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+    entry = {"path": pdf_path, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+             "sha256": sha256.hexdigest(), "pages": None}
+    if previous and previous["sha256"] == entry["sha256"]:
+        # touched, but the same content
+        entry["pages"] = previous["pages"]
+    return entry
+
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+def save_manifest(manifest_path, manifest):
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def output_fingerprint(output_file):
+    stat = os.stat(output_file)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def build_segment(segment_file, pdfs, first_number):
+    """Merge the PDFs of one chapter into a segment numbered from first_number."""
+    tmp_path = f"{segment_file}.tmp"
+    with open(tmp_path, "wb") as f_out:
+        writer = StreamingPdfWriter(f_out, first_number=first_number, header=False)
+        for pdf_path in pdfs:
+            writer.append(open_pdf(pdf_path))
+            print(f"✅ Added: {pdf_path}")
+    os.replace(tmp_path, segment_file)
+    return writer
+
+
+def merge_pdfs_incremental(folders, output_file, workers=None):
+    """Merge like merge_pdfs_streaming, rebuilding only the chapters that changed.
+
+    A manifest next to the output records path, mtime, size, hash and page
+    count of every input, and each chapter is cached as a merged segment.
+    If nothing changed the merge is skipped; otherwise only the segments of
+    changed chapters are rebuilt and all segments are copied into the output.
+    """
+    cache_dir = Path(output_file).with_suffix(".cache")
+    cache_dir.mkdir(exist_ok=True)
+    manifest_path = cache_dir / "manifest.json"
+    manifest = load_manifest(manifest_path)
+    cached_chapters = manifest.get("chapters", {})
+
+    chapters = []
+    for folder in folders:
+        cached = cached_chapters.get(folder, {})
+        cached_files = {entry["path"]: entry for entry in cached.get("files", [])}
+        files = [file_fingerprint(pdf_path, cached_files.get(pdf_path)) for pdf_path in find_pdfs_in_folder(folder)]
+        unchanged = (
+            bool(cached)
+            and [entry["path"] for entry in files] == [entry["path"] for entry in cached["files"]]
+            and all(entry["pages"] is not None for entry in files)
+            and (cache_dir / cached["segment"]).exists()
+        )
+        chapters.append((folder, files, cached if unchanged else None))
+
+    to_validate = [entry for _, files, _ in chapters for entry in files if entry["pages"] is None]
+    errors = []
+    for entry, (pages, error) in zip(to_validate, validate_files([e["path"] for e in to_validate], workers)):
+        entry["pages"] = pages
+        if error:
+            errors.append(entry["path"])
+            print(f"❌ Cannot merge {entry['path']}: {error}")
+    if errors:
+        print(f"❌ {len(errors)} broken PDF(s), nothing was merged.")
+        return 0
+
+    total_files = sum(len(files) for _, files, _ in chapters)
+    if total_files == 0:
+        print("❌ No PDFs were merged.")
+        return 0
+    if (
+        all(cached for _, _, cached in chapters)
+        and manifest.get("folders") == list(folders)
+        and os.path.exists(output_file)
+        and manifest.get("output") == output_fingerprint(output_file)
+    ):
+        # touched files get their new mtime, so they are not hashed again next time
+        for folder, files, cached in chapters:
+            cached["files"] = files
+        save_manifest(manifest_path, dict(manifest, chapters={folder: cached for folder, _, cached in chapters}))
+        print(f"✨ Nothing changed since the last merge of {total_files} PDF(s) into: {output_file}")
+        return total_files
+
+    new_chapters = {}
+    rebuilt = 0
+    next_number = PAGES_OBJECT + 1
+    for folder, files, cached in chapters:
+        if cached and cached["first_number"] == next_number:
+            print(f"♻️ Reused {len(files)} PDF(s) of {folder}")
+            segment = cached
+        else:
+            # changed, or moved because an earlier chapter outgrew its numbers
+            if not files:
+                print(f"⚠️ No PDFs found in: {folder}")
+            else:
+                print(f"🔍 Found {len(files)} PDF(s) in {folder}")
+            segment_name = hashlib.sha1(folder.encode()).hexdigest()[:16] + ".seg"
+            writer = build_segment(cache_dir / segment_name, [entry["path"] for entry in files], next_number)
+            used = writer.next_number - next_number
+            # keep the reserved numbers if they are still enough, so later chapters stay put
+            reserved = cached_chapters.get(folder, {}).get("reserved", 0)
+            if cached_chapters.get(folder, {}).get("first_number") != next_number or used > reserved:
+                reserved = (2 * used // SEGMENT_NUMBER_BLOCK + 1) * SEGMENT_NUMBER_BLOCK
+            segment = {
+                "segment": segment_name,
+                "first_number": next_number,
+                "reserved": reserved,
+                "offsets": sorted(writer.offsets.items()),
+                "page_numbers": writer.page_numbers,
+            }
+            rebuilt += 1
+        segment["files"] = files
+        new_chapters[folder] = segment
+        next_number += segment["reserved"]
+
+    tmp_path = f"{output_file}.tmp"
+    with open(tmp_path, "wb") as f_out:
+        writer = StreamingPdfWriter(f_out)
+        for folder in folders:
+            segment = new_chapters[folder]
+            writer.append_segment(
+                cache_dir / segment["segment"], dict(segment["offsets"]), segment["page_numbers"]
+            )
+        writer.close()
+    os.replace(tmp_path, output_file)
+    segment_names = {segment["segment"] for segment in new_chapters.values()}
+    for segment_file in cache_dir.glob("*.seg"):
+        if segment_file.name not in segment_names:
+            segment_file.unlink()
+
+    save_manifest(manifest_path, {
+        "version": MANIFEST_VERSION,
+        "folders": list(folders),
+        "chapters": new_chapters,
+        "output": output_fingerprint(output_file),
+    })
+    print(f"\n🎉 Successfully merged {total_files} PDF(s) into: {output_file}")
+    print(f"🔁 Rebuilt {rebuilt} of {len(folders)} chapter(s)")
+    return total_files
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge the slide decks of all chapters into one PDF")
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="write each PDF out as soon as it is read, for bundles too large to keep in memory",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="keep a manifest and merged chapters next to the output and rebuild only what changed",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="processes validating the PDFs, defaults to the number of cores"
+    )
+    args = parser.parse_args()
+
     slides_folder = f"{Path.home()}/neuefische_training/AWS_cloud_computing/slides"
     chapters = [
         "CloudFoundations",
@@ -68,4 +540,9 @@ if __name__ == "__main__":
     print(folders_to_merge[0])
     output_filename = "merged.pdf"
     output_path = Path(slides_folder, output_filename)
-    merge_pdfs_with_writer(folders_to_merge, output_path.as_posix())
+    if args.incremental:
+        merge_pdfs = merge_pdfs_incremental
+    else:
+        merge_pdfs = merge_pdfs_streaming if args.streaming else merge_pdfs_with_writer
+    if not merge_pdfs(folders_to_merge, output_path.as_posix(), workers=args.workers):
+        sys.exit(1)
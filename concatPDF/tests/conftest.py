@@ -0,0 +1,12 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+PROJECT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# main.py is imported as concat_pdf, the tests of other projects have a main module too
+spec = importlib.util.spec_from_file_location("concat_pdf", PROJECT / "main.py")
+concat_pdf = importlib.util.module_from_spec(spec)
+sys.modules["concat_pdf"] = concat_pdf
+spec.loader.exec_module(concat_pdf)
@@ -0,0 +1,68 @@
+"""
+Builds slide-deck-like PDFs for the tests and benchmarks: every deck has
+the same font and logo image, and each page its own text.
+"""
+import random
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+LOGO_SIDE = 128
+
+
+def make_deck(path, pages=3, title="deck", padding=0):
+    """Write a PDF with `pages` pages to path; padding adds that many bytes of text per page."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    logo = DecodedStreamObject()
+    logo.set_data(random.Random(0).randbytes(LOGO_SIDE * LOGO_SIDE))
+    logo.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(LOGO_SIDE),
+        NameObject("/Height"): NumberObject(LOGO_SIDE),
+        NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+    })
+    logo = writer._add_object(logo)
+    resources = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        NameObject("/XObject"): DictionaryObject({NameObject("/Logo"): logo}),
+    })
+    for number in range(pages):
+        page = writer.add_blank_page(612, 792)
+        content = DecodedStreamObject()
+        text = f"{title} page {number + 1}"
+        filler = random.Random(f"{title}-{number}").randbytes(padding // 2).hex()
+        content.set_data(
+            f"BT /F1 24 Tf 72 700 Td ({text}) Tj ET\n"
+            f"q 100 0 0 100 72 500 cm /Logo Do Q\n% {filler}\n".encode()
+        )
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = resources
+    writer.write(path)
+    return path
+
+
+def encrypt_deck(path, user_password="", owner_password="owner"):
+    """Encrypt the PDF at path in place; an empty user password leaves it readable without one."""
+    writer = PdfWriter(clone_from=path)
+    writer.encrypt(user_password=user_password, owner_password=owner_password, algorithm="RC4-128")
+    writer.write(path)
+    return path
+
+
+def make_chapters(root, chapters, decks_per_chapter=2, pages=3, padding=0):
+    """Create one folder of decks per chapter; returns the folders in chapter order."""
+    folders = []
+    for chapter in chapters:
+        folder = root / chapter
+        folder.mkdir(parents=True, exist_ok=True)
+        for number in range(decks_per_chapter):
+            make_deck(str(folder / f"{number:03d}_{chapter}.pdf"), pages, f"{chapter} {number}", padding)
+        folders.append(str(folder))
+    return folders
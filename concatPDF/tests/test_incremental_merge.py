@@ -0,0 +1,103 @@
+import json
+import os
+
+from pypdf import PdfReader
+
+import concat_pdf
+from synthetic_pdfs import make_chapters, make_deck
+
+CHAPTERS = ["Linux", "Networking", "Databases"]
+
+
+def page_texts(path):
+    return [page.extract_text().strip() for page in PdfReader(path, strict=True).pages]
+
+
+def merge(folders, output, capsys):
+    assert concat_pdf.merge_pdfs_incremental(folders, str(output), workers=1) > 0
+    return capsys.readouterr().out
+
+
+def test_first_run_matches_full_merge(tmp_path, capsys):
+    folders = make_chapters(tmp_path, CHAPTERS, decks_per_chapter=2, pages=2)
+    concat_pdf.merge_pdfs_streaming(folders, str(tmp_path / "full.pdf"), workers=1)
+    merge(folders, tmp_path / "merged.pdf", capsys)
+
+    assert page_texts(str(tmp_path / "merged.pdf")) == page_texts(str(tmp_path / "full.pdf"))
+    manifest = json.loads((tmp_path / "merged.cache" / "manifest.json").read_text())
+    entry = manifest["chapters"][folders[0]]["files"][0]
+    assert set(entry) == {"path", "mtime_ns", "size", "sha256", "pages"}
+    assert entry["pages"] == 2
+
+
+def test_nothing_changed_skips_the_merge(tmp_path, capsys):
+    folders = make_chapters(tmp_path, CHAPTERS, decks_per_chapter=2, pages=1)
+    output = tmp_path / "merged.pdf"
+    merge(folders, output, capsys)
+    before = output.stat().st_mtime_ns
+    # same content, new mtime
+    deck = tmp_path / "Linux" / "000_Linux.pdf"
+    os.utime(deck, ns=(before + 10**9, before + 10**9))
+
+    out = merge(folders, output, capsys)
+
+    assert "Nothing changed" in out
+    assert output.stat().st_mtime_ns == before
+
+
+def test_only_changed_chapter_is_rebuilt(tmp_path, capsys):
+    folders = make_chapters(tmp_path, CHAPTERS, decks_per_chapter=2, pages=1)
+    output = tmp_path / "merged.pdf"
+    merge(folders, output, capsys)
+
+    make_deck(str(tmp_path / "Networking" / "001_Networking.pdf"), pages=2, title="updated")
+    out = merge(folders, output, capsys)
+
+    assert "Rebuilt 1 of 3 chapter(s)" in out
+    assert page_texts(str(output)) == [
+        "Linux 0 page 1", "Linux 1 page 1",
+        "Networking 0 page 1", "updated page 1", "updated page 2",
+        "Databases 0 page 1", "Databases 1 page 1",
+    ]
+
+
+def test_added_and_removed_files_are_picked_up(tmp_path, capsys):
+    folders = make_chapters(tmp_path, CHAPTERS, decks_per_chapter=2, pages=1)
+    output = tmp_path / "merged.pdf"
+    merge(folders, output, capsys)
+
+    (tmp_path / "Linux" / "000_Linux.pdf").unlink()
+    make_deck(str(tmp_path / "Databases" / "002_Databases.pdf"), pages=1, title="new")
+    out = merge(folders, output, capsys)
+
+    assert "Rebuilt 2 of 3 chapter(s)" in out
+    texts = page_texts(str(output))
+    assert texts[0] == "Linux 1 page 1"
+    assert texts[-1] == "new page 1"
+
+
+def test_chapter_outgrowing_its_numbers_moves_later_chapters(tmp_path, capsys):
+    folders = make_chapters(tmp_path, CHAPTERS, decks_per_chapter=1, pages=1)
+    output = tmp_path / "merged.pdf"
+    merge(folders, output, capsys)
+    reserved = json.loads((tmp_path / "merged.cache" / "manifest.json").read_text())["chapters"][folders[0]]["reserved"]
+
+    make_deck(str(tmp_path / "Linux" / "000_Linux.pdf"), pages=reserved, title="big")
+    out = merge(folders, output, capsys)
+
+    assert "Rebuilt 3 of 3 chapter(s)" in out
+    texts = page_texts(str(output))
+    assert len(texts) == reserved + 2
+    assert texts[-2:] == ["Networking 0 page 1", "Databases 0 page 1"]
+
+
+def test_broken_change_keeps_the_previous_output(tmp_path, capsys):
+    folders = make_chapters(tmp_path, CHAPTERS, decks_per_chapter=1, pages=1)
+    output = tmp_path / "merged.pdf"
+    merge(folders, output, capsys)
+    before = output.read_bytes()
+
+    (tmp_path / "Linux" / "000_Linux.pdf").write_bytes(b"%PDF-1.7\nbroken")
+
+    assert concat_pdf.merge_pdfs_incremental(folders, str(output), workers=1) == 0
+    assert output.read_bytes() == before
@@ -0,0 +1,46 @@
+from pypdf import PdfReader
+
+import concat_pdf
+from synthetic_pdfs import make_chapters, make_deck
+
+
+def page_texts(path):
+    return [page.extract_text().strip() for page in PdfReader(path).pages]
+
+
+def test_streaming_merge_matches_writer_merge(tmp_path):
+    folders = make_chapters(tmp_path, ["Linux", "Networking"], decks_per_chapter=3, pages=2)
+    concat_pdf.merge_pdfs_with_writer(folders, str(tmp_path / "writer.pdf"))
+    concat_pdf.merge_pdfs_streaming(folders, str(tmp_path / "streaming.pdf"))
+
+    texts = page_texts(str(tmp_path / "streaming.pdf"))
+    assert texts == page_texts(str(tmp_path / "writer.pdf"))
+    assert texts[0] == "Linux 0 page 1"
+    assert texts[-1] == "Networking 2 page 2"
+
+
+def test_shared_resources_are_written_once(tmp_path):
+    folders = make_chapters(tmp_path, ["Linux"], decks_per_chapter=5, pages=2)
+    output = tmp_path / "merged.pdf"
+    concat_pdf.merge_pdfs_streaming(folders, str(output))
+
+    reader = PdfReader(str(output))
+    logos = {page["/Resources"]["/XObject"].raw_get("/Logo").idnum for page in reader.pages}
+    fonts = {page["/Resources"]["/Font"].raw_get("/F1").idnum for page in reader.pages}
+    assert len(reader.pages) == 10
+    assert len(logos) == 1 and len(fonts) == 1
+    assert output.stat().st_size < 2 * (tmp_path / "Linux" / "000_Linux.pdf").stat().st_size
+
+
+def test_reader_is_released_after_each_file(tmp_path):
+    with open(tmp_path / "merged.pdf", "wb") as stream:
+        writer = concat_pdf.StreamingPdfWriter(stream)
+        writer.append(PdfReader(make_deck(str(tmp_path / "a.pdf"), pages=2)))
+        written = stream.tell()
+        writer.append(PdfReader(make_deck(str(tmp_path / "b.pdf"), pages=2, title="b")))
+        writer.close()
+
+    # the pages of the first file were on disk before the second was read
+    assert written > 0
+    assert page_texts(str(tmp_path / "merged.pdf")) == ["deck page 1", "deck page 2", "b page 1", "b page 2"]
+
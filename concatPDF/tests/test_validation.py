@@ -0,0 +1,66 @@
+import pytest
+from pypdf import PdfReader
+
+import concat_pdf
+from synthetic_pdfs import encrypt_deck, make_chapters
+
+MERGES = [concat_pdf.merge_pdfs_with_writer, concat_pdf.merge_pdfs_streaming, concat_pdf.merge_pdfs_incremental]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_page_counts_are_collected_in_merge_order(tmp_path, workers):
+    folders = make_chapters(tmp_path, ["Linux", "Networking", "Databases"], decks_per_chapter=3, pages=2)
+
+    validated, errors = concat_pdf.validate_pdfs(folders, workers=workers)
+
+    assert errors == []
+    assert [folder for folder, _ in validated] == folders
+    assert [pdf_path for _, pdfs in validated for pdf_path, _ in pdfs] == [
+        pdf_path for folder in folders for pdf_path in concat_pdf.find_pdfs_in_folder(folder)
+    ]
+    assert {pages for _, pdfs in validated for _, pages in pdfs} == {2}
+
+
+@pytest.mark.parametrize("merge", [concat_pdf.merge_pdfs_with_writer, concat_pdf.merge_pdfs_streaming])
+def test_broken_files_stop_the_merge_before_any_output(tmp_path, capsys, merge):
+    folders = make_chapters(tmp_path, ["Linux", "Networking"], decks_per_chapter=2, pages=1)
+    (tmp_path / "Linux" / "001_broken.pdf").write_bytes(b"%PDF-1.7\nnot a pdf")
+    (tmp_path / "Networking" / "002_empty.pdf").write_bytes(b"")
+    output = tmp_path / "merged.pdf"
+
+    assert merge(folders, str(output), workers=2) == 0
+
+    assert not output.exists()
+    out = capsys.readouterr().out
+    assert "001_broken.pdf" in out and "002_empty.pdf" in out
+    assert "Added" not in out
+
+
+def test_valid_files_are_merged(tmp_path):
+    folders = make_chapters(tmp_path, ["Linux"], decks_per_chapter=3, pages=1)
+
+    assert concat_pdf.merge_pdfs_streaming(folders, str(tmp_path / "merged.pdf"), workers=2) == 3
+
+
+@pytest.mark.parametrize("merge", MERGES)
+def test_password_protected_files_stop_the_merge(tmp_path, capsys, merge):
+    folders = make_chapters(tmp_path, ["Linux"], decks_per_chapter=2, pages=1)
+    encrypt_deck(str(tmp_path / "Linux" / "001_Linux.pdf"), user_password="secret")
+    output = tmp_path / "merged.pdf"
+
+    assert not merge(folders, str(output), workers=1)
+
+    assert not output.exists()
+    assert "001_Linux.pdf" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("merge", MERGES)
+def test_owner_password_only_files_are_merged(tmp_path, merge):
+    folders = make_chapters(tmp_path, ["Linux"], decks_per_chapter=2, pages=1)
+    encrypt_deck(str(tmp_path / "Linux" / "001_Linux.pdf"))
+    output = tmp_path / "merged.pdf"
+
+    merge(folders, str(output), workers=1)
+
+    pages = PdfReader(str(output)).pages
+    assert [page.extract_text().strip() for page in pages] == ["Linux 0 page 1", "Linux 1 page 1"]
@@ -0,0 +1,85 @@
+"""
+Counts the words of generated UTF-8 text of growing size, once by reading
+the whole body and splitting it, once with count_words, each in a fresh
+process, and reports wall time and peak RSS.
+
+    python benchmarks/bench_word_count.py --sizes-mb 10 100 1000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+
+import count_file_words_uploaded_to_S3_with_aws_lambda as word_count  # noqa: E402
+
+LINE = "2025-05-22 17:53:07 größe=42 request served 日本語 😀\n".encode("utf-8")
+
+
+class GeneratedBody:
+    """File-like body of `size` bytes of repeated log lines, generated as it is read."""
+
+    def __init__(self, size):
+        self.remaining = size
+        self.block = LINE * (1024 * 1024 // len(LINE))
+        self.offset = 0
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self.remaining
+        size = min(size, self.remaining)
+        parts = []
+        while sum(map(len, parts)) < size:
+            part = self.block[self.offset:self.offset + size - sum(map(len, parts))]
+            self.offset = (self.offset + len(part)) % len(self.block)
+            parts.append(part)
+        self.remaining -= size
+        return b"".join(parts)
+
+
+def count(mode, size):
+    """Run one count in this process and print its measurements as JSON."""
+    body = GeneratedBody(size)
+    start = time.perf_counter()
+    if mode == "read":
+        words = len(body.read().decode("utf-8").split())
+    else:
+        words = word_count.count_words(body)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps({"words": words, "elapsed": elapsed, "peak_rss": peak_rss}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--max-read-mb", type=int, default=1000,
+                        help="skip reading the whole body for larger files")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        count(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'size MB':>8} {'mode':>10} {'words':>12} {'time s':>8} {'peak RSS MB':>12}")
+    for size_mb in args.sizes_mb:
+        for mode in ("read", "streaming"):
+            if mode == "read" and size_mb > args.max_read_mb:
+                continue
+            child = subprocess.run(
+                [sys.executable, __file__, "--child", mode, str(size_mb * 1000 * 1000)],
+                check=True, capture_output=True, text=True,
+            )
+            result = json.loads(child.stdout)
+            print(f"{size_mb:>8} {mode:>10} {result['words']:>12} {result['elapsed']:>8.2f} "
+                  f"{result['peak_rss'] / 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
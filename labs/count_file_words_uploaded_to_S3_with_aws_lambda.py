@@ -1,19 +1,202 @@
-import boto3, os
+import boto3, codecs, os, random, time
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError, IncompleteReadError
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_plus
+
+# Bytes read from S3 at a time; memory use does not grow with the file size
+CHUNK_SIZE = 1024 * 1024
+# Objects larger than this are fetched as several byte ranges at the same time
+RANGE_SIZE = int(os.environ.get('RANGE_SIZE', 64 * 1024 * 1024))
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 8))
+# Longest UTF-8 sequence is 4 bytes, so a character cut at a range end has at most 3 more
+MAX_CONTINUATION_BYTES = 3
+CONTINUATION_BYTES = bytes(range(0x80, 0xc0))
+# SNS rejects messages larger than 256 KiB
+MAX_MESSAGE_BYTES = 256 * 1024
+# Attempts per range before an object counts as failed, with exponential backoff between them
+MAX_ATTEMPTS = int(os.environ.get('MAX_ATTEMPTS', 4))
+RETRY_BASE_DELAY = float(os.environ.get('RETRY_BASE_DELAY', 0.2))
+# S3 error codes that go away when the request is repeated; a 412 from an
+# overwritten key is permanent, the new object has an event of its own
+TRANSIENT_ERROR_CODES = {'SlowDown', 'InternalError', 'ServiceUnavailable', 'RequestTimeout', '500', '503'}
+
+def count_words_with_edges(body, chunk_size=CHUNK_SIZE):
+    """Count the words of a UTF-8 stream like len(text.split()), one chunk at a time.
+
+    Returns (word count, starts inside a word, ends inside a word), so the
+    counts of consecutive parts of a text can be joined with join_counts.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    word_count = 0
+    starts_in_word = None
+    in_word = False  # the last character read was part of a word
+    while True:
+        data = body.read(chunk_size)
+        # the decoder keeps a multibyte character cut off at the end of data for the next chunk
+        text = decoder.decode(data, final=not data)
+        if text:
+            word_count += len(text.split())
+            if starts_in_word is None:
+                starts_in_word = not text[0].isspace()
+            # a word running across the chunk boundary was counted twice
+            elif in_word and not text[0].isspace():
+                word_count -= 1
+            in_word = not text[-1].isspace()
+        if not data:
+            return word_count, bool(starts_in_word), in_word
+
+def count_words(body, chunk_size=CHUNK_SIZE):
+    return count_words_with_edges(body, chunk_size)[0]
+
+def join_counts(parts):
+    """Add up the results of count_words_with_edges for consecutive parts of a text."""
+    word_count = 0
+    in_word = False
+    for part_count, starts_in_word, ends_in_word in parts:
+        word_count += part_count
+        # a word running across the boundary between two parts was counted in both
+        if in_word and starts_in_word:
+            word_count -= 1
+        in_word = ends_in_word
+    return word_count
+
+class RangeBody(object):
+    """Documentation for RangeBody
+
+    Reads the part of a ranged GET that belongs to the range [start, end):
+    continuation bytes at the start finish a character of the previous
+    range and are dropped, and the character cut off at the end is
+    completed from up to MAX_CONTINUATION_BYTES fetched past it.
+    """
+    def __init__(self, body, start, end):
+        super(RangeBody, self).__init__()
+        self.body = body
+        self.length = end - start
+        self.position = 0  # bytes read from body
+        self.skip_leading = start > 0
+        self.done = False
+
+    def read(self, size):
+        while not self.done:
+            data = self.body.read(size)
+            if not data:
+                self.done = True
+                break
+            position = self.position
+            self.position += len(data)
+            if self.skip_leading:
+                stripped = data.lstrip(CONTINUATION_BYTES)
+                position += len(data) - len(stripped)
+                data = stripped
+                self.skip_leading = not data
+            if position + len(data) <= self.length:
+                if data:
+                    return data
+                continue
+            inside = data[:max(self.length - position, 0)]
+            # past the end only the continuation bytes of the last character belong here
+            tail = data[len(inside):]
+            rest = tail.lstrip(CONTINUATION_BYTES)
+            self.done = bool(rest)
+            data = inside + tail[:len(tail) - len(rest)]
+            if data:
+                return data
+        return b''
+
+def object_ranges(size, range_size=RANGE_SIZE):
+    if size is None:
+        return [(0, None)]
+    return [(start, min(start + range_size, size)) for start in range(0, size, range_size)] or [(0, 0)]
+
+def object_version(s3_object):
+    """GET arguments that pin the object of an event record, so all its ranges read the same version."""
+    if s3_object.get('versionId'):
+        return {'VersionId': s3_object['versionId']}
+    if s3_object.get('eTag'):
+        # an overwritten key then fails with 412 Precondition Failed
+        return {'IfMatch': s3_object['eTag']}
+    return {}
+
+def count_range(s3, bucket, key, start, end, size, version=None):
+    """Fetch one range of an object and count its words; the whole object if the range covers it."""
+    version = version or {}
+    if start == 0 and end == size:
+        return count_words_with_edges(s3.get_object(Bucket=bucket, Key=key, **version)['Body'])
+    last_byte = min(end + MAX_CONTINUATION_BYTES, size) - 1
+    body = s3.get_object(Bucket=bucket, Key=key, Range=f'bytes={start}-{last_byte}', **version)['Body']
+    return count_words_with_edges(RangeBody(body, start, end))
+
+def is_transient(error):
+    """Throttling, server errors and connections or response streams broken off."""
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in TRANSIENT_ERROR_CODES
+    # HTTPClientError covers read timeouts and response streams cut off while being read
+    return isinstance(error, (ConnectionError, HTTPClientError, IncompleteReadError))
+
+def count_range_with_retries(s3, bucket, key, start, end, size, version=None):
+    """count_range, repeated after transient failures; the GET is repeated from the start of the range."""
+    attempt = 1
+    while True:
+        try:
+            return count_range(s3, bucket, key, start, end, size, version)
+        except Exception as e:
+            if attempt >= MAX_ATTEMPTS or not is_transient(e):
+                raise
+            delay = random.uniform(0, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+            print(f"Counting s3://{bucket}/{key} bytes {start}-{end} failed with {e}, retry {attempt} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+def word_count_messages(results):
+    """Put one line per file into as few SNS messages as fit the size limit."""
+    messages, lines, size = [], [], 0
+    for key, word_count in results:
+        line = f"The file {key} contains {word_count} words."
+        line_size = len(line.encode('utf-8')) + 1
+        if lines and size + line_size > MAX_MESSAGE_BYTES:
+            messages.append('\n'.join(lines))
+            lines, size = [], 0
+        lines.append(line)
+        size += line_size
+    if lines:
+        messages.append('\n'.join(lines))
+    return messages
 
 def lambda_handler(event, context):
     s3 = boto3.client('s3')
     sns = boto3.client('sns')
 
-    # Get the bucket and object key from the event
-    bucket = event['Records'][0]['s3']['bucket']['name']
-    key = event['Records'][0]['s3']['object']['key']
+    # Get the bucket, object key, size and version of every record of the event
+    objects = []
+    for record in event['Records']:
+        bucket = record['s3']['bucket']['name']
+        # keys in S3 events are URL-encoded, a space arrives as '+'
+        key = unquote_plus(record['s3']['object']['key'])
+        # without a size the object is read with a single GET
+        size = record['s3']['object'].get('size')
+        objects.append((bucket, key, size, object_version(record['s3']['object'])))
+
+    # Count the words of all ranges of all objects at the same time
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [
+            [executor.submit(count_range_with_retries, s3, bucket, key, start, end, size, version)
+             for start, end in object_ranges(size)]
+            for bucket, key, size, version in objects
+        ]
+        results, failed = [], []
+        for (bucket, key, _, _), object_futures in zip(objects, futures):
+            try:
+                results.append((key, join_counts(f.result() for f in object_futures)))
+            except Exception as e:
+                print(f"Failed to count the words of s3://{bucket}/{key}: {e}")
+                failed.append(f"s3://{bucket}/{key}: {e}")
 
-    # Read file contents from S3
-    content = s3.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8')
-    word_count = len(content.split())
-   
-    # Publish the word count message to SNS
+    # Publish the word counts of the whole batch together
     topic_arn = os.environ['TOPIC_ARN']
-    sns.publish(TopicArn=topic_arn, Subject='Word Count Result',
-                Message=f"The file {key} contains {word_count} words.")
-    return {'statusCode': 200}
+    for message in word_count_messages(results):
+        sns.publish(TopicArn=topic_arn, Subject='Word Count Result', Message=message)
+    # Failing the invocation lets Lambda retry the event; the counts published
+    # above are then published again
+    if failed:
+        raise RuntimeError(f"Failed to count {len(failed)} of {len(objects)} files: " + "; ".join(failed))
+    return {'statusCode': 200, 'counted': len(results)}
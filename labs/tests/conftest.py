@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# boto3 clients need a region even when their calls are faked
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
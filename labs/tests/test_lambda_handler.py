@@ -0,0 +1,172 @@
+import json
+import random
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError, ReadTimeoutError
+from moto import mock_aws
+
+import count_file_words_uploaded_to_S3_with_aws_lambda as word_count
+
+BUCKET = "uploads"
+WORDS = ["lambda", "größe", "日本語", "😀emoji", "x"]
+SPACES = [" ", "\n", "\t", "　", "\xa0"]
+
+
+def random_text(seed, words):
+    rng = random.Random(seed)
+    return "".join(rng.choice(WORDS) + rng.choice(SPACES) for _ in range(words))
+
+
+def s3_event(*keys, sizes=None, etags=None, versions=None):
+    records = []
+    for key in keys:
+        obj = {"key": key}
+        if sizes:
+            obj["size"] = sizes[key]
+        if etags:
+            obj["eTag"] = etags[key]
+        if versions:
+            obj["versionId"] = versions[key]
+        records.append({"s3": {"bucket": {"name": BUCKET}, "object": obj}})
+    return {"Records": records}
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """Local S3 bucket and SNS topic; yields the messages published to the topic and the GET ranges."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    # create_bucket without a location constraint only works in us-east-1
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket=BUCKET)
+        sns = boto3.client("sns")
+        sqs = boto3.client("sqs")
+        topic_arn = sns.create_topic(Name="word-count")["TopicArn"]
+        queue_url = sqs.create_queue(QueueName="word-count")["QueueUrl"]
+        queue_arn = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["QueueArn"])["Attributes"]["QueueArn"]
+        sns.subscribe(TopicArn=topic_arn, Protocol="sqs", Endpoint=queue_arn)
+        monkeypatch.setenv("TOPIC_ARN", topic_arn)
+
+        ranges = []
+        client = boto3.client
+
+        def recording_client(service, *args, **kwargs):
+            c = client(service, *args, **kwargs)
+            if service == "s3":
+                c.meta.events.register(
+                    "provide-client-params.s3.GetObject", lambda params, **_: ranges.append(params.get("Range"))
+                )
+            return c
+
+        monkeypatch.setattr(word_count.boto3, "client", recording_client)
+
+        def messages():
+            received = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)
+            return [json.loads(m["Body"])["Message"] for m in received.get("Messages", [])]
+
+        yield s3, messages, ranges
+
+
+def test_every_record_is_counted_in_one_message(aws):
+    s3, messages, _ = aws
+    texts = {f"docs/file {n}.txt": random_text(n, 50 + n) for n in range(3)}
+    for key, text in texts.items():
+        s3.put_object(Bucket=BUCKET, Key=key, Body=text.encode("utf-8"))
+
+    # S3 URL-encodes the keys of its events
+    response = word_count.lambda_handler(s3_event(*(key.replace(" ", "+") for key in texts)), None)
+
+    assert response == {"statusCode": 200, "counted": 3}
+    assert messages() == ["\n".join(f"The file {key} contains {len(text.split())} words." for key, text in texts.items())]
+
+
+@pytest.mark.parametrize("range_size", [4, 7, 64, 1000])
+def test_ranges_are_counted_exactly_once(aws, monkeypatch, range_size):
+    s3, messages, ranges = aws
+    object_ranges = word_count.object_ranges
+    monkeypatch.setattr(word_count, "object_ranges", lambda size: object_ranges(size, range_size))
+    text = random_text(42, 300)
+    data = text.encode("utf-8")
+    s3.put_object(Bucket=BUCKET, Key="big.log", Body=data)
+
+    word_count.lambda_handler(s3_event("big.log", sizes={"big.log": len(data)}), None)
+
+    assert messages() == [f"The file big.log contains {len(text.split())} words."]
+    assert len(ranges) == -(-len(data) // range_size)
+    if range_size < len(data):
+        assert ranges[0] == f"bytes=0-{range_size + 2}"
+
+
+def test_missing_object_fails_after_publishing_the_others(aws):
+    s3, messages, ranges = aws
+    s3.put_object(Bucket=BUCKET, Key="ok.txt", Body=b"three little words")
+
+    with pytest.raises(RuntimeError, match="missing.txt"):
+        word_count.lambda_handler(s3_event("missing.txt", "ok.txt"), None)
+
+    assert messages() == ["The file ok.txt contains 3 words."]
+    # a missing object is not retried
+    assert len(ranges) == 2
+
+
+def test_overwritten_object_is_not_counted(aws):
+    s3, messages, ranges = aws
+    etag = s3.put_object(Bucket=BUCKET, Key="a.txt", Body=b"old words here")["ETag"].strip('"')
+    s3.put_object(Bucket=BUCKET, Key="a.txt", Body=b"new words")
+
+    with pytest.raises(RuntimeError, match="a.txt"):
+        word_count.lambda_handler(s3_event("a.txt", etags={"a.txt": etag}), None)
+
+    assert messages() == []
+    # 412 Precondition Failed is not retried
+    assert len(ranges) == 1
+
+
+def test_ranges_read_the_version_of_the_event(aws, monkeypatch):
+    s3, messages, ranges = aws
+    object_ranges = word_count.object_ranges
+    monkeypatch.setattr(word_count, "object_ranges", lambda size: object_ranges(size, 8))
+    s3.put_bucket_versioning(Bucket=BUCKET, VersioningConfiguration={"Status": "Enabled"})
+    old = b"one two three four five six"
+    version = s3.put_object(Bucket=BUCKET, Key="a.txt", Body=old)["VersionId"]
+    s3.put_object(Bucket=BUCKET, Key="a.txt", Body=b"replaced")
+
+    event = s3_event("a.txt", sizes={"a.txt": len(old)}, etags={"a.txt": "stale"}, versions={"a.txt": version})
+    word_count.lambda_handler(event, None)
+
+    assert messages() == ["The file a.txt contains 6 words."]
+    assert len(ranges) == 4
+
+
+def test_transient_errors_are_retried(aws, monkeypatch):
+    s3, messages, _ = aws
+    monkeypatch.setattr(word_count, "RETRY_BASE_DELAY", 0.01)
+    s3.put_object(Bucket=BUCKET, Key="ok.txt", Body=b"three little words")
+    count_range = word_count.count_range
+    errors = [
+        ClientError({"Error": {"Code": "SlowDown"}}, "GetObject"),
+        ReadTimeoutError(endpoint_url="https://s3"),
+    ]
+
+    def flaky(*args):
+        if errors:
+            raise errors.pop(0)
+        return count_range(*args)
+
+    monkeypatch.setattr(word_count, "count_range", flaky)
+
+    assert word_count.lambda_handler(s3_event("ok.txt"), None) == {"statusCode": 200, "counted": 1}
+    assert messages() == ["The file ok.txt contains 3 words."]
+
+
+def test_large_batches_are_split_at_the_sns_limit():
+    results = [(f"{n:0200d}.txt", n) for n in range(3000)]
+
+    messages = word_count.word_count_messages(results)
+
+    assert len(messages) > 1
+    assert all(len(m.encode("utf-8")) <= word_count.MAX_MESSAGE_BYTES for m in messages)
+    assert sum(len(m.splitlines()) for m in messages) == 3000
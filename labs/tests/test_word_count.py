@@ -0,0 +1,42 @@
+import io
+import random
+
+import pytest
+
+import count_file_words_uploaded_to_S3_with_aws_lambda as word_count
+
+WORDS = ["lambda", "S3", "größe", "日本語", "😀emoji", "naïve", "x"]
+SPACES = [" ", "  ", "\n", "\t", "\r\n", " ", "　", " "]
+
+
+def random_text(seed, words=500):
+    rng = random.Random(seed)
+    return "".join(rng.choice(WORDS) + rng.choice(SPACES) for _ in range(words))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 64, 4096])
+def test_counts_like_split_for_any_chunk_size(chunk_size):
+    for seed in range(5):
+        text = random_text(seed)
+        # leading and trailing whitespace, or none
+        for variant in (text, text.strip(), " " + text.strip() + "x"):
+            body = io.BytesIO(variant.encode("utf-8"))
+            assert word_count.count_words(body, chunk_size) == len(variant.split())
+
+
+def test_multibyte_characters_split_across_chunks():
+    text = "😀 日本語😀 größe"
+    assert word_count.count_words(io.BytesIO(text.encode("utf-8")), chunk_size=1) == 3
+
+
+def test_empty_and_blank_files():
+    assert word_count.count_words(io.BytesIO(b"")) == 0
+    assert word_count.count_words(io.BytesIO(b" \n\t "), chunk_size=2) == 0
+
+
+def test_invalid_utf8_is_rejected():
+    with pytest.raises(UnicodeDecodeError):
+        word_count.count_words(io.BytesIO(b"word \xff word"), chunk_size=3)
+    # a file cut off inside a multibyte character
+    with pytest.raises(UnicodeDecodeError):
+        word_count.count_words(io.BytesIO("word 😀".encode("utf-8")[:-1]), chunk_size=4)
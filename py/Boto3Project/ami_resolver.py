@@ -0,0 +1,117 @@
+# This file contains the lookup of AMI ids for EC2 instances
+import json
+import os
+import threading
+import time
+
+# SSM public parameters that always point to the newest image of a name pattern
+SSM_PUBLIC_PARAMETERS = {
+    ("amzn2-ami-hvm-*-x86_64-gp2", "x86_64"): "/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-x86_64-gp2",
+    ("amzn2-ami-hvm-*-arm64-gp2", "arm64"): "/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-arm64-gp2",
+    ("al2023-ami-2023.*-kernel-6.1-x86_64", "x86_64"): "/aws/service/ami-amazon-linux-latest/al2023-ami-kernel-6.1-x86_64",
+    ("al2023-ami-2023.*-kernel-6.1-arm64", "arm64"): "/aws/service/ami-amazon-linux-latest/al2023-ami-kernel-6.1-arm64",
+}
+
+
+def newest_image(images):
+    """Return the image with the latest CreationDate in one pass."""
+    newest = None
+    for image in images:
+        # CreationDate is ISO 8601, so string order is time order
+        if newest is None or image["CreationDate"] > newest["CreationDate"]:
+            newest = image
+    return newest
+
+
+class AMIResolver(object):
+    """Documentation for AMIResolver
+
+    Resolves an image name pattern to the newest AMI id, through the SSM
+    public parameter when there is one and a describe_images scan
+    otherwise. Results are cached on disk for ttl seconds, keyed on
+    region, architecture and name pattern. The region is always the one
+    of the EC2 client, since AMI ids only exist in one region.
+    """
+
+    def __init__(self, cache_file=None, ttl=86400):
+        super(AMIResolver, self).__init__()
+        self.client = None
+        self.cache_file = os.path.expanduser(cache_file) if cache_file else None
+        self.ttl = ttl
+        self.ssm_client = None
+        self._cache = None
+        self._lock = threading.Lock()
+
+    def set_client(self, client, ssm_client=None):
+        """Set the EC2 client and, optionally, the SSM client for AMI lookups."""
+        self.client = client
+        self.ssm_client = ssm_client
+
+    @property
+    def region(self):
+        """Region of the EC2 client, where the resolved AMI is launched."""
+        return self.client.meta.region_name
+
+    def resolve(self, name_pattern="amzn2-ami-hvm-*-x86_64-gp2", architecture="x86_64", owner="amazon"):
+        """Return the id of the newest available image matching the pattern."""
+        key = f"{self.region}|{architecture}|{owner}|{name_pattern}"
+        with self._lock:
+            entry = self._load_cache().get(key)
+            if entry and time.time() - entry["resolved_at"] < self.ttl:
+                return entry["image_id"]
+
+            image_id = None
+            parameter = SSM_PUBLIC_PARAMETERS.get((name_pattern, architecture))
+            if parameter and owner == "amazon":
+                image_id = self._from_ssm(parameter)
+            if image_id is None:
+                image_id = self._from_scan(name_pattern, architecture, owner)
+            if image_id:
+                self._cache[key] = {"image_id": image_id, "resolved_at": time.time()}
+                self._save_cache()
+            return image_id
+
+    def _from_ssm(self, parameter):
+        if self.ssm_client is None:
+            import boto3
+            self.ssm_client = boto3.client("ssm", region_name=self.region)
+        try:
+            return self.ssm_client.get_parameter(Name=parameter)["Parameter"]["Value"]
+        except Exception as e:
+            print(f"SSM lookup of {parameter} failed ({e}), scanning images instead")
+            return None
+
+    def _from_scan(self, name_pattern, architecture, owner):
+        response = self.client.describe_images(
+            Filters=[
+                {"Name": "name", "Values": [name_pattern]},
+                {"Name": "state", "Values": ["available"]},
+                {"Name": "architecture", "Values": [architecture]},
+            ],
+            Owners=[owner],
+        )
+        image = newest_image(response["Images"])
+        return image["ImageId"] if image else None
+
+    def _load_cache(self):
+        if self._cache is None:
+            self._cache = {}
+            if self.cache_file and os.path.exists(self.cache_file):
+                try:
+                    with open(self.cache_file, "r") as f:
+                        self._cache = json.load(f)
+                except (OSError, ValueError):
+                    # A damaged cache is only a missed lookup
+                    self._cache = {}
+        return self._cache
+
+    def _save_cache(self):
+        if not self.cache_file:
+            return
+        directory = os.path.dirname(self.cache_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.cache_file}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self._cache, f, indent=2)
+        os.replace(temporary, self.cache_file)
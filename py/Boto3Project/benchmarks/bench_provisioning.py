@@ -0,0 +1,71 @@
+"""
+Provisions the whole environment against moto with a fixed delay added to
+every EC2 and RDS API call, once one step at a time and once with the
+Provisioner running independent steps in parallel.
+
+    python benchmarks/bench_provisioning.py --latency-ms 200 --workers 1 8
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path[:0] = [str(HERE.parent), str(HERE.parent / "tests")]
+for name, value in [("AWS_DEFAULT_REGION", "us-west-2"), ("AWS_ACCESS_KEY_ID", "testing"),
+                    ("AWS_SECRET_ACCESS_KEY", "testing")]:
+    os.environ.setdefault(name, value)
+
+import boto3  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+from config import Config  # noqa: E402
+from ec2 import EC2  # noqa: E402
+from main import build_provisioner  # noqa: E402
+from rds import RDS  # noqa: E402
+from recording_client import RecordingClient  # noqa: E402
+
+
+def run(workers, latency, verbose):
+    config = Config(str(HERE.parent / "config.yml"))
+    config.use_myip = False
+    # moto's AMI ids must not end up in the real cache
+    config.ami_cache_file = None
+    with mock_aws():
+        ec2 = EC2(config)
+        ec2.client = RecordingClient(boto3.client("ec2"), latency)
+        rds = RDS(config)
+        rds.rds_client = RecordingClient(boto3.client("rds"), latency)
+        provisioner = build_provisioner(config, ec2, rds, max_workers=workers)
+        start = time.perf_counter()
+        provisioner.run()["rds_instance"].result()
+        elapsed = time.perf_counter() - start
+    if verbose:
+        provisioner.report()
+    return elapsed, provisioner
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--report", action="store_true", help="print the step timings of every run")
+    args = parser.parse_args()
+
+    # key pairs are written to the working directory
+    os.chdir(os.environ.get("TMPDIR", "/tmp"))
+    results = []
+    for workers in args.workers:
+        elapsed, provisioner = run(workers, args.latency_ms / 1000, args.report)
+        path = provisioner.critical_path()
+        path_time = sum(provisioner.timings[n][1] - provisioner.timings[n][0] for n in path)
+        results.append((workers, elapsed, path_time))
+
+    print(f"{'workers':>8} {'seconds':>8} {'critical path':>14}")
+    for workers, elapsed, path_time in results:
+        print(f"{workers:>8} {elapsed:>8.2f} {path_time:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,13 @@ class Config:
         self.key_pair_name = cfg["ec2"]["key_pair_name"]
         self.ec2_instance_name = cfg["ec2"]["ec2_instance_name"]
         self.instance_type = cfg["ec2"]["instance_type"]
+        self.instance_count = cfg["ec2"]["instance_count"]
         self.az = cfg["ec2"]["az"]
         self.az2 = cfg["ec2"]["az2"]
         self.region = cfg["ec2"]["region"]
+        self.ami_name_pattern = cfg["ec2"]["ami_name_pattern"]
+        self.ami_cache_file = cfg["ec2"]["ami_cache_file"]
+        self.ami_cache_ttl = cfg["ec2"]["ami_cache_ttl"]
 
         self.vpc_ip = cfg["vpc"]["ip"]
         self.vpc_net_mask = cfg["vpc"]["net_mask"]
@@ -48,3 +52,4 @@ class Config:
         self.allocated_storage = cfg["rds"]["allocated_storage"]
         self.db_subnet_group_name = cfg["rds"]["db_subnet_group_name"]
         self.rds_port = cfg["rds"]["port"]
+        self.rds_poll_interval = cfg["rds"]["poll_interval"]
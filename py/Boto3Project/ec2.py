@@ -1,6 +1,20 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
 import botocore
 
+from ami_resolver import AMIResolver
+
+
+class FleetLaunchError(Exception):
+    """Some subnets of a fleet failed to launch; instance_ids are the instances that did start."""
+
+    def __init__(self, message, instance_ids, errors):
+        super(FleetLaunchError, self).__init__(message)
+        self.instance_ids = instance_ids
+        self.errors = errors
+
 
 class EC2(object):
     """Documentation for EC2"""
@@ -8,26 +22,23 @@ class EC2(object):
     def __init__(self, config=None):
         super(EC2, self).__init__()
         self.config = config
+        self.ami_resolver = None
 
     def get_client(self):
         """Get the AWS client for EC2 operations."""
         self.client = boto3.client("ec2")
         return self.client
 
-    def get_image_id(self):
-        """Get the latest Amazon Linux 2 AMI ID."""
-        response = self.client.describe_images(
-            Filters=[
-                {"Name": "name", "Values": ["amzn2-ami-hvm-*-x86_64-gp2"]},
-                {"Name": "state", "Values": ["available"]},
-                {"Name": "architecture", "Values": ["x86_64"]},
-            ],
-            Owners=["amazon"],
-        )
-        images = sorted(
-            response["Images"], key=lambda x: x["CreationDate"], reverse=True
-        )
-        return images[0]["ImageId"] if images else None
+    def get_ami_resolver(self):
+        """Get the AMI resolver, which caches lookups on disk."""
+        if self.ami_resolver is None:
+            self.ami_resolver = AMIResolver(self.config.ami_cache_file, self.config.ami_cache_ttl)
+            self.ami_resolver.set_client(self.client)
+        return self.ami_resolver
+
+    def get_image_id(self, architecture="x86_64"):
+        """Get the latest AMI ID for config.ami_name_pattern, cached between runs."""
+        return self.get_ami_resolver().resolve(self.config.ami_name_pattern, architecture)
 
     def create_and_download_key_pair(self):
         """Download the key pair for EC2 instances."""
@@ -50,16 +61,27 @@ class EC2(object):
 
     def run_instances(self, security_group_ids=None, subnet_id=None):
         """Run an EC2 instance with the latest Amazon Linux 2 AMI."""
-        image_id = self.get_image_id()
+        return self.launch_instances(security_group_ids, subnet_id)[0]
+
+    def launch_instances(self, security_group_ids=None, subnet_id=None, count=1, image_id=None):
+        """Run count EC2 instances with the latest Amazon Linux 2 AMI in one call; returns their ids."""
+        image_id = image_id or self.get_image_id()
         if not image_id:
             raise Exception("No suitable AMI found.")
 
-        # run instance with public ip address in the specified subnet
+        # run instances with public ip address in the specified subnet
+        network_interface = {
+            "DeviceIndex": 0,
+            "AssociatePublicIpAddress": True,
+            "SubnetId": subnet_id,
+        }
+        if security_group_ids:
+            network_interface["Groups"] = security_group_ids
         response = self.client.run_instances(
             ImageId=image_id,
             InstanceType=self.config.instance_type,
-            MinCount=1,
-            MaxCount=1,
+            MinCount=count,
+            MaxCount=count,
             KeyName=self.config.key_pair_name,
             TagSpecifications=[
                 {
@@ -67,15 +89,85 @@ class EC2(object):
                     "Tags": [{"Key": "Name", "Value": self.config.ec2_instance_name}],
                 }
             ],
-            NetworkInterfaces=[
-                {
-                    "DeviceIndex": 0,
-                    "AssociatePublicIpAddress": True,
-                    "SubnetId": subnet_id,
-                    "Groups": security_group_ids
-                }
-            ],
+            NetworkInterfaces=[network_interface],
         )
-        instance_id = response["Instances"][0]["InstanceId"]
-        print(f"EC2 instance {instance_id} run successfully.")
-        return instance_id
+        instance_ids = [instance["InstanceId"] for instance in response["Instances"]]
+        print(f"EC2 instances {', '.join(instance_ids)} run successfully in {subnet_id}.")
+        return instance_ids
+
+    def run_fleet(self, count, security_group_ids=None, subnet_ids=None, wait=False, poll_interval=5):
+        """Run count instances spread evenly over the subnets, one call per subnet.
+
+        The subnets are expected to be in different AZs (config.az, config.az2)
+        and are launched into at the same time. Returns all instance ids.
+        If a subnet fails, the others are still collected and a
+        FleetLaunchError carries the ids of the instances that did start.
+        """
+        if not subnet_ids:
+            raise ValueError("At least one subnet is needed for a fleet.")
+        image_id = self.get_image_id()
+        # e.g. 5 instances over 2 subnets -> 3 + 2
+        share, extra = divmod(count, len(subnet_ids))
+        launches = [
+            (subnet_id, share + (1 if i < extra else 0))
+            for i, subnet_id in enumerate(subnet_ids)
+        ]
+        launches = [(subnet_id, n) for subnet_id, n in launches if n]
+
+        with ThreadPoolExecutor(max_workers=len(launches)) as executor:
+            futures = [
+                executor.submit(self.launch_instances, security_group_ids, subnet_id, n, image_id)
+                for subnet_id, n in launches
+            ]
+            instance_ids, errors = [], []
+            for future, (subnet_id, _) in zip(futures, launches):
+                try:
+                    instance_ids += future.result()
+                except Exception as e:
+                    errors.append((subnet_id, e))
+
+        if errors:
+            # The launched instances keep running, so their ids must not get lost
+            failures = "; ".join(f"{subnet_id}: {e}" for subnet_id, e in errors)
+            raise FleetLaunchError(
+                f"Launching the fleet failed in {len(errors)} subnet(s) ({failures}); "
+                f"instances running: {', '.join(instance_ids) or 'none'}",
+                instance_ids,
+                errors,
+            )
+
+        print(f"Fleet of {len(instance_ids)} instances launched in {len(launches)} subnets.")
+        if wait:
+            self.wait_for_instances(instance_ids, poll_interval=poll_interval)
+        return instance_ids
+
+    def wait_for_instances(self, instance_ids, state="running", poll_interval=5, timeout=600):
+        """Wait until all instances are in the given state, with one describe call per poll."""
+        started = time.monotonic()
+        pending = set(instance_ids)
+        while True:
+            states = {}
+            # describe_instances takes at most 1000 ids per call
+            remaining = sorted(pending)
+            for i in range(0, len(remaining), 1000):
+                try:
+                    response = self.client.describe_instances(InstanceIds=remaining[i:i + 1000])
+                except botocore.exceptions.ClientError as e:
+                    # EC2 is eventually consistent: new instances can be unknown for a moment
+                    if e.response["Error"]["Code"] != "InvalidInstanceID.NotFound":
+                        raise
+                    continue
+                for reservation in response["Reservations"]:
+                    for instance in reservation["Instances"]:
+                        states[instance["InstanceId"]] = instance["State"]["Name"]
+            pending = {i for i in pending if states.get(i) != state}
+            failed = [i for i in pending if states.get(i) in ("shutting-down", "terminated", "stopped")]
+            if failed:
+                raise Exception(f"Instances {', '.join(sorted(failed))} will not reach {state}.")
+            elapsed = time.monotonic() - started
+            print(f"{len(instance_ids) - len(pending)}/{len(instance_ids)} instances {state} after {elapsed:.0f}s")
+            if not pending:
+                return instance_ids
+            if elapsed + poll_interval > timeout:
+                raise TimeoutError(f"Instances {', '.join(sorted(pending))} not {state} after {elapsed:.0f}s")
+            time.sleep(poll_interval)
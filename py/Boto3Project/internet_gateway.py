@@ -1,3 +1,6 @@
+from tags import name_tag_specifications
+
+
 class InternetGateway(object):
     """Documentation for InternetGateway"""
 
@@ -10,22 +13,14 @@ class InternetGateway(object):
         self.client = client
 
     def create_internet_gateway(self):
-        """Create an Internet Gateway."""
-        igw = self.client.create_internet_gateway()
+        """Create an Internet Gateway named after config.igw_name."""
+        igw = self.client.create_internet_gateway(
+            TagSpecifications=name_tag_specifications("internet-gateway", self.config.igw_name)
+        )
         self.igw_id = igw["InternetGateway"]["InternetGatewayId"]
-        print(f"Internet Gateway {self.igw_id} created")
+        print(f"Internet Gateway {self.igw_id} created with Name: {self.config.igw_name}")
         return self.igw_id
 
-    def create_tags(self):
-        """Create tags for the Internet Gateway."""
-        self.client.create_tags(
-            Resources=[self.igw_id],
-            Tags=[{"Key": "Name", "Value": self.config.igw_name}],
-        )
-        print(
-            f"Tags created for Internet Gateway {self.igw_id} with Name: {self.config.igw_name}"
-        )
-
     def attach_internet_gateway(self, vpc_id):
         """Attach the Internet Gateway to the specified VPC."""
         response = self.client.attach_internet_gateway(
@@ -4,6 +4,11 @@
 # Route tables and routes for internet access An internet gateway for the VPC
 # Security groups to control access to resources EC2 instances for running applications
 # RDS instances for database storage
+#
+# Every step declares the steps it depends on, and the Provisioner runs
+# independent steps (subnets, key pair, security groups, ...) at the same time.
+
+import argparse
 
 from config import Config
 from ec2 import EC2
@@ -12,111 +17,244 @@ from subnet import Subnet
 from internet_gateway import InternetGateway
 from route_table import RouteTable
 from security_group import SecurityGroup
-from rds import RDS
+from rds import RDS, RDSInstanceHandle
+from provisioner import Provisioner
+from reconcile import EnvironmentState
 
 
-def main():
-    config = Config()
+def build_provisioner(config, ec2, rds, max_workers=8, state=None):
+    """Declare every provisioning step and its dependencies.
 
-    ec2 = EC2(config)
-    ec2_client = ec2.get_client()
+    Resources found in state (an EnvironmentState snapshot) are picked up
+    instead of created, so only what is missing is written to AWS.
+    """
+    state = state or EnvironmentState()
+    ec2_client = ec2.client
+    p = Provisioner(max_workers=max_workers)
 
     # VPC Operations
-    # create a VPC
     vpc = VPC()
     vpc.set_client(ec2_client)
-    vpc_id = vpc.create_vpc(cidr_block=config.vpc_cidr)
-    vpc.create_tags(vpc_name=config.vpc_name)
-    vpc.enable_DNS()
+    if state.vpc_id:
+        vpc.vpc_id = state.vpc_id
+        p.add("vpc", lambda: vpc.vpc_id, action="exists")
+        p.add("vpc_dns", lambda: None, depends_on=["vpc"], action="exists")
+    else:
+        p.add("vpc", lambda: vpc.create_vpc(cidr_block=config.vpc_cidr, vpc_name=config.vpc_name))
+        p.add("vpc_dns", vpc.enable_DNS, depends_on=["vpc"])
 
     # Subnet Operations
     subnet = Subnet(config)
     subnet.set_client(ec2_client)
-    public_subnet_names = [config.public_subnet1_name, config.public_subnet2_name]
-    private_subnet_names = [config.private_subnet1_name, config.private_subnet2_name]
-    azs = [config.az, config.az2]
-    # create public subnets
-    for subnet_name, az in zip(public_subnet_names, azs):
-        # create public subnets and get their ids at the same time
-        subnet.create_subnet(
-            name=subnet_name,
-            cidr_block=(
-                config.public_subnet1_cidr
-                if "1" in subnet_name
-                else config.public_subnet2_cidr
-            ),
-            az=az,
-            vpc_id=vpc_id,
-            map_public_ip_on_launch=True,
-        )
-    # create private subnets
-    for subnet_name, az in zip(private_subnet_names, azs):
-        subnet.create_subnet(
-            name=subnet_name,
-            cidr_block=(
-                config.private_subnet1_cidr
-                if "1" in subnet_name
-                else config.private_subnet2_cidr
+    subnets = [
+        (config.public_subnet1_name, config.public_subnet1_cidr, config.az, True),
+        (config.public_subnet2_name, config.public_subnet2_cidr, config.az2, True),
+        (config.private_subnet1_name, config.private_subnet1_cidr, config.az, False),
+        (config.private_subnet2_name, config.private_subnet2_cidr, config.az2, False),
+    ]
+    for name, cidr_block, az, public in subnets:
+        if name in state.subnets:
+            subnet_id, mapped = state.subnets[name]
+            config.subnet_ids[name] = subnet_id
+            if public and not mapped:
+                p.add(f"subnet:{name}", lambda subnet_id=subnet_id: subnet.map_public_ip_on_launch(subnet_id),
+                      depends_on=["vpc"], action="update")
+            else:
+                p.add(f"subnet:{name}", lambda subnet_id=subnet_id: subnet_id, depends_on=["vpc"], action="exists")
+            continue
+        p.add(
+            f"subnet:{name}",
+            lambda name=name, cidr_block=cidr_block, az=az, public=public: subnet.create_subnet(
+                name=name,
+                cidr_block=cidr_block,
+                az=az,
+                vpc_id=vpc.vpc_id,
+                map_public_ip_on_launch=public,
             ),
-            az=az,
-            vpc_id=vpc_id,
-            map_public_ip_on_launch=False,
+            depends_on=["vpc"],
         )
-    # Print the subnet IDs
-    print(f"Subnets Created ----: {config.subnet_ids}")
+    public_subnet1 = f"subnet:{config.public_subnet1_name}"
+    public_subnet2 = f"subnet:{config.public_subnet2_name}"
 
     # Internet Gateway Operations
     igw = InternetGateway(config)
     igw.set_client(ec2_client)
-    igw.create_internet_gateway()
-    igw.create_tags()
-    igw.attach_internet_gateway(vpc_id)
+    if state.igw_id:
+        igw.igw_id = state.igw_id
+        p.add("igw", lambda: igw.igw_id, action="exists")
+    else:
+        p.add("igw", igw.create_internet_gateway)
+    if state.igw_attached:
+        p.add("igw_attach", lambda: None, depends_on=["igw", "vpc"], action="exists")
+    else:
+        p.add("igw_attach", lambda: igw.attach_internet_gateway(vpc.vpc_id), depends_on=["igw", "vpc"])
 
     # Route Table Operations
     rt = RouteTable(config)
     rt.set_client(ec2_client)
-    # create route table for public subnet
-    public_route_table_id = rt.create_route_table(vpc_id)
-    # create tags for public route table
-    rt.create_tags(route_table_id=public_route_table_id)
+    if state.route_table_id:
+        rt.route_table_id = state.route_table_id
+        p.add("route_table", lambda: rt.route_table_id, depends_on=["vpc"], action="exists")
+    else:
+        def create_route_table():
+            rt.route_table_id = rt.create_route_table(vpc.vpc_id)
+
+        p.add("route_table", create_route_table, depends_on=["vpc"])
     # create route for public subnet to internet gateway
-    rt.create_route(route_table_id=public_route_table_id, gateway_id=igw.igw_id)
+    if state.has_internet_route:
+        p.add("route", lambda: None, depends_on=["route_table", "igw_attach"], action="exists")
+    else:
+        p.add(
+            "route",
+            lambda: rt.create_route(route_table_id=rt.route_table_id, gateway_id=igw.igw_id),
+            depends_on=["route_table", "igw_attach"],
+        )
     # associate route table with public subnet
-    rt.associate_route_table(
-        route_table_id=public_route_table_id,
-        subnet_id=config.subnet_ids[config.public_subnet1_name],
-    )
+    if config.subnet_ids.get(config.public_subnet1_name) in state.associated_subnet_ids:
+        p.add("route_table_association", lambda: None, depends_on=["route_table", public_subnet1], action="exists")
+    else:
+        p.add(
+            "route_table_association",
+            lambda: rt.associate_route_table(
+                route_table_id=rt.route_table_id,
+                subnet_id=config.subnet_ids[config.public_subnet1_name],
+            ),
+            depends_on=["route_table", public_subnet1],
+        )
 
     # Security Group Operations
+    def add_security_group(step, sg, group_name, port, description):
+        if group_name in state.security_groups:
+            sg.security_group_id, ports = state.security_groups[group_name]
+            if port in ports:
+                p.add(step, lambda: sg.security_group_id, depends_on=["vpc"], action="exists")
+            else:
+                p.add(step, lambda: sg.authorize_securtiy_group(port=port, description=description),
+                      depends_on=["vpc"], action="update")
+            return
+
+        def create_security_group():
+            sg.create_security_group(group_name, vpc.vpc_id)
+            sg.authorize_securtiy_group(port=port, description=description)
+
+        p.add(step, create_security_group, depends_on=["vpc"])
+
     # Create security groups for EC2 instance -- allow SSH access
     sg = SecurityGroup(config)
     sg.set_client(ec2_client)
-    sg.create_security_group(config.security_group_name, vpc_id)
-    sg.authorize_securtiy_group(port=config.ssh_port, description="Allow SSH access")
-    sg.create_tags()
+    add_security_group("sg_ec2", sg, config.security_group_name, config.ssh_port, "Allow SSH access")
+
+    # Create security group for RDS
+    rds_sg = SecurityGroup(config)
+    rds_sg.set_client(ec2_client)
+    add_security_group("sg_rds", rds_sg, config.security_group_name + "-rds", config.rds_port, "Allow RDS access")
 
     # EC2 instance Operations
     # Create key pair for EC2 instance
-    ec2.create_and_download_key_pair()
-    # Run EC2 instance in public subnet
-    ec2.run_instances(
-        security_group_ids=[sg.security_group_id],
-        subnet_id=config.subnet_ids[config.public_subnet1_name]
-    )
+    if state.key_pair_exists:
+        p.add("key_pair", lambda: None, action="exists")
+    else:
+        p.add("key_pair", ec2.create_and_download_key_pair)
+    missing_instances = config.instance_count - len(state.instance_ids)
+    if missing_instances <= 0:
+        p.add("ec2_instance", lambda: state.instance_ids, depends_on=["key_pair", "sg_ec2", public_subnet1],
+              action="exists")
+    elif config.instance_count > 1:
+        # Spread the instances over the public subnets in config.az and config.az2
+        p.add(
+            "ec2_instance",
+            lambda: state.instance_ids + ec2.run_fleet(
+                missing_instances,
+                security_group_ids=[sg.security_group_id],
+                subnet_ids=[
+                    config.subnet_ids[config.public_subnet1_name],
+                    config.subnet_ids[config.public_subnet2_name],
+                ],
+                wait=True,
+            ),
+            depends_on=["key_pair", "sg_ec2", public_subnet1, public_subnet2],
+        )
+    else:
+        # Run EC2 instance in public subnet
+        p.add(
+            "ec2_instance",
+            lambda: ec2.run_instances(
+                security_group_ids=[sg.security_group_id],
+                subnet_id=config.subnet_ids[config.public_subnet1_name],
+            ),
+            depends_on=["key_pair", "sg_ec2", public_subnet1],
+        )
 
     # RDS Operations
-    rds = RDS(config)
     # Only get subnet ids from public subnets
-    public_subnet_ids = [
-        config.subnet_ids[config.public_subnet1_name],
-        config.subnet_ids[config.public_subnet2_name],
-    ]
-    rds.create_db_subnet_group(subnet_ids=public_subnet_ids)
-    # Create security group for RDS
-    sg.create_security_group(config.security_group_name + "-rds", vpc_id)
-    # Authorize security group for RDS
-    sg.authorize_securtiy_group(port=config.rds_port, description="Allow RDS access")
-    rds.create_RDS_instance(rds_sg_ids=[sg.security_group_id])
+    if state.db_subnet_group_exists:
+        p.add("db_subnet_group", lambda: None, depends_on=[public_subnet1, public_subnet2], action="exists")
+    else:
+        p.add(
+            "db_subnet_group",
+            lambda: rds.create_db_subnet_group(
+                subnet_ids=[
+                    config.subnet_ids[config.public_subnet1_name],
+                    config.subnet_ids[config.public_subnet2_name],
+                ]
+            ),
+            depends_on=[public_subnet1, public_subnet2],
+        )
+    if state.db_instance_status:
+        # Only wait for an instance that is still starting from an earlier run
+        p.add(
+            "rds_instance",
+            lambda: None if state.db_instance_status == "available" else RDSInstanceHandle(
+                rds.rds_client, config.db_instance_identifier, poll_interval=config.rds_poll_interval
+            ),
+            depends_on=["db_subnet_group", "sg_rds"],
+            action="exists",
+        )
+    else:
+        # Returns a handle right after the create call; the instance keeps
+        # starting while the remaining steps run
+        p.add(
+            "rds_instance",
+            lambda: rds.create_RDS_instance(rds_sg_ids=[rds_sg.security_group_id], wait=False),
+            depends_on=["db_subnet_group", "sg_rds"],
+        )
+    return p
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision the VPC, EC2 and RDS resources")
+    parser.add_argument("--workers", type=int, default=8, help="API calls run in parallel, 1 runs them one by one")
+    parser.add_argument(
+        "--mode",
+        choices=["reconcile", "plan", "create"],
+        default="reconcile",
+        help="reconcile: create only what is missing; plan: only show what reconcile would do; "
+        "create: create everything without looking for existing resources",
+    )
+    args = parser.parse_args()
+
+    config = Config()
+
+    ec2 = EC2(config)
+    ec2.get_client()
+    rds = RDS(config)
+
+    state = None
+    if args.mode != "create":
+        state = EnvironmentState.snapshot(config, ec2.client, rds.rds_client)
+    provisioner = build_provisioner(config, ec2, rds, max_workers=args.workers, state=state)
+    if args.mode == "plan":
+        provisioner.plan()
+        return
+    try:
+        provisioner.run()
+        # Join on the RDS instance last, it takes by far the longest
+        if provisioner.results.get("rds_instance"):
+            provisioner.results["rds_instance"].result()
+    finally:
+        # Print the subnet IDs
+        print(f"Subnets Created ----: {config.subnet_ids}")
+        provisioner.report()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+# This file contains a small dependency-aware executor for provisioning steps
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Provisioner(object):
+    """Run provisioning steps concurrently, each as soon as its dependencies are done.
+
+    Steps are added with the names of the steps they depend on. Independent
+    steps run at the same time on a thread pool; a failed step stops its
+    dependents from starting, while unrelated steps still finish.
+    """
+
+    def __init__(self, max_workers=8):
+        super(Provisioner, self).__init__()
+        self.max_workers = max_workers
+        self.steps = {}
+        self.actions = {}
+        self.timings = {}
+        self.results = {}
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, name, func, depends_on=(), action="create"):
+        """Register a step; func is called without arguments.
+
+        action describes what the step does to AWS ("create", "update" or
+        "exists" for steps that only pick up an existing resource) and is
+        only used by plan().
+        """
+        if name in self.steps:
+            raise ValueError(f"Step '{name}' is already defined")
+        self.steps[name] = (func, tuple(depends_on))
+        self.actions[name] = action
+        return name
+
+    def plan(self):
+        """Print what each step would do, without running anything."""
+        for name, action in self.actions.items():
+            print(f"{action:<8} {name}")
+        changes = sum(1 for action in self.actions.values() if action != "exists")
+        print(f"{changes} of {len(self.actions)} steps would change the environment")
+        return dict(self.actions)
+
+    def check(self):
+        """Make sure every dependency exists and there are no cycles."""
+        for name, (_, depends_on) in self.steps.items():
+            for dependency in depends_on:
+                if dependency not in self.steps:
+                    raise ValueError(f"Step '{name}' depends on unknown step '{dependency}'")
+        visiting, done = set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dependency in self.steps[name][1]:
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.steps:
+            visit(name, [])
+
+    def run(self):
+        """Run all steps and return their results, raising the first error."""
+        self.check()
+        self.started = time.perf_counter()
+        pending = dict(self.steps)
+        finished, failed = set(), {}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name, (func, depends_on) in list(pending.items()):
+                    if any(dependency in failed for dependency in depends_on):
+                        print(f"Skipping {name}: a dependency failed")
+                        failed[name] = None
+                        del pending[name]
+                    elif all(dependency in finished for dependency in depends_on):
+                        running[executor.submit(self._run_step, name, func)] = name
+                        del pending[name]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        finished.add(name)
+                        self.results[name] = future.result()
+                    else:
+                        print(f"Step {name} failed: {error}")
+                        failed[name] = error
+
+        self.elapsed = time.perf_counter() - self.started
+        errors = [error for error in failed.values() if error is not None]
+        if errors:
+            raise errors[0]
+        return self.results
+
+    def _run_step(self, name, func):
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            with self._lock:
+                self.timings[name] = (start - self.started, time.perf_counter() - self.started)
+
+    def critical_path(self):
+        """Return the chain of steps that determined the total run time."""
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda step: self.timings[step][1])
+        path = [name]
+        while True:
+            dependencies = [d for d in self.steps[name][1] if d in self.timings]
+            if not dependencies:
+                break
+            name = max(dependencies, key=lambda step: self.timings[step][1])
+            path.append(name)
+        return path[::-1]
+
+    def report(self):
+        """Print when each step ran and the critical path."""
+        print(f"{'step':<28} {'start':>7} {'seconds':>8}")
+        for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            print(f"{name:<28} {start:>7.2f} {end - start:>8.2f}")
+        path = self.critical_path()
+        path_time = sum(self.timings[name][1] - self.timings[name][0] for name in path)
+        total_work = sum(end - start for start, end in self.timings.values())
+        print(f"Critical path ({path_time:.2f}s): {' -> '.join(path)}")
+        print(f"Wall time {self.elapsed:.2f}s, sequential time {total_work:.2f}s")
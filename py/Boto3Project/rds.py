@@ -1,5 +1,87 @@
+import threading
+import time
+
 import boto3
 
+# Statuses an instance being created does not recover from on its own
+FAILED_STATUSES = {
+    "failed",
+    "incompatible-network",
+    "incompatible-option-group",
+    "incompatible-parameters",
+    "incompatible-restore",
+    "inaccessible-encryption-credentials",
+    "storage-full",
+}
+
+
+def print_progress(identifier, status, elapsed):
+    print(f"RDS instance '{identifier}' is {status} after {elapsed:.0f}s")
+
+
+class RDSInstanceHandle(object):
+    """Documentation for RDSInstanceHandle
+
+    Waits in a background thread until an RDS instance is available and
+    runs the follow-up steps; result() joins it and returns the endpoint.
+    """
+    def __init__(self, rds_client, identifier, poll_interval=30, timeout=3600,
+                 on_progress=print_progress, on_available=None):
+        super(RDSInstanceHandle, self).__init__()
+        self.rds_client = rds_client
+        self.identifier = identifier
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.on_progress = on_progress
+        self.on_available = on_available
+        self.status = None
+        self.endpoint = None
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name=f"rds-{identifier}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            instance = self._poll()
+            if self.on_available:
+                self.on_available()
+            self.endpoint = instance["Endpoint"]["Address"]
+            print(f"RDS Endpoint: {self.endpoint}")
+        except Exception as e:
+            self.error = e
+
+    def _poll(self):
+        """Describe the instance every poll_interval seconds until it is available."""
+        started = time.monotonic()
+        while True:
+            instance = self.rds_client.describe_db_instances(
+                DBInstanceIdentifier=self.identifier
+            )["DBInstances"][0]
+            self.status = instance["DBInstanceStatus"]
+            elapsed = time.monotonic() - started
+            if self.on_progress:
+                self.on_progress(self.identifier, self.status, elapsed)
+            if self.status == "available" and "Endpoint" in instance:
+                return instance
+            if self.status in FAILED_STATUSES:
+                raise RuntimeError(f"RDS instance '{self.identifier}' is {self.status}")
+            if elapsed + self.poll_interval > self.timeout:
+                raise TimeoutError(f"RDS instance '{self.identifier}' not available after {elapsed:.0f}s")
+            time.sleep(self.poll_interval)
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def result(self, timeout=None):
+        """Wait for the instance and return its endpoint address."""
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise TimeoutError(f"RDS instance '{self.identifier}' is still {self.status}")
+        if self.error:
+            raise self.error
+        return self.endpoint
+
+
 class RDS(object):
     """Documentation for RDS
 
@@ -8,7 +90,7 @@ class RDS(object):
         super(RDS, self).__init__()
         self.config = config
         self.get_client()
-        
+
     def get_client(self):
         """Get the AWS client for RDS operations."""
         self.rds_client = boto3.client('rds')
@@ -29,11 +111,18 @@ class RDS(object):
             )
             print(f"DB Subnet Group '{self.config.db_subnet_group}' created successfully.")
 
-    def create_RDS_instance(self, rds_sg_ids, enhanced_monitoring=False):
-        """Create an RDS instance."""
+    def create_RDS_instance(self, rds_sg_ids, enhanced_monitoring=False, wait=True,
+                            poll_interval=None, on_progress=print_progress):
+        """Create an RDS instance.
+
+        With wait=False a RDSInstanceHandle is returned straight after the
+        create call, so other resources can be provisioned while the
+        instance starts; call result() on it to get the endpoint.
+        """
         try:
             self.rds_client.describe_db_instances(DBInstanceIdentifier=self.config.db_instance_identifier)
             print(f"RDS instance '{self.config.db_instance_identifier}' already exists.")
+            on_available = None
         except self.rds_client.exceptions.DBInstanceNotFoundFault:
             print("Creating RDS instance...")
             # Create RDS Instance
@@ -51,21 +140,23 @@ class RDS(object):
                 PubliclyAccessible=False
             )
             print(f"RDS instance '{self.config.db_instance_identifier}' created successfully.")
+            on_available = None if enhanced_monitoring else self.disable_enhanced_monitoring
 
-            print("Waiting for RDS to become available...")
-            self.rds_client.get_waiter('db_instance_available').wait(DBInstanceIdentifier=self.config.db_instance_identifier)
-
-            # Disable enhanced monitoring
-            if not enhanced_monitoring:
-                self.rds_client.modify_db_instance(
-                    DBInstanceIdentifier=self.config.db_instance_identifier,
-                    MonitoringInterval=0,
-                    ApplyImmediately=True
-                )
-
-            endpoint = self.rds_client.describe_db_instances(
-                DBInstanceIdentifier=self.config.db_instance_identifier
-            )['DBInstances'][0]['Endpoint']['Address']
-            print(f"RDS Endpoint: {endpoint}")
-
+        print("Waiting for RDS to become available...")
+        handle = RDSInstanceHandle(
+            self.rds_client,
+            self.config.db_instance_identifier,
+            poll_interval=poll_interval or self.config.rds_poll_interval,
+            on_progress=on_progress,
+            on_available=on_available,
+        )
+        if wait:
+            handle.result()
+        return handle
 
+    def disable_enhanced_monitoring(self):
+        self.rds_client.modify_db_instance(
+            DBInstanceIdentifier=self.config.db_instance_identifier,
+            MonitoringInterval=0,
+            ApplyImmediately=True
+        )
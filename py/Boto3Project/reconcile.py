@@ -0,0 +1,119 @@
+# This file contains the snapshot of what already exists in AWS, used to
+# create only the missing resources when main.py runs again
+
+
+def describe_all(client, operation, key, **kwargs):
+    """Collect the items of every page of a paginated describe call."""
+    items = []
+    for page in client.get_paginator(operation).paginate(**kwargs):
+        items += page.get(key, [])
+    return items
+
+
+def name_tag(resource):
+    for tag in resource.get("Tags", []):
+        if tag["Key"] == "Name":
+            return tag["Value"]
+    return None
+
+
+class EnvironmentState(object):
+    """Documentation for EnvironmentState
+
+    The resources of the environment described by Config that already
+    exist, found by their Name tags, group names and identifiers.
+    """
+
+    def __init__(self):
+        super(EnvironmentState, self).__init__()
+        self.vpc_id = None
+        # subnet name -> (subnet id, MapPublicIpOnLaunch)
+        self.subnets = {}
+        self.igw_id = None
+        self.igw_attached = False
+        self.route_table_id = None
+        self.has_internet_route = False
+        self.associated_subnet_ids = set()
+        # group name -> (group id, ingress ports)
+        self.security_groups = {}
+        self.key_pair_exists = False
+        self.instance_ids = []
+        self.db_subnet_group_exists = False
+        self.db_instance_status = None
+        self._route_gateways = set()
+
+    @classmethod
+    def snapshot(cls, config, ec2_client, rds_client):
+        """Read the current state with one paginated describe call per resource type."""
+        state = cls()
+        vpcs = describe_all(
+            ec2_client, "describe_vpcs", "Vpcs",
+            Filters=[{"Name": "tag:Name", "Values": [config.vpc_name]}, {"Name": "cidr", "Values": [config.vpc_cidr]}],
+        )
+        if vpcs:
+            if len(vpcs) > 1:
+                print(f"Found {len(vpcs)} VPCs named {config.vpc_name}, using {vpcs[0]['VpcId']}")
+            state.vpc_id = vpcs[0]["VpcId"]
+            state._read_vpc_resources(config, ec2_client)
+
+        igws = describe_all(
+            ec2_client, "describe_internet_gateways", "InternetGateways",
+            Filters=[{"Name": "tag:Name", "Values": [config.igw_name]}],
+        )
+        # Prefer the gateway already attached to the VPC
+        igws.sort(key=lambda igw: not any(a["VpcId"] == state.vpc_id for a in igw.get("Attachments", [])))
+        if igws:
+            state.igw_id = igws[0]["InternetGatewayId"]
+            state.igw_attached = any(
+                a["VpcId"] == state.vpc_id and a.get("State") in ("attached", "available")
+                for a in igws[0].get("Attachments", [])
+            )
+        if state.route_table_id and state.igw_id:
+            state.has_internet_route = state.igw_id in state._route_gateways
+
+        key_pairs = ec2_client.describe_key_pairs(
+            Filters=[{"Name": "key-name", "Values": [config.key_pair_name]}]
+        )["KeyPairs"]
+        state.key_pair_exists = bool(key_pairs)
+
+        db_subnet_groups = describe_all(rds_client, "describe_db_subnet_groups", "DBSubnetGroups")
+        state.db_subnet_group_exists = any(
+            g["DBSubnetGroupName"].lower() == config.db_subnet_group_name.lower() for g in db_subnet_groups
+        )
+        db_instances = describe_all(rds_client, "describe_db_instances", "DBInstances")
+        for instance in db_instances:
+            if instance["DBInstanceIdentifier"].lower() == config.db_instance_identifier.lower():
+                state.db_instance_status = instance["DBInstanceStatus"]
+        return state
+
+    def _read_vpc_resources(self, config, ec2_client):
+        in_vpc = [{"Name": "vpc-id", "Values": [self.vpc_id]}]
+        for subnet in describe_all(ec2_client, "describe_subnets", "Subnets", Filters=in_vpc):
+            name = name_tag(subnet)
+            if name:
+                self.subnets[name] = (subnet["SubnetId"], subnet.get("MapPublicIpOnLaunch", False))
+
+        for route_table in describe_all(ec2_client, "describe_route_tables", "RouteTables", Filters=in_vpc):
+            if name_tag(route_table) != config.public_route_table_name:
+                continue
+            self.route_table_id = route_table["RouteTableId"]
+            self._route_gateways = {
+                route.get("GatewayId") for route in route_table.get("Routes", [])
+                if route.get("DestinationCidrBlock") == "0.0.0.0/0"
+            }
+            self.associated_subnet_ids = {
+                a["SubnetId"] for a in route_table.get("Associations", []) if a.get("SubnetId")
+            }
+
+        for group in describe_all(ec2_client, "describe_security_groups", "SecurityGroups", Filters=in_vpc):
+            ports = {permission.get("FromPort") for permission in group.get("IpPermissions", [])}
+            self.security_groups[group["GroupName"]] = (group["GroupId"], ports)
+
+        instances = describe_all(
+            ec2_client, "describe_instances", "Reservations",
+            Filters=in_vpc + [
+                {"Name": "tag:Name", "Values": [config.ec2_instance_name]},
+                {"Name": "instance-state-name", "Values": ["pending", "running"]},
+            ],
+        )
+        self.instance_ids = [i["InstanceId"] for reservation in instances for i in reservation["Instances"]]
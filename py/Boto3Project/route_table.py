@@ -1,3 +1,6 @@
+from tags import name_tag_specifications
+
+
 class RouteTable(object):
     """Documentation for RouteTable"""
 
@@ -9,21 +12,17 @@ class RouteTable(object):
         """Set the AWS client for Route Table operations."""
         self.client = client
 
-    def create_route_table(self, vpc_id):
-        """Create a route table in the specified VPC."""
-        route_table = self.client.create_route_table(VpcId=vpc_id)
+    def create_route_table(self, vpc_id, name=None):
+        """Create a named route table in the specified VPC."""
+        name = name or self.config.public_route_table_name
+        route_table = self.client.create_route_table(
+            VpcId=vpc_id,
+            TagSpecifications=name_tag_specifications("route-table", name),
+        )
         route_table_id = route_table["RouteTable"]["RouteTableId"]
-        print(f"Route Table {route_table_id} created in VPC {vpc_id}")
+        print(f"Route Table {name}:{route_table_id} created in VPC {vpc_id}")
         return route_table_id
 
-    def create_tags(self, route_table_id):
-        """Create tags for the route table."""
-        name = self.config.public_route_table_name
-        self.client.create_tags(
-            Resources=[route_table_id], Tags=[{"Key": "Name", "Value": name}]
-        )
-        print(f"Tags created for Route Table {route_table_id} with Name: {name}")
-
     def create_route(
         self, route_table_id, gateway_id, destination_cidr_block="0.0.0.0/0"
     ):
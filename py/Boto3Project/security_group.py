@@ -1,5 +1,7 @@
 import requests
 
+from tags import name_tag_specifications
+
 
 class SecurityGroup(object):
     """Documentation for SecurityGroup"""
@@ -23,7 +25,10 @@ class SecurityGroup(object):
     def create_security_group(self, group_name, vpc_id, description="Default SG"):
         """Create a security group in the specified VPC."""
         response = self.client.create_security_group(
-            GroupName=group_name, Description=description, VpcId=vpc_id
+            GroupName=group_name,
+            Description=description,
+            VpcId=vpc_id,
+            TagSpecifications=name_tag_specifications("security-group", group_name),
         )
         self.security_group_id = response["GroupId"]
         print(
@@ -43,21 +48,3 @@ class SecurityGroup(object):
                 }
             ],
         )
-
-    def create_tags(self):
-        """Create tags for the security group."""
-        security_group_id = self.security_group_id
-        group_name = self.config.security_group_name
-
-        if not security_group_id:
-            raise ValueError(
-                "Security Group ID is not set. Please create a security group first."
-            )
-        if not group_name:
-            raise ValueError(
-                "Security Group Name is not set. Please provide a name for the security group."
-            )
-        # Create tags for the security group
-        self.client.create_tags(
-            Resources=[security_group_id], Tags=[{"Key": "Name", "Value": group_name}]
-        )
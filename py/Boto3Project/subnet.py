@@ -1,3 +1,6 @@
+from tags import name_tag_specifications
+
+
 class Subnet(object):
     """Documentation for Subnet"""
 
@@ -20,17 +23,19 @@ class Subnet(object):
             CidrBlock=cidr_block,
             AvailabilityZone=az,
             VpcId=vpc_id,
+            TagSpecifications=name_tag_specifications("subnet", name),
         )
         subnet_id = subnet["Subnet"]["SubnetId"]
         print(f"{name}:{subnet_id} created with CIDR block {cidr_block} in AZ {az}")
         # add subnet_id to config dict dynamically
         self.config.subnet_ids.update([(name, subnet_id)])
-        
-        self.client.create_tags(
-            Resources=[subnet_id], Tags=[{"Key": "Name", "Value": name}]
-        )
+
         if map_public_ip_on_launch:
-            self.client.modify_subnet_attribute(
-                SubnetId=subnet_id, MapPublicIpOnLaunch={"Value": True}
-            )
+            self.map_public_ip_on_launch(subnet_id)
         return subnet_id
+
+    def map_public_ip_on_launch(self, subnet_id):
+        """Give instances launched in the subnet a public IP address."""
+        self.client.modify_subnet_attribute(
+            SubnetId=subnet_id, MapPublicIpOnLaunch={"Value": True}
+        )
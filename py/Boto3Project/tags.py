@@ -0,0 +1,11 @@
+# This file contains helpers to tag resources in the call that creates them
+
+
+def name_tag_specifications(resource_type, name):
+    """Build TagSpecifications that set the Name tag of a new resource."""
+    return [
+        {
+            "ResourceType": resource_type,
+            "Tags": [{"Key": "Name", "Value": name}],
+        }
+    ]
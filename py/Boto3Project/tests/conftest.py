@@ -0,0 +1,34 @@
+import os
+import sys
+from pathlib import Path
+
+import boto3
+import pytest
+from moto import mock_aws
+
+PROJECT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(PROJECT), str(Path(__file__).resolve().parent)]
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-2")
+
+from config import Config  # noqa: E402
+from recording_client import RecordingClient  # noqa: E402
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config(str(PROJECT / "config.yml"))
+    # no call to checkip.amazonaws.com
+    config.use_myip = False
+    config.ami_cache_file = str(tmp_path / "ami_cache.json")
+    return config
+
+
+@pytest.fixture
+def aws(tmp_path, monkeypatch):
+    """moto-backed EC2 and RDS clients that record every API call."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    # key pairs are downloaded to the working directory
+    monkeypatch.chdir(tmp_path)
+    with mock_aws():
+        yield RecordingClient(boto3.client("ec2")), RecordingClient(boto3.client("rds"))
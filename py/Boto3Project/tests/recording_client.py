@@ -0,0 +1,63 @@
+"""
+Wrapper around a boto3 client that counts API calls and can add a delay
+to each one, to make provisioning runs against moto resemble the latency
+of the real AWS APIs.
+"""
+import threading
+import time
+from collections import Counter
+
+# Client methods that are not API calls
+LOCAL_METHODS = {"get_waiter", "can_paginate", "close"}
+
+
+class RecordingPaginator(object):
+    """Counts each page fetched by a paginator as a call of its operation"""
+
+    def __init__(self, recorder, operation):
+        self.recorder = recorder
+        self.operation = operation
+        self.paginator = recorder.client.get_paginator(operation)
+
+    def paginate(self, **kwargs):
+        for page in self.paginator.paginate(**kwargs):
+            self.recorder.record(self.operation)
+            yield page
+
+
+class RecordingClient(object):
+    """Proxy for a boto3 client that records each API call"""
+
+    def __init__(self, client, latency=0.0):
+        self.client = client
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def get_paginator(self, operation):
+        return RecordingPaginator(self, operation)
+
+    def record(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute) or name in LOCAL_METHODS or name.startswith("_"):
+            return attribute
+
+        def call(*args, **kwargs):
+            self.record(name)
+            return attribute(*args, **kwargs)
+
+        return call
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
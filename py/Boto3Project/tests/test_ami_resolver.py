@@ -0,0 +1,92 @@
+import boto3
+
+from ami_resolver import AMIResolver, newest_image
+from ec2 import EC2
+from recording_client import RecordingClient
+
+
+def make_ec2(config, aws):
+    ec2_client, _ = aws
+    ec2 = EC2(config)
+    ec2.client = ec2_client
+    return ec2
+
+
+def test_repeated_launches_reuse_the_cached_ami(config, aws):
+    image_id = make_ec2(config, aws).get_image_id()
+    # a later run reads the cache from disk
+    second = make_ec2(config, aws)
+    ssm_client = RecordingClient(boto3.client("ssm"))
+    second.get_ami_resolver().ssm_client = ssm_client
+
+    assert second.get_image_id() == image_id
+    assert second.get_image_id() == image_id
+    assert ssm_client.total_calls == 0
+    assert aws[0].calls["describe_images"] == 0
+
+
+def test_ssm_parameter_is_preferred(config, aws):
+    ec2 = make_ec2(config, aws)
+    expected = boto3.client("ssm").get_parameter(
+        Name="/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-x86_64-gp2")["Parameter"]["Value"]
+
+    assert ec2.get_image_id() == expected
+    assert aws[0].calls["describe_images"] == 0
+
+
+def test_unknown_pattern_scans_once(config, aws, tmp_path):
+    ec2_client, _ = aws
+    resolver = AMIResolver(str(tmp_path / "cache.json"))
+    resolver.set_client(ec2_client)
+
+    first = resolver.resolve("amzn-ami-hvm-*", "x86_64")
+    assert first is not None
+    assert resolver.resolve("amzn-ami-hvm-*", "x86_64") == first
+    assert ec2_client.calls["describe_images"] == 1
+
+
+def test_expired_entry_is_resolved_again(config, aws, tmp_path):
+    ec2_client, _ = aws
+    resolver = AMIResolver(str(tmp_path / "cache.json"), ttl=0)
+    resolver.set_client(ec2_client)
+
+    resolver.resolve("amzn-ami-hvm-*", "x86_64")
+    resolver.resolve("amzn-ami-hvm-*", "x86_64")
+
+    assert ec2_client.calls["describe_images"] == 2
+
+
+def test_cache_is_keyed_on_region(config, aws, tmp_path):
+    cache_file = str(tmp_path / "cache.json")
+    clients = []
+    for region in ("us-west-2", "eu-central-1", "eu-central-1"):
+        ec2_client = RecordingClient(boto3.client("ec2", region_name=region))
+        resolver = AMIResolver(cache_file)
+        resolver.set_client(ec2_client, RecordingClient(boto3.client("ssm", region_name=region)))
+        resolver.resolve("amzn-ami-hvm-*", "x86_64")
+        clients.append(ec2_client)
+
+    # the second eu-central-1 lookup is served from the cache
+    assert [c.calls["describe_images"] for c in clients] == [1, 1, 0]
+
+
+def test_resolver_follows_the_region_of_the_ec2_client(config, aws):
+    ec2 = EC2(config)
+    ec2.client = boto3.client("ec2", region_name="eu-central-1")
+    ssm_client = boto3.client("ssm", region_name="eu-central-1")
+    expected = ssm_client.get_parameter(
+        Name="/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-x86_64-gp2")["Parameter"]["Value"]
+
+    assert ec2.get_image_id() == expected
+    assert ec2.get_ami_resolver().ssm_client.meta.region_name == "eu-central-1"
+
+
+def test_newest_image_picks_latest_creation_date():
+    images = [
+        {"ImageId": "ami-old", "CreationDate": "2023-01-01T00:00:00.000Z"},
+        {"ImageId": "ami-new", "CreationDate": "2025-06-30T12:00:00.000Z"},
+        {"ImageId": "ami-mid", "CreationDate": "2024-03-15T08:30:00.000Z"},
+    ]
+
+    assert newest_image(images)["ImageId"] == "ami-new"
+    assert newest_image([]) is None
@@ -0,0 +1,106 @@
+import boto3
+import botocore
+import pytest
+
+from ec2 import EC2, FleetLaunchError
+from main import build_provisioner
+from rds import RDS
+
+
+def make_fleet(config, aws, azs=("us-west-2a", "us-west-2b")):
+    ec2_client, _ = aws
+    ec2 = EC2(config)
+    ec2.client = ec2_client
+    raw = boto3.client("ec2")
+    vpc_id = raw.create_vpc(CidrBlock="10.0.0.0/16")["Vpc"]["VpcId"]
+    subnet_ids = [
+        raw.create_subnet(VpcId=vpc_id, CidrBlock=f"10.0.{i}.0/24", AvailabilityZone=az)["Subnet"]["SubnetId"]
+        for i, az in enumerate(azs)
+    ]
+    return ec2, ec2_client, subnet_ids
+
+
+def instance_azs(ec2_client, instance_ids):
+    reservations = ec2_client.describe_instances(InstanceIds=instance_ids)["Reservations"]
+    return sorted(i["Placement"]["AvailabilityZone"] for r in reservations for i in r["Instances"])
+
+
+def test_fleet_uses_one_call_per_subnet(config, aws):
+    ec2, ec2_client, subnet_ids = make_fleet(config, aws)
+
+    instance_ids = ec2.run_fleet(5, subnet_ids=subnet_ids)
+
+    assert len(set(instance_ids)) == 5
+    assert ec2_client.calls["run_instances"] == 2
+    assert instance_azs(ec2_client, instance_ids) == ["us-west-2a"] * 3 + ["us-west-2b"] * 2
+
+
+def test_small_fleet_skips_empty_subnets(config, aws):
+    ec2, ec2_client, subnet_ids = make_fleet(config, aws, azs=("us-west-2a", "us-west-2b", "us-west-2c"))
+
+    assert len(ec2.run_fleet(2, subnet_ids=subnet_ids)) == 2
+    assert ec2_client.calls["run_instances"] == 2
+
+
+def test_wait_polls_the_whole_fleet_at_once(config, aws):
+    ec2, ec2_client, subnet_ids = make_fleet(config, aws)
+
+    instance_ids = ec2.run_fleet(6, subnet_ids=subnet_ids, wait=True, poll_interval=0)
+
+    assert len(instance_ids) == 6
+    assert ec2_client.calls["describe_instances"] == 1
+    assert ec2_client.calls["describe_images"] == 0
+
+
+def test_wait_treats_unknown_new_instances_as_pending(config, aws):
+    ec2, ec2_client, subnet_ids = make_fleet(config, aws)
+    instance_ids = ec2.run_fleet(2, subnet_ids=subnet_ids)
+    describe_instances = ec2_client.describe_instances
+    not_found = botocore.exceptions.ClientError(
+        {"Error": {"Code": "InvalidInstanceID.NotFound", "Message": "not found"}}, "DescribeInstances"
+    )
+    calls = []
+
+    def eventually_consistent(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise not_found
+        return describe_instances(**kwargs)
+
+    ec2_client.describe_instances = eventually_consistent
+
+    assert ec2.wait_for_instances(instance_ids, poll_interval=0) == instance_ids
+    assert len(calls) == 2
+
+
+def test_failed_subnet_keeps_the_launched_ids(config, aws):
+    ec2, ec2_client, subnet_ids = make_fleet(config, aws)
+
+    with pytest.raises(FleetLaunchError) as error:
+        ec2.run_fleet(4, subnet_ids=[subnet_ids[0], "subnet-00000000"])
+
+    assert len(error.value.instance_ids) == 2
+    assert instance_azs(ec2_client, error.value.instance_ids) == ["us-west-2a"] * 2
+    assert [subnet_id for subnet_id, _ in error.value.errors] == ["subnet-00000000"]
+
+
+def test_single_instance_keeps_returning_an_id(config, aws):
+    ec2, _, subnet_ids = make_fleet(config, aws)
+
+    assert ec2.run_instances(subnet_id=subnet_ids[0]).startswith("i-")
+    assert ec2.launch_instances(subnet_id=subnet_ids[0])[0].startswith("i-")
+
+
+def test_provisioning_launches_a_fleet(config, aws):
+    ec2_client, rds_client = aws
+    config.instance_count = 4
+    ec2 = EC2(config)
+    ec2.client = ec2_client
+    rds = RDS(config)
+    rds.rds_client = rds_client
+
+    results = build_provisioner(config, ec2, rds).run()
+    results["rds_instance"].result()
+
+    assert len(results["ec2_instance"]) == 4
+    assert instance_azs(ec2_client, results["ec2_instance"]) == [config.az] * 2 + [config.az2] * 2
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+import main
+from ec2 import EC2
+from provisioner import Provisioner
+from rds import RDS
+
+
+def sleeper(seconds, log=None, name=None):
+    def step():
+        time.sleep(seconds)
+        if log is not None:
+            log.append(name)
+        return name
+    return step
+
+
+def test_independent_steps_run_concurrently():
+    p = Provisioner(max_workers=4)
+    for i in range(4):
+        p.add(f"step{i}", sleeper(0.1))
+
+    start = time.perf_counter()
+    p.run()
+
+    assert time.perf_counter() - start < 0.2
+
+
+def test_steps_wait_for_their_dependencies():
+    log = []
+    p = Provisioner()
+    p.add("vpc", sleeper(0.05, log, "vpc"))
+    p.add("subnet", sleeper(0, log, "subnet"), depends_on=["vpc"])
+    p.add("instance", sleeper(0, log, "instance"), depends_on=["subnet"])
+
+    assert p.run() == {"vpc": "vpc", "subnet": "subnet", "instance": "instance"}
+    assert log == ["vpc", "subnet", "instance"]
+
+
+def test_failed_step_skips_dependents_only():
+    def fail():
+        raise RuntimeError("boom")
+    p = Provisioner()
+    p.add("vpc", fail)
+    p.add("subnet", sleeper(0), depends_on=["vpc"])
+    p.add("key_pair", sleeper(0, name="key_pair"))
+
+    with pytest.raises(RuntimeError):
+        p.run()
+    assert p.results == {"key_pair": "key_pair"}
+
+
+def test_cycles_and_unknown_steps_are_rejected():
+    p = Provisioner()
+    p.add("a", sleeper(0), depends_on=["b"])
+    p.add("b", sleeper(0), depends_on=["a"])
+    with pytest.raises(ValueError, match="cycle"):
+        p.run()
+
+    p = Provisioner()
+    p.add("a", sleeper(0), depends_on=["missing"])
+    with pytest.raises(ValueError, match="unknown"):
+        p.run()
+
+
+def test_critical_path_follows_the_slowest_chain():
+    p = Provisioner()
+    p.add("vpc", sleeper(0.02))
+    p.add("fast", sleeper(0), depends_on=["vpc"])
+    p.add("slow", sleeper(0.1), depends_on=["vpc"])
+    p.add("end", sleeper(0), depends_on=["fast", "slow"])
+    p.add("unrelated", sleeper(0.01))
+    p.run()
+
+    assert p.critical_path() == ["vpc", "slow", "end"]
+
+
+def test_full_environment_is_provisioned(config, aws):
+    ec2_client, rds_client = aws
+    ec2 = EC2(config)
+    ec2.client = ec2_client
+    rds = RDS(config)
+    rds.rds_client = rds_client
+
+    results = main.build_provisioner(config, ec2, rds).run()
+    results["rds_instance"].result()
+
+    assert len(config.subnet_ids) == 4
+    assert len(ec2_client.describe_instances()["Reservations"]) == 1
+    groups = ec2_client.describe_security_groups()["SecurityGroups"]
+    assert {config.security_group_name, config.security_group_name + "-rds"} <= {g["GroupName"] for g in groups}
+    instance = rds_client.describe_db_instances()["DBInstances"][0]
+    assert instance["DBInstanceIdentifier"].lower() == config.db_instance_identifier.lower()
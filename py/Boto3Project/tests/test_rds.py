@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from rds import RDS
+
+
+class StartingRDSClient(object):
+    """RDS client whose new instance reports the given statuses, one per describe call"""
+
+    class exceptions(object):
+        class DBInstanceNotFoundFault(Exception):
+            pass
+
+    def __init__(self, statuses, delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.created = False
+        self.modified = []
+
+    def create_db_instance(self, **kwargs):
+        self.created = True
+
+    def describe_db_instances(self, DBInstanceIdentifier):
+        if not self.created:
+            raise self.exceptions.DBInstanceNotFoundFault(DBInstanceIdentifier)
+        time.sleep(self.delay)
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        instance = {"DBInstanceStatus": status}
+        if status == "available":
+            instance["Endpoint"] = {"Address": "db.example.com"}
+        return {"DBInstances": [instance]}
+
+    def modify_db_instance(self, **kwargs):
+        self.modified.append(kwargs)
+
+
+def make_rds(config, client):
+    rds = RDS(config)
+    rds.rds_client = client
+    return rds
+
+
+def test_create_returns_before_instance_is_available(config, aws):
+    client = StartingRDSClient(["creating", "creating", "available"], delay=0.05)
+    rds = make_rds(config, client)
+
+    start = time.perf_counter()
+    handle = rds.create_RDS_instance(rds_sg_ids=["sg-1"], wait=False, poll_interval=0.01)
+    assert time.perf_counter() - start < 0.05
+    assert not handle.done()
+
+    assert handle.result() == "db.example.com"
+    assert client.modified[0]["MonitoringInterval"] == 0
+
+
+def test_progress_is_reported_every_poll(config, aws):
+    progress = []
+    rds = make_rds(config, StartingRDSClient(["creating", "backing-up", "available"]))
+
+    rds.create_RDS_instance(rds_sg_ids=["sg-1"], poll_interval=0.01,
+                            on_progress=lambda identifier, status, elapsed: progress.append(status))
+
+    assert progress == ["creating", "backing-up", "available"]
+
+
+def test_failed_instance_raises_on_join(config, aws):
+    rds = make_rds(config, StartingRDSClient(["creating", "incompatible-network"]))
+    handle = rds.create_RDS_instance(rds_sg_ids=["sg-1"], wait=False, poll_interval=0.01, on_progress=None)
+
+    with pytest.raises(RuntimeError, match="incompatible-network"):
+        handle.result()
+
+
+def test_provisioning_continues_while_rds_starts(config, aws):
+    from ec2 import EC2
+    from main import build_provisioner
+
+    ec2_client, _ = aws
+    ec2 = EC2(config)
+    ec2.client = ec2_client
+    client = StartingRDSClient(["creating"] * 10 + ["available"])
+    rds = make_rds(config, client)
+    client.create_db_subnet_group = lambda **kwargs: None
+    client.describe_db_subnet_groups = lambda **kwargs: None
+    config.rds_poll_interval = 0.02
+
+    provisioner = build_provisioner(config, ec2, rds)
+    provisioner.run()
+    start, end = provisioner.timings["rds_instance"]
+
+    # the step took less than the 10 polls the instance needs to start
+    assert end - start < 0.2
+    assert provisioner.results["rds_instance"].result() == "db.example.com"
@@ -0,0 +1,72 @@
+import main
+from ec2 import EC2
+from rds import RDS
+from reconcile import EnvironmentState
+
+WRITE_PREFIXES = ("create_", "run_", "attach_", "associate_", "authorize_", "modify_", "import_")
+
+
+def make_clients(config, aws):
+    ec2_client, rds_client = aws
+    ec2 = EC2(config)
+    ec2.client = ec2_client
+    rds = RDS(config)
+    rds.rds_client = rds_client
+    return ec2, rds
+
+
+def writes(*clients):
+    return sum(n for client in clients for name, n in client.calls.items() if name.startswith(WRITE_PREFIXES))
+
+
+def reconcile(config, aws):
+    ec2, rds = make_clients(config, aws)
+    state = EnvironmentState.snapshot(config, ec2.client, rds.rds_client)
+    provisioner = main.build_provisioner(config, ec2, rds, state=state)
+    return state, provisioner
+
+
+def test_empty_account_plans_every_step(config, aws):
+    _, provisioner = reconcile(config, aws)
+
+    assert set(provisioner.plan().values()) == {"create"}
+    assert writes(*aws) == 0
+
+
+def test_second_run_makes_no_writes(config, aws):
+    ec2, rds = make_clients(config, aws)
+    main.build_provisioner(config, ec2, rds).run()["rds_instance"].result()
+    for client in aws:
+        client.reset()
+
+    state, provisioner = reconcile(config, aws)
+    results = provisioner.run()
+
+    assert set(provisioner.actions.values()) == {"exists"}
+    assert results["rds_instance"] is None
+    assert writes(*aws) == 0
+    assert sum(client.total_calls for client in aws) <= 10
+    assert len(state.instance_ids) == 1
+    assert len(aws[0].describe_vpcs()["Vpcs"]) == 2  # the default VPC and ours
+
+
+def test_only_missing_resources_are_created(config, aws):
+    ec2, rds = make_clients(config, aws)
+    main.build_provisioner(config, ec2, rds).run()["rds_instance"].result()
+    ec2_client, _ = aws
+    group_id = EnvironmentState.snapshot(config, ec2_client, aws[1]).security_groups[config.security_group_name][0]
+    ec2_client.revoke_security_group_ingress(
+        GroupId=group_id,
+        IpPermissions=[{"IpProtocol": "tcp", "FromPort": config.ssh_port, "ToPort": config.ssh_port,
+                        "IpRanges": [{"CidrIp": "0.0.0.0/0"}]}],
+    )
+    for client in aws:
+        client.reset()
+
+    _, provisioner = reconcile(config, aws)
+    changes = {name: action for name, action in provisioner.plan().items() if action != "exists"}
+    provisioner.run()
+
+    assert changes == {"sg_ec2": "update"}
+    assert ec2_client.calls["authorize_security_group_ingress"] == 1
+    assert writes(*aws) == 1
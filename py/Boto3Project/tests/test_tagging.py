@@ -0,0 +1,38 @@
+from ec2 import EC2
+from main import build_provisioner
+from rds import RDS
+
+
+def provision(config, aws):
+    ec2_client, rds_client = aws
+    ec2 = EC2(config)
+    ec2.client = ec2_client
+    rds = RDS(config)
+    rds.rds_client = rds_client
+    build_provisioner(config, ec2, rds).run()["rds_instance"].result()
+    return ec2_client
+
+
+def names(ec2_client, resource_type):
+    tags = ec2_client.describe_tags(Filters=[{"Name": "resource-type", "Values": [resource_type]}])["Tags"]
+    return sorted(t["Value"] for t in tags if t["Key"] == "Name")
+
+
+def test_resources_are_tagged_when_created(config, aws):
+    ec2_client = provision(config, aws)
+
+    assert ec2_client.calls["create_tags"] == 0
+    assert names(ec2_client, "vpc") == [config.vpc_name]
+    assert names(ec2_client, "subnet") == sorted(config.subnet_ids)
+    assert names(ec2_client, "internet-gateway") == [config.igw_name]
+    assert names(ec2_client, "route-table") == [config.public_route_table_name]
+    assert names(ec2_client, "security-group") == [config.security_group_name, config.security_group_name + "-rds"]
+
+
+def test_ec2_api_calls_per_environment(config, aws):
+    ec2_client = provision(config, aws)
+
+    # vpc + dns, 4 subnets + 2 public ip settings, igw + attach, route table + route
+    # + association, 2 security groups + 2 rules, key pair check + create, instance
+    # (the AMI comes from SSM); 29 while every resource got its own create_tags call
+    assert ec2_client.total_calls == 20
@@ -1,4 +1,5 @@
 # This file contains methods to interact with the VPC
+from tags import name_tag_specifications
 
 
 class VPC(object):
@@ -11,19 +12,16 @@ class VPC(object):
         """Get the AWS client for VPC operations."""
         self.client = client
 
-    def create_vpc(self, cidr_block):
+    def create_vpc(self, cidr_block, vpc_name):
+        """Create a VPC, named in the same call."""
         vpc = self.client.create_vpc(
             CidrBlock=cidr_block,
+            TagSpecifications=name_tag_specifications("vpc", vpc_name),
         )
         self.vpc_id = vpc["Vpc"]["VpcId"]
         print(f"{self.vpc_id} created with CIDR block {cidr_block}")
         return self.vpc_id
 
-    def create_tags(self, vpc_name):
-        self.client.create_tags(
-            Resources=[self.vpc_id], Tags=[{"Key": "Name", "Value": vpc_name}]
-        )
-
     def enable_DNS(self):
         self.client.modify_vpc_attribute(
             VpcId=self.vpc_id, EnableDnsHostnames={"Value": True}